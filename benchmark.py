@@ -0,0 +1,740 @@
+# Offline-Benchmark für den Ticket-Bot: Fake-Discord-Objekte + lokale Stand-ins für RCON-API und Chat-Completions.
+#
+#   python benchmark.py --tickets 30 --llm-latency 1.5 --max-p95 12
+#
+# Treibt on_message, send_ki_response, den Modal-Submit und die Admin-View-Callbacks für N parallele
+# Tickets und meldet Durchsatz, p50/p95/p99 der Antwortlatenz und Peak-Speicher. Mit --max-p95 /
+# --max-error-rate als Regression-Gate nutzbar (Exit-Code 1 bei Überschreitung).
+import os
+import sys
+
+# main.py liest die Konfiguration beim Import – Benchmark-Defaults vorher setzen
+os.environ.setdefault('API_KEY', 'benchmark')
+os.environ.setdefault('GROK_API_KEY', 'benchmark')
+os.environ.setdefault('DISCORD_TOKEN', 'benchmark')
+os.environ.setdefault('TICKET_DB', '')
+os.environ.setdefault('LOG_FILE', '')
+os.environ.setdefault('NAME_INDEX_DB', '')
+os.environ.setdefault('IMAGE_CACHE_DIR', '')
+if '--verbose' in sys.argv:
+    os.environ.setdefault('LOG_CONSOLE', '1')  # Bot-Logs gehen sonst nur in die (hier abgeschaltete) Datei
+
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import random
+import resource
+import time
+import tracemalloc
+from collections import Counter
+
+import discord
+from aiohttp import web
+from PIL import Image
+
+import main
+
+ADMIN_CATEGORY = "Admin"
+_ids = itertools.count(10_000)
+cdn_base_url = "https://cdn.example.invalid"  # start_standins setzt den CDN-Stand-in
+
+# === FAKE DISCORD ===
+class FakeCategory:
+    def __init__(self, name: str):
+        self.name = name
+
+class FakeGuild:
+    def __init__(self, guild_id: int = 1):
+        self.id = guild_id
+        self.members = {}
+
+    def get_member(self, member_id: int):
+        return self.members.get(member_id)
+
+    async def fetch_member(self, member_id: int):
+        member = self.members.get(member_id)
+        if member is None:
+            raise discord.NotFound(FakeHTTPResponse(404), "member")
+        return member
+
+class FakeHTTPResponse:
+    def __init__(self, status: int):
+        self.status = status
+        self.reason = "fake"
+
+class FakeRole:
+    def __init__(self, name: str):
+        self.name = name
+
+class FakeMember(discord.Member):
+    # discord.Member ohne Gateway-State; nur was der Bot tatsächlich liest
+    def __init__(self, member_id: int, name: str, admin: bool = False):
+        self._fake_id = member_id
+        self._fake_name = name
+        self._fake_roles = [FakeRole(main.ADMIN_ROLE_NAME)] if admin else []
+        self.sent = []
+
+    id = property(lambda self: self._fake_id)
+    name = property(lambda self: self._fake_name)
+    roles = property(lambda self: self._fake_roles)
+    bot = property(lambda self: False)
+    mention = property(lambda self: f"<@{self._fake_id}>")
+
+    def __str__(self):
+        return self._fake_name
+
+    async def send(self, content=None, **kwargs):
+        self.sent.append(content)
+
+class FakeSentMessage:
+    def __init__(self, channel, content, view=None, embed=None):
+        self.id = next(_ids)
+        self.channel = channel
+        self.content = content
+        self.view = view
+        self.embed = embed
+
+    async def edit(self, content=None, view=None, embed=None, **kwargs):
+        await self.channel.simulate_latency()
+        self.channel.edits += 1
+        if content is not None:
+            self.content = content
+        if embed is not None:
+            self.embed = embed
+
+    async def add_reaction(self, emoji):
+        pass
+
+class FakeTextChannel(discord.TextChannel):
+    def __init__(self, channel_id: int, category: str, guild: FakeGuild, send_latency: float = 0.0):
+        self.id = channel_id
+        self.name = f"channel-{channel_id}"
+        self.guild = guild
+        self._fake_category = FakeCategory(category)
+        self._fake_overwrites = {}
+        self.send_latency = send_latency
+        self.messages: list[FakeSentMessage] = []
+        self.send_times: list[float] = []
+        self.edits = 0
+        self.activity = asyncio.Event()
+
+    category = property(lambda self: self._fake_category)
+    overwrites = property(lambda self: self._fake_overwrites)
+    jump_url = property(lambda self: f"https://discord.com/channels/{self.guild.id}/{self.id}")
+
+    async def simulate_latency(self):
+        if self.send_latency:
+            await asyncio.sleep(self.send_latency * random.uniform(0.5, 1.5))
+
+    async def send(self, content=None, view=None, embed=None, **kwargs):
+        await self.simulate_latency()
+        message = FakeSentMessage(self, content, view, embed)
+        self.messages.append(message)
+        self.send_times.append(time.monotonic())
+        self.activity.set()
+        return message
+
+    def get_partial_message(self, message_id: int):
+        for message in self.messages:
+            if message.id == message_id:
+                return message
+        return FakeSentMessage(self, None)
+
+class FakeAttachment:
+    def __init__(self, filename: str, content_type: str, size: int):
+        self.filename = filename
+        self.content_type = content_type
+        self.size = size
+        self.url = f"{cdn_base_url}/attachments/{next(_ids)}/{filename}"
+
+class FakeMessage:
+    def __init__(self, author: FakeMember, channel: FakeTextChannel, content: str, attachments: list | None = None):
+        self.id = next(_ids)
+        self.author = author
+        self.channel = channel
+        self.guild = channel.guild
+        self.content = content
+        self.attachments = attachments or []
+
+class FakeInteractionResponse:
+    def __init__(self):
+        self.messages = []
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def defer(self, **kwargs):
+        self._done = True
+
+    async def send_message(self, content=None, **kwargs):
+        self._done = True
+        self.messages.append(content)
+
+    async def send_modal(self, modal):
+        self._done = True
+        self.messages.append(modal)
+
+    async def edit_message(self, **kwargs):
+        self._done = True
+
+class FakeFollowup:
+    def __init__(self):
+        self.messages = []
+
+    async def send(self, content=None, **kwargs):
+        self.messages.append(content)
+
+class FakeInteraction:
+    def __init__(self, user: FakeMember, channel: FakeTextChannel, message: FakeSentMessage | None = None):
+        self.user = user
+        self.channel = channel
+        self.channel_id = channel.id
+        self.message = message
+        self.data = {}
+        self.response = FakeInteractionResponse()
+        self.followup = FakeFollowup()
+
+class FakeDiscord:
+    # Ersetzt bot.get_channel und process_commands; verwaltet Ticket-, Admin- und Debug-Channel
+    def __init__(self, send_latency: float = 0.0):
+        self.guild = FakeGuild()
+        self.send_latency = send_latency
+        self.channels = {}
+        self.admin_channel = self._channel(main.ADMIN_SUMMARY_CHANNEL_ID, ADMIN_CATEGORY)
+        self.debug_channel = self._channel(main.DEBUG_CHANNEL_ID, ADMIN_CATEGORY)
+        self.admin = self.member("Admin", admin=True)
+
+    def _channel(self, channel_id: int, category: str) -> FakeTextChannel:
+        channel = FakeTextChannel(channel_id, category, self.guild, self.send_latency)
+        self.channels[channel_id] = channel
+        return channel
+
+    def ticket_channel(self) -> FakeTextChannel:
+        return self._channel(next(_ids), main.ACTIVE_TICKET_CATEGORIES[0])
+
+    def member(self, name: str, admin: bool = False) -> FakeMember:
+        member = FakeMember(next(_ids), name, admin)
+        self.guild.members[member.id] = member
+        return member
+
+    def install(self):
+        main.bot.get_channel = self.channels.get
+
+        async def process_commands(message):
+            return None
+        main.bot.process_commands = process_commands
+
+# === STAND-IN SERVER ===
+class StandInServer:
+    # Lokaler aiohttp-Server mit einstellbarer Latenz und Fehlerquote
+    def __init__(self, latency: float, error_rate: float):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = Counter()
+        self.errors = Counter()
+        self.runner = None
+        self.url = ""
+
+    async def delay(self, factor: float = 1.0):
+        if self.latency:
+            await asyncio.sleep(self.latency * factor * random.uniform(0.5, 1.5))
+
+    def fail(self) -> bool:
+        return random.random() < self.error_rate
+
+    def routes(self, app: web.Application):
+        raise NotImplementedError
+
+    async def start(self, path: str = "") -> str:
+        app = web.Application()
+        self.routes(app)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}{path}"
+        return self.url
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+class RconStandIn(StandInServer):
+    UNBAN_ENDPOINTS = main.FULL_CLEAR_ENDPOINTS
+
+    def routes(self, app: web.Application):
+        app.router.add_get('/api/get_players_history', self.players_history)
+        for endpoint in self.UNBAN_ENDPOINTS:
+            app.router.add_post(f'/api/{endpoint}', self.clear_endpoint)
+
+    async def players_history(self, request: web.Request) -> web.Response:
+        endpoint = "get_players_history_id" if "player_id" in request.query else "get_players_history_name"
+        self.calls[endpoint] += 1
+        await self.delay()
+        if self.fail():
+            self.errors[endpoint] += 1
+            return web.Response(status=500, text="stand-in error")
+        if "player_id" in request.query:
+            return web.json_response({"result": fake_player(request.query["player_id"])})
+        name = request.query.get("player_name", "Spieler")
+        players = [{"player_id": f"7656119{random.randint(10**9, 10**10 - 1)}", "names": [{"name": name, "last_seen": "2025-05-01T20:00:00"}]}]
+        return web.json_response({"result": {"players": players}})
+
+    async def clear_endpoint(self, request: web.Request) -> web.Response:
+        endpoint = request.path.rsplit('/', 1)[-1]
+        self.calls[endpoint] += 1
+        await self.delay()
+        if self.fail():
+            self.errors[endpoint] += 1
+            return web.Response(status=500, text="stand-in error")
+        return web.json_response({"result": endpoint == "remove_temp_ban"})
+
+def fake_player(player_id: str) -> dict:
+    actions = [{"action_type": random.choice(["KICK", "TEMPBAN", "PUNISH"]), "reason": "Teamkill", "by": "Admin",
+                "time": f"2025-05-0{i + 1}T20:00:00"} for i in range(random.randint(0, 8))]
+    return {"player_id": player_id, "names": [{"name": f"Spieler{player_id[-4:]}", "last_seen": "2025-05-01T20:00:00"}],
+            "received_actions": actions, "blacklists": [], "is_blacklisted": False}
+
+class LLMStandIn(StandInServer):
+    def __init__(self, latency: float, error_rate: float, reply_chars: int = 400, tag_rate: float = 0.1):
+        super().__init__(latency, error_rate)
+        self.reply_chars = reply_chars
+        self.tag_rate = tag_rate
+        self.prompt_chars = 0
+
+    def routes(self, app: web.Application):
+        app.router.add_post('/v1/chat/completions', self.completions)
+
+    def reply_text(self) -> str:
+        text = ("Moin! Ich hab mir das angeschaut, das war ein Kick wegen Teamkill. Kein Ding, passiert. " * 20)[:self.reply_chars]
+        if random.random() < self.tag_rate:
+            text += " **ZUSAMMENFASSUNG FÜR ADMINS:** Spieler fragt nach Kick, bitte prüfen."
+        return text
+
+    async def completions(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        self.calls["chat_completions"] += 1
+        self.prompt_chars += len(json.dumps(body.get("messages", []), ensure_ascii=False))
+        if self.fail():
+            self.errors["chat_completions"] += 1
+            await self.delay(0.2)
+            if random.random() < 0.5:
+                return web.Response(status=429, headers={"Retry-After": "1"})
+            return web.Response(status=500, text="stand-in error")
+        text = self.reply_text()
+        if not body.get("stream"):
+            await self.delay()
+            return web.json_response({"choices": [{"message": {"content": text}}]})
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await self.delay(0.3)
+        chunks = [text[i:i + 20] for i in range(0, len(text), 20)]
+        for chunk in chunks:
+            await response.write(f"data: {json.dumps({'choices': [{'delta': {'content': chunk}}]})}\n\n".encode())
+            if self.latency:
+                await asyncio.sleep(self.latency * 0.7 / len(chunks))
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+async def start_standins(rcon: RconStandIn, llm: LLMStandIn, cdn: "CdnStandIn | None" = None):
+    global cdn_base_url
+    if cdn:
+        cdn_base_url = await cdn.start()
+    main.API_BASE_URL = (await rcon.start('/api')).rstrip('/')
+    await llm.start('/v1/chat/completions')
+    main.llm_router.backends = [main.CompletionBackend("stand-in", llm.url, main.GROK_MODEL, "benchmark")]
+    main.llm_router.fast_backends = []
+
+class CdnStandIn(StandInServer):
+    # Discord-CDN: liefert einen Screenshot (Rauschen, damit PNG nicht schrumpft) in 64-KB-Häppchen
+    def __init__(self, latency: float, error_rate: float, image_kb: int):
+        super().__init__(latency, error_rate)
+        side = max(16, int((image_kb * 1024 / 3) ** 0.5))
+        buffer = io.BytesIO()
+        Image.frombytes("RGB", (side, side), random.randbytes(side * side * 3)).save(buffer, "PNG", compress_level=1)
+        self.image = buffer.getvalue()
+
+    def routes(self, app: web.Application):
+        app.router.add_get('/attachments/{id}/{filename}', self.attachment)
+
+    async def attachment(self, request: web.Request) -> web.StreamResponse:
+        self.calls["attachment"] += 1
+        await self.delay()
+        if self.fail():
+            self.errors["attachment"] += 1
+            return web.Response(status=500, text="stand-in error")
+        response = web.StreamResponse(headers={"Content-Type": "image/png"})
+        response.content_length = len(self.image)
+        await response.prepare(request)
+        for offset in range(0, len(self.image), 64 * 1024):
+            await response.write(self.image[offset:offset + 64 * 1024])
+            await asyncio.sleep(0)
+        await response.write_eof()
+        return response
+
+async def start_bot_runtime():
+    # Was on_ready im echten Betrieb startet – ohne Gateway
+    await main.create_http_session()
+    main.start_log_flusher()
+    main.start_transcript_recorder()
+    main.outbound.start()
+    main.llm_scheduler.start()
+
+async def stop_bot_runtime():
+    for task in [main.log_flusher_task, main.transcript_task]:
+        if task:
+            task.cancel()
+    await main.flush_transcript()
+    await main.close_http_session()
+
+# === BENCHMARK ===
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+async def wait_for_reply(channel: FakeTextChannel, since_count: int, timeout: float) -> float | None:
+    # Zeitpunkt der ersten Bot-Nachricht nach since_count, None bei Timeout
+    deadline = time.monotonic() + timeout
+    while len(channel.messages) <= since_count:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        channel.activity.clear()
+        try:
+            await asyncio.wait_for(channel.activity.wait(), remaining)
+        except asyncio.TimeoutError:
+            return None
+    return channel.send_times[since_count]
+
+class BenchmarkResult:
+    def __init__(self):
+        self.reply_latencies: list[float] = []
+        self.modal_latencies: list[float] = []
+        self.admin_latencies: dict[str, list[float]] = {"show_infos": [], "full_unban": []}
+        self.timeouts = 0
+        self.error_replies = 0
+
+async def simulate_ticket(index: int, fake: FakeDiscord, args, result: BenchmarkResult):
+    await asyncio.sleep(random.uniform(0, args.ramp))
+    channel = fake.ticket_channel()
+    owner = fake.member(f"Spieler{index}")
+    steam_id = f"7656119{8000000000 + index:010d}"
+    script = ["hallo ich wurde gebannt, warum?", f"meine id ist {steam_id}", "ok danke dir"][:args.messages]
+
+    for i, text in enumerate(script):
+        before = len(channel.messages)
+        sent_at = time.monotonic()
+        attachments = [FakeAttachment("screenshot.png", "image/png", args.image_kb * 1024)] if args.images and i == 0 else []
+        await main.on_message(FakeMessage(owner, channel, text, attachments))
+        replied_at = await wait_for_reply(channel, before, args.reply_timeout)
+        if replied_at is None:
+            result.timeouts += 1
+        else:
+            result.reply_latencies.append(replied_at - sent_at)
+            if channel.messages[before].content == "KI-Probleme – weiter schreiben!":
+                result.error_replies += 1
+        await asyncio.sleep(random.uniform(0, args.think))
+
+    ticket = main.tickets.get(channel.id)
+    if ticket is None:
+        return
+    if args.modal:
+        modal = main.IngameNameOrIdModal(ticket.language)
+        modal.input._value = steam_id
+        before = len(channel.messages)
+        started = time.monotonic()
+        await modal.on_submit(FakeInteraction(owner, channel))
+        result.modal_latencies.append(time.monotonic() - started)
+        replied_at = await wait_for_reply(channel, before, args.reply_timeout)
+        if replied_at is None:
+            result.timeouts += 1
+        else:
+            result.reply_latencies.append(replied_at - started)
+    if args.admin:
+        view = main.TicketAdminView(ticket.player_id, channel.id)
+        for name in ("show_infos", "full_unban"):
+            started = time.monotonic()
+            await getattr(main.TicketAdminView, name)(view, FakeInteraction(fake.admin, fake.admin_channel), None)
+            result.admin_latencies[name].append(time.monotonic() - started)
+
+async def run_benchmark(args) -> dict:
+    random.seed(args.seed)
+    tracemalloc.start()
+    fake = FakeDiscord(args.discord_latency)
+    fake.install()
+    rcon = RconStandIn(args.rcon_latency, args.rcon_error_rate)
+    llm = LLMStandIn(args.llm_latency, args.llm_error_rate, args.reply_chars)
+    cdn = CdnStandIn(args.discord_latency, 0.0, args.image_kb)
+    await start_standins(rcon, llm, cdn)
+    await start_bot_runtime()
+    result = BenchmarkResult()
+    started = time.monotonic()
+    try:
+        await asyncio.gather(*(simulate_ticket(i, fake, args, result) for i in range(args.tickets)))
+    finally:
+        wall = time.monotonic() - started
+        await stop_bot_runtime()
+        await rcon.stop()
+        await llm.stop()
+        await cdn.stop()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    replies = len(result.reply_latencies)
+    total = replies + result.timeouts
+    return {
+        "tickets": args.tickets,
+        "wall_seconds": round(wall, 2),
+        "replies": replies,
+        "throughput_replies_per_s": round(replies / wall, 3) if wall else 0,
+        "reply_latency_p50": round(percentile(result.reply_latencies, 50), 3),
+        "reply_latency_p95": round(percentile(result.reply_latencies, 95), 3),
+        "reply_latency_p99": round(percentile(result.reply_latencies, 99), 3),
+        "modal_submit_p95": round(percentile(result.modal_latencies, 95), 3),
+        "admin_callback_p95": {k: round(percentile(v, 95), 3) for k, v in result.admin_latencies.items()},
+        "timeouts": result.timeouts,
+        "error_rate": round((result.timeouts + result.error_replies) / total, 4) if total else 0,
+        "peak_python_heap_mb": round(peak / 1024 / 1024, 2),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "upstream_calls": {**rcon.calls, **llm.calls},
+        "upstream_errors": {**rcon.errors, **llm.errors},
+        "llm_prompt_chars": llm.prompt_chars,
+        "discord_sends": sum(len(c.messages) for c in fake.channels.values()),
+        "discord_edits": sum(c.edits for c in fake.channels.values()),
+        "images": {k: v for k, v in main.image_stats.items()} | {"cdn_requests": cdn.calls["attachment"]},
+        "response_cache": {**main.response_cache.stats, "hit_rate": round(main.response_cache.hit_rate, 3),
+                           "saved_seconds": round(main.response_cache.saved_seconds, 2)},
+    }
+
+# === TEXTANALYSE MICRO-BENCHMARK ===
+SAMPLE_MESSAGES = [
+    "hallo ich wurde gebannt, warum?",
+    "Hallo, ich wurde heute Abend ohne Grund vom Server gekickt",
+    "meine id ist 76561198986670442",
+    "76561198986670442",
+    "Mein Name ist [GBG] Narcotic",
+    "ingame: ℧ | Narcotic",
+    "ich bin xX_Sniper_Xx",
+    "moin",
+    "ok danke dir",
+    "danke!",
+    "hi",
+    "why was i banned from the server?",
+    "Hello, I got kicked for teamkill but it was an accident",
+    "my name is Panzer_Fritz",
+    "thx",
+    "i play as [CoW] Miller",
+    "bitte entbannen, war ein versehen mit dem teamkill",
+    "Ich wurde permanent gebannt und weiß nicht warum. Bitte um Hilfe.",
+    "Someone is cheating on the server, aimbot for sure, player name DarkWolf99",
+    "ich möchte einen Spieler melden, der hackt",
+    "wie lange geht mein ban noch",
+    "sry for tk",
+    "war keine absicht",
+    "a3f9c2b1d4e5f60718293a4b5c6d7e8f ist meine id",
+    "Servus, bin wieder da. Hat sich was getan?",
+    "kannst du mal schauen",
+    "TK wegen Panzer, war nicht mit Absicht!!!",
+    "ich glaube ich wurde vom votekick erwischt",
+    "Please unban me, I will not do it again",
+    "Name: Hauptmann_Krause (mit Clan-Tag [7.PzD])",
+]
+
+def run_text_analysis_benchmark(rounds: int) -> dict:
+    detector_calls = 0
+    original = main.detect_langs
+
+    def counting_detect_langs(text):
+        nonlocal detector_calls
+        detector_calls += 1
+        return original(text)
+
+    main.detect_langs = counting_detect_langs
+    try:
+        main.warm_language_detector()
+        cold = []
+        for _ in range(rounds):
+            for text in SAMPLE_MESSAGES:
+                main.analyze_text.cache_clear()
+                started = time.perf_counter()
+                main.analyze_text(text)
+                cold.append(time.perf_counter() - started)
+        calls_per_round = detector_calls / rounds
+        warm = []
+        for _ in range(rounds):
+            for text in SAMPLE_MESSAGES:
+                started = time.perf_counter()
+                # on_message, Transcript und Fast-Model-Check fragen denselben Text mehrfach ab
+                main.extract_player_id(text)
+                main.extract_ingame_name(text)
+                main.detect_language(text)
+                warm.append(time.perf_counter() - started)
+    finally:
+        main.detect_langs = original
+    results = [(text, main.analyze_text(text)) for text in SAMPLE_MESSAGES]
+    return {
+        "messages": len(SAMPLE_MESSAGES),
+        "rounds": rounds,
+        "cold_us_p50": round(percentile(cold, 50) * 1e6, 1),
+        "cold_us_p95": round(percentile(cold, 95) * 1e6, 1),
+        "warm_us_p50": round(percentile(warm, 50) * 1e6, 1),
+        "langdetect_share": round(calls_per_round / len(SAMPLE_MESSAGES), 3),
+        "languages": dict(Counter(a.language for _, a in results)),
+        "with_id": sum(1 for _, a in results if a.player_id),
+        "with_name": sum(1 for _, a in results if a.name),
+        "intents": dict(Counter(i for _, a in results for i in a.intents)),
+        "samples": [{"text": t, "id": a.player_id, "name": a.name, "language": a.language,
+                     "confidence": a.language_confidence, "intents": sorted(a.intents)} for t, a in results],
+    }
+
+def print_text_analysis_report(report: dict, verbose: bool):
+    print(f"Textanalyse: {report['messages']} Nachrichten x {report['rounds']} | kalt p50 {report['cold_us_p50']} µs, "
+          f"p95 {report['cold_us_p95']} µs | gecacht (3 Abfragen) p50 {report['warm_us_p50']} µs | langdetect bei {report['langdetect_share']:.0%}")
+    print(f"Sprachen {report['languages']} | mit ID {report['with_id']} | mit Name {report['with_name']} | Intents {report['intents']}")
+    if verbose:
+        for sample in report["samples"]:
+            print(f"  {sample['language']} {sample['confidence']:.2f} id={sample['id']} name={sample['name']} {sample['intents']} | {sample['text']}")
+
+def print_report(report: dict):
+    print(f"Tickets: {report['tickets']} | Laufzeit {report['wall_seconds']}s | Antworten {report['replies']} "
+          f"({report['throughput_replies_per_s']}/s) | Timeouts {report['timeouts']} | Fehlerquote {report['error_rate']:.1%}")
+    print(f"Antwortlatenz p50 {report['reply_latency_p50']}s | p95 {report['reply_latency_p95']}s | p99 {report['reply_latency_p99']}s")
+    print(f"Modal-Submit p95 {report['modal_submit_p95']}s | Admin-Callbacks p95 {report['admin_callback_p95']}")
+    print(f"Speicher: Python-Heap-Peak {report['peak_python_heap_mb']} MB | max RSS {report['max_rss_mb']} MB")
+    print(f"Upstream-Calls {report['upstream_calls']} | Fehler {report['upstream_errors']} | Prompt-Zeichen {report['llm_prompt_chars']}")
+    print(f"Discord: {report['discord_sends']} Sends, {report['discord_edits']} Edits")
+    images = report["images"]
+    print(f"Bilder: {images['cdn_requests']} CDN-Abrufe, {images['processed']} verkleinert "
+          f"({images['bytes_in'] / 1024:.0f} KB -> {images['bytes_out'] / 1024:.0f} KB), Dedup {images['dedup_hits']}, "
+          f"Fehler {images['failed']}")
+    cache = report["response_cache"]
+    print(f"Antwort-Cache: Hitrate {cache['hit_rate']:.1%} (Hits {cache['hits']}, Misses {cache['misses']}, "
+          f"nicht cachebar {cache['uncacheable']}) | gespart ~{cache['saved_seconds']}s, ~{cache['saved_tokens']} Prompt-Tokens")
+
+# === BULK-LOOKUP ===
+class FakeContext:
+    def __init__(self, author: FakeMember, channel: FakeTextChannel):
+        self.author = author
+        self.channel = channel
+
+    async def send(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+async def run_bulk_lookup_benchmark(args) -> dict:
+    # !lookup mit args.bulk_lookup Einträgen (jeder fünfte ein Name) gegen den RCON-Stand-in
+    random.seed(args.seed)
+    fake = FakeDiscord(args.discord_latency)
+    fake.install()
+    rcon = RconStandIn(args.rcon_latency, args.rcon_error_rate)
+    llm = LLMStandIn(args.llm_latency, args.llm_error_rate, args.reply_chars)
+    await start_standins(rcon, llm)
+    await start_bot_runtime()
+    entries = [f"Spieler Nummer {i}" if i % 5 == 0 else f"7656119{9000000000 + i:010d}" for i in range(args.bulk_lookup)]
+    started = time.monotonic()
+    try:
+        await main.bulk_lookup_command.callback(FakeContext(fake.admin, fake.admin_channel), text="\n".join(entries))
+    finally:
+        wall = time.monotonic() - started
+        await stop_bot_runtime()
+        await rcon.stop()
+        await llm.stop()
+    embeds = [m for m in fake.admin_channel.messages if m.embed is not None]
+    return {
+        "players": args.bulk_lookup,
+        "wall_seconds": round(wall, 2),
+        "pages": len(embeds),
+        "fields": sum(len(m.embed.fields) for m in embeds),
+        "edits": fake.admin_channel.edits,
+        "summary": next((m.content for m in reversed(fake.admin_channel.messages) if m.content), ""),
+        "upstream_calls": dict(rcon.calls),
+        "upstream_errors": dict(rcon.errors),
+    }
+
+def print_bulk_lookup_report(report: dict):
+    print(f"Bulk-Lookup: {report['players']} Spieler in {report['wall_seconds']}s | {report['pages']} Seiten, "
+          f"{report['fields']} Einträge, {report['edits']} Edits")
+    print(f"Upstream-Calls {report['upstream_calls']} | Fehler {report['upstream_errors']}")
+    print(report["summary"])
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline-Benchmark für den GBG KI Bot")
+    parser.add_argument("--tickets", type=int, default=20, help="parallele Tickets")
+    parser.add_argument("--messages", type=int, default=3, help="Nachrichten pro Ticket (max. 3)")
+    parser.add_argument("--ramp", type=float, default=2.0, help="Tickets über so viele Sekunden verteilt öffnen")
+    parser.add_argument("--think", type=float, default=1.0, help="max. Pause des Spielers nach einer Antwort (s)")
+    parser.add_argument("--reply-timeout", type=float, default=60.0)
+    parser.add_argument("--llm-latency", type=float, default=1.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--rcon-latency", type=float, default=0.2)
+    parser.add_argument("--rcon-error-rate", type=float, default=0.0)
+    parser.add_argument("--discord-latency", type=float, default=0.05)
+    parser.add_argument("--reply-chars", type=int, default=400)
+    parser.add_argument("--no-modal", dest="modal", action="store_false", help="Modal-Submit auslassen")
+    parser.add_argument("--no-admin", dest="admin", action="store_false", help="Admin-Callbacks auslassen")
+    parser.add_argument("--no-images", dest="images", action="store_false", help="keinen Screenshot an die erste Nachricht hängen")
+    parser.add_argument("--image-kb", type=int, default=2048, help="Größe des Stand-in-Screenshots")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true", help="Bot-Logs auf stdout durchlassen")
+    parser.add_argument("--text-analysis", action="store_true", help="nur den Micro-Benchmark der Textanalyse ausführen")
+    parser.add_argument("--rounds", type=int, default=50, help="Durchläufe über das Korpus für --text-analysis")
+    parser.add_argument("--bulk-lookup", type=int, default=0, help="nur !lookup mit so vielen IDs/Namen messen")
+    parser.add_argument("--json", help="Report zusätzlich als JSON schreiben")
+    parser.add_argument("--max-p95", type=float, help="Gate: Exit 1, wenn p95 der Antwortlatenz darüber liegt")
+    parser.add_argument("--max-error-rate", type=float, help="Gate: Exit 1, wenn die Fehlerquote darüber liegt")
+    return parser.parse_args(argv)
+
+# Aktionstyp -> zählt als Strafe (letzte Strafe, player_state, !lookup-Zusammenfassung)
+PUNISHMENT_CASES = {"KICK": True, "TEMPBAN": True, "TEMP_BAN": True, "PERMABAN": True, "PERMA_BAN": True, "PUNISH": True,
+                    "BLACKLIST": True, "UNBAN": False, "REMOVE_TEMP_BAN": False, "REMOVE_PERMA_BAN": False,
+                    "UNBLACKLIST": False, "MESSAGE": False, "": False}
+
+def check_punishment_types() -> list[str]:
+    failures = [f"{t or '(leer)'}: {main.is_punishment(t)} statt {expected}"
+                for t, expected in PUNISHMENT_CASES.items() if main.is_punishment(t) != expected]
+    info = main.PlayerInfo.from_history("76561190000000001", {"received_actions": [
+        {"action_type": "UNBAN", "time": "2025-05-03T20:00:00"},
+        {"action_type": "TEMPBAN", "time": "2025-05-01T20:00:00"},
+    ]})
+    if info.last_punishment_at != main.parse_last_seen("2025-05-01T20:00:00"):
+        failures.append("letzte Strafe zeigt auf den UNBAN statt auf den TEMPBAN")
+    return failures
+
+def check_gates(report: dict, args) -> list[str]:
+    failures = []
+    if args.max_p95 is not None and report["reply_latency_p95"] > args.max_p95:
+        failures.append(f"p95 {report['reply_latency_p95']}s > {args.max_p95}s")
+    if args.max_error_rate is not None and report["error_rate"] > args.max_error_rate:
+        failures.append(f"Fehlerquote {report['error_rate']} > {args.max_error_rate}")
+    return failures
+
+if __name__ == "__main__":
+    cli_args = parse_args()
+    if cli_args.text_analysis:
+        print_text_analysis_report(run_text_analysis_benchmark(cli_args.rounds), cli_args.verbose)
+        check_failures = check_punishment_types()
+        if check_failures:
+            print("STRAFEN-CHECK FEHLGESCHLAGEN: " + "; ".join(check_failures))
+            sys.exit(1)
+        print(f"Strafen-Check: {len(PUNISHMENT_CASES)} Aktionstypen ok")
+        sys.exit(0)
+    if cli_args.bulk_lookup:
+        with contextlib.nullcontext() if cli_args.verbose else contextlib.redirect_stdout(open(os.devnull, 'w')):
+            bulk_report = asyncio.run(run_bulk_lookup_benchmark(cli_args))
+        print_bulk_lookup_report(bulk_report)
+        sys.exit(0)
+    with contextlib.nullcontext() if cli_args.verbose else contextlib.redirect_stdout(open(os.devnull, 'w')):
+        bench_report = asyncio.run(run_benchmark(cli_args))
+    print_report(bench_report)
+    if cli_args.json:
+        with open(cli_args.json, 'w', encoding='utf-8') as f:
+            json.dump(bench_report, f, indent=2, ensure_ascii=False)
+    gate_failures = check_gates(bench_report, cli_args)
+    if gate_failures:
+        print("GATE FEHLGESCHLAGEN: " + "; ".join(gate_failures))
+        sys.exit(1)
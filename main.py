@@ -8,27 +8,42 @@ from dotenv import load_dotenv
 import aiohttp
 from datetime import datetime
 from discord.ui import Button, View, Modal, TextInput
-from flask import Flask
+from aiohttp import web
 import threading
+import logging
+import time
+import unicodedata
+import difflib
+import sqlite3
+import queue
+import random
+import math
+import contextlib
+import contextvars
+import functools
+import itertools
+import hashlib
+import base64
+import sys
+import io
+import signal
+import inspect
+import atexit
+import concurrent.futures
+from collections import OrderedDict, deque
+from contextlib import aclosing
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+from langdetect import DetectorFactory, LangDetectException, detect_langs
+from PIL import Image, ImageOps
 
 load_dotenv()
 
-# Flask für Render Web Service
-app = Flask(__name__)
-
-@app.route('/')
-def home():
-    return "GBG KI Bot is alive! 🚀"
-
-def run_flask():
-    port = int(os.environ.get('PORT', 8080))
-    app.run(host='0.0.0.0', port=port)
-
 intents = discord.Intents.default()
 intents.message_content = True
 intents.guilds = True
 intents.members = True
 intents.reactions = True
+intents.typing = True
 
 bot = commands.Bot(command_prefix="!", intents=intents)
 
@@ -49,16 +64,274 @@ API_HEADERS = {
     "Authorization": f"Bearer {API_KEY}",
     "Content-Type": "application/json"
 }
-GROK_HEADERS = {
-    "Authorization": f"Bearer {GROK_API_KEY}",
-    "Content-Type": "application/json"
-}
 
 ACTIVE_TICKET_CATEGORIES = ["Tickets", "Beanspruchte Tickets"]
 ADMIN_SUMMARY_CHANNEL_ID = 1455199315713851686
 DEBUG_CHANNEL_ID = 1455236964981670121
 ADMIN_ROLE_NAME = "HLL Admin"
 
+# === PROZESS-MODUS ===
+# single: ein Prozess macht alles (Standard). gateway: hält die Discord-Verbindung und verteilt die Ticket-Events
+# über lokale IPC an BOT_WORKERS Worker. worker: bearbeitet die Tickets seiner Partition und spricht Discord nur per REST.
+# Gemeinsamer Zustand liegt im Ticket-Store (TICKET_DB), den alle Prozesse öffnen. Limits wie LLM_MAX_CONCURRENCY
+# und LLM_TOKENS_PER_MINUTE gelten pro Prozess.
+BOT_MODE = os.getenv('BOT_MODE', 'single').strip().lower()
+BOT_WORKERS = max(1, int(os.getenv('BOT_WORKERS', 2)))
+WORKER_INDEX = int(os.getenv('WORKER_INDEX', 0))
+if BOT_MODE not in ("single", "gateway", "worker"):
+    raise ValueError(f"BOT_MODE {BOT_MODE!r} unbekannt (single, gateway, worker)")
+
+def worker_for_channel(channel_id: int) -> int:
+    # Snowflake >> 22 = Erstellzeit in ms; die unteren Bits (Sequenz) sind bei wenig Last fast immer gleich
+    return (channel_id >> 22) % BOT_WORKERS
+
+def owns_channel(channel_id: int) -> bool:
+    if BOT_MODE == "single":
+        return True
+    return BOT_MODE == "worker" and worker_for_channel(channel_id) == WORKER_INDEX
+
+def process_path(path: str) -> str:
+    # Log und Transkript schreibt jeder Worker in eine eigene Datei
+    return f"{path}.worker{WORKER_INDEX}" if path and BOT_MODE == "worker" else path
+
+# === METRICS ===
+# Minimale Prometheus-Metriken ohne Zusatzpaket; ausgeliefert unter /metrics.
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60)
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    parts = [f'{k}="{_escape_label(v)}"' for k, v in key + extra]
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.values: dict = {}
+        METRICS.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_format_labels(k)} {v}" for k, v in self.values.items()]
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self.values: dict = {}  # key -> [bucket_counts, sum, count]
+        METRICS.append(self)
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        entry = self.values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                entry[0][i] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in self.values.items():
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels(key, (('le', bound),))} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+class CallbackMetric:
+    # Wert wird erst beim Scrape aus vorhandenen Stats gelesen (Caches, Queues, Tickets)
+    def __init__(self, name: str, help_text: str, metric_type: str, collect):
+        self.name = name
+        self.help = help_text
+        self.type = metric_type
+        self.collect = collect
+        METRICS.append(self)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines += [f"{self.name}{_format_labels(_label_key(labels))} {value}" for labels, value in self.collect()]
+        return lines
+
+METRICS: list = []
+
+def render_metrics() -> str:
+    lines = []
+    for metric in METRICS:
+        try:
+            lines += metric.render()
+        except Exception as e:
+            lines.append(f"# {metric.name} nicht verfügbar: {e}")
+    return "\n".join(lines) + "\n"
+
+LLM_REQUEST_SECONDS = Histogram("gbg_llm_request_seconds", "Dauer eines LLM-Requests pro Backend")
+LLM_FIRST_TOKEN_SECONDS = Histogram("gbg_llm_first_token_seconds", "Zeit bis zum ersten Token pro Backend")
+LLM_TOKENS = Counter("gbg_llm_tokens_total", "Geschätzte Prompt- und Completion-Tokens")
+RCON_REQUEST_SECONDS = Histogram("gbg_rcon_request_seconds", "Dauer der RCON-API-Requests pro Endpoint")
+DEBOUNCE_WAIT_SECONDS = Histogram("gbg_debounce_wait_seconds", "Gewählte Wartezeit zwischen letzter Nachricht und KI-Anfrage, nach Grund", (0.5, 1, 2, 3, 4, 6, 8, 10, 15))
+DISCORD_SEND_SECONDS = Histogram("gbg_discord_send_seconds", "Latenz von Discord send/edit", (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10))
+
+# === TRACING ===
+# Spans pro Ticket-Nachricht (on_message -> Debounce -> Queue -> KI -> Antwort), über contextvars
+# an Tasks weitergereicht. Ohne TRACE_ENABLED=1 liefern span() und traced() nur No-ops.
+TRACE_ENABLED = os.getenv('TRACE_ENABLED', '0') == '1'
+TRACE_SLOW_SECONDS = float(os.getenv('TRACE_SLOW_SECONDS', 15))
+TRACE_EXPORT_FILE = os.getenv('TRACE_EXPORT_FILE', '').strip()
+
+current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+trace_counter = itertools.count(1)
+
+class Span:
+    __slots__ = ("name", "parent", "root", "trace_id", "start", "end", "children", "attrs", "_token")
+
+    def __init__(self, name: str, parent: "Span | None", attrs: dict):
+        self.name = name
+        self.parent = parent
+        self.root = parent.root if parent else self
+        self.trace_id = parent.trace_id if parent else ""
+        self.start = time.monotonic()
+        self.end = None
+        self.children = []
+        self.attrs = attrs
+        self._token = None
+        if parent:
+            parent.children.append(self)
+
+    def __enter__(self):
+        self._token = current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(error=exc_type.__name__ if exc_type and exc_type is not asyncio.CancelledError else None)
+        current_span.reset(self._token)
+        return False
+
+    def close(self, error: str | None = None):
+        if self.end is None:
+            self.end = time.monotonic()
+            if error:
+                self.attrs["error"] = error
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.monotonic()) - self.start
+
+class _NoopSpan:
+    # Ersatz für Span ohne Tracing bzw. nach Ende des Root-Spans: als Kontextmanager liefert er None wie nullcontext
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def close(self, error: str | None = None):
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+def span(name: str, **attrs):
+    if not TRACE_ENABLED:
+        return NOOP_SPAN
+    parent = current_span.get()
+    if parent is None or parent.root.end is not None:
+        return NOOP_SPAN
+    return Span(name, parent, attrs)
+
+def mark(name: str, **attrs):
+    # Zeitpunkt ohne Dauer, z. B. "erste sichtbare Antwort"
+    if TRACE_ENABLED and current_span.get() is not None:
+        span(name, **attrs).close()
+
+def traced(name: str):
+    def decorator(fn):
+        if not TRACE_ENABLED:
+            return fn
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def start_trace(name: str, channel_id: int):
+    if not TRACE_ENABLED:
+        return None
+    root = Span(name, None, {"channel_id": channel_id})
+    root.trace_id = f"{channel_id}-{next(trace_counter)}"
+    current_span.set(root)
+    return root
+
+def traced_job(job, name: str):
+    # Scheduler-Jobs laufen in Worker-Tasks: Trace-Kontext vom Einreichen mitnehmen
+    if not TRACE_ENABLED or current_span.get() is None:
+        return job
+    parent = current_span.get()
+    queued = Span("llm_queue_wait", parent, {})
+    async def wrapper():
+        queued.close()
+        token = current_span.set(parent)
+        try:
+            with span(name):
+                return await job()
+        finally:
+            await finish_trace()
+            current_span.reset(token)
+    return wrapper
+
+def render_span_tree(root: Span) -> str:
+    lines = []
+    def walk(s: Span, depth: int):
+        offset = (s.start - root.start) * 1000
+        extra = " ".join(f"{k}={v}" for k, v in s.attrs.items())
+        lines.append(f"{'  ' * depth}{s.name} +{offset:.0f}ms {s.duration * 1000:.0f}ms{' ' + extra if extra else ''}")
+        for child in s.children:
+            walk(child, depth + 1)
+    walk(root, 0)
+    return "\n".join(lines)
+
+def export_trace(root: Span):
+    spans = []
+    def walk(s: Span, depth: int):
+        spans.append({"name": s.name, "depth": depth, "start_ms": round((s.start - root.start) * 1000, 1),
+                      "duration_ms": round(s.duration * 1000, 1), "attrs": s.attrs})
+        for child in s.children:
+            walk(child, depth + 1)
+    walk(root, 0)
+    record = {"trace_id": root.trace_id, "ts": time.time(), "name": root.name, "duration_ms": round(root.duration * 1000, 1), "spans": spans}
+    with open(TRACE_EXPORT_FILE, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+async def finish_trace(status: str = "ok"):
+    if not TRACE_ENABLED:
+        return
+    current = current_span.get()
+    if current is None or current.root.end is not None:
+        return
+    root = current.root
+    root.attrs["status"] = status
+    root.close()
+    if TRACE_EXPORT_FILE:
+        try:
+            await asyncio.to_thread(export_trace, root)
+        except OSError as e:
+            print(f"Trace-Export fehlgeschlagen: {e}")
+    if root.duration >= TRACE_SLOW_SECONDS:
+        await log_debug(f"Langsamer Trace {root.trace_id} ({root.duration:.1f}s):\n{render_span_tree(root)}", root.attrs.get("channel_id"))
+
 # === SPRACH-TEXTE FÜR MODAL ===
 MODAL_TITLES = {
     'de': "Exakten Ingame-Namen oder Steam-ID eingeben",
@@ -79,159 +352,604 @@ MODAL_PLACEHOLDERS = {
 def has_admin_role(member: discord.Member) -> bool:
     return any(role.name == ADMIN_ROLE_NAME for role in member.roles)
 
-def extract_player_id(text: str) -> str | None:
-    match = re.search(r'(7656119\d{10}|[a-f0-9]{32})', text)
-    return match.group(0) if match else None
-
-def extract_ingame_name(text: str) -> str | None:
-    keyword_pattern = r'(?:name|ingame|bin|heiße|mein name|spiele als|als |ich bin|Name ist|der Name|Name:)[\s:]*([^\n\r<@!&]{4,30})'
-    match = re.search(keyword_pattern, text, re.IGNORECASE)
-    if match:
-        name = match.group(1).strip()
-        if len(name) >= 4:
-            return name
-    fallback_pattern = r'\b([A-Za-z0-9_\-\.\[\]\(\){} ]{5,30})\b'
-    matches = re.finditer(fallback_pattern, text)
-    for m in matches:
+# === TEXTANALYSE ===
+# Eine Analyse pro Nachrichtentext (ID, Namenskandidaten, Sprache, Intents) mit vorkompilierten Patterns,
+# gecacht – on_message, Transcript, Fast-Model-Entscheidung und Modal fragen alle denselben Text ab.
+PLAYER_ID_PATTERN = re.compile(r'7656119\d{10}|[a-f0-9]{32}')
+# Gruppen: 1 eindeutige Selbstangabe, 2 "name"/"ingame" (eindeutig nur mit "ist"/"is"/":"), 3 "bin"/"als", 4 Kopula/Doppelpunkt,
+# 5 Name: optionales Clan-Tag ("[GBG] ", "℧ | ") plus ein Wort – Rest des Satzes und "(…)" gehören nicht dazu
+NAME_KEYWORD_PATTERN = re.compile(
+    r'\b(?:(mein name|my name|heiße|spiele als|play as)|(der name|ingame[- ]?name|name|ingame)|(ich bin|bin|als))\b'
+    r'((?:\s+(?:ist|is)\b)?\s*:?)\s*'
+    r'((?:[\[{(][^\]})\s]{1,8}[\]})]\s*|[^\s\w]{1,3}\s*\|\s*|\S{1,6}\s*\|\s*)?[^\s(<@!&]{3,30})', re.IGNORECASE)
+NAME_TRAILING_PUNCTUATION = ".,;:!?"
+NAME_FALLBACK_PATTERN = re.compile(r'\b([A-Za-z0-9_\-\.\[\]\(\){} ]{5,30})\b')
+NAME_FALLBACK_HINT = re.compile(r'[A-Z0-9\[\]]')
+NAME_FALLBACK_STRONG = re.compile(r'[\[\]\(\){}_]|\d')
+NAME_FALLBACK_BLACKLIST = frozenset(["hallo", "hi", "hey", "hallooo", "moinc", "heyo"])
+NAME_MAX_CANDIDATES = 3
+WORD_PATTERN = re.compile(r"[a-zäöüß]+")
+# Wörter, die nur in einer Sprache vorkommen – "hi", "kick", "teamkill" zählen für keine Seite
+LANGUAGE_WORDS = {
+    'en': frozenset(["hello", "help", "please", "thanks", "thank", "sorry", "unban", "votekick", "problem", "issue", "was",
+                     "banned", "why", "kicked", "the", "my", "i", "you", "what", "is", "am", "got", "from"]),
+    'de': frozenset(["hallo", "moin", "hilfe", "bitte", "danke", "entschuldigung", "gebannt", "gekickt", "warum", "ich",
+                     "nicht", "wurde", "bin", "der", "die", "das", "und", "ist", "mein", "wieso", "weshalb"]),
+}
+# Alltagswörter: Kandidaten aus "bin"/"als" und dem Fallback, die überwiegend daraus bestehen, sind Sätze, keine Namen
+NAME_STOP_WORDS = LANGUAGE_WORDS['en'] | LANGUAGE_WORDS['de'] | frozenset([
+    "worden", "seit", "gestern", "heute", "server", "ohne", "grund", "einfach", "habe", "hab", "wegen", "mal", "mich", "mir",
+    "auf", "von", "vom", "mit", "aus", "einem", "einen", "ein", "eine", "schon", "immer", "noch", "wieder", "gerade", "jetzt",
+    "spiel", "ban", "kick", "been", "have", "since", "yesterday", "today", "for", "and", "not", "did", "because", "game",
+    "just", "again", "without", "reason", "me", "on", "of", "a", "an", "to", "in",
+])
+NAME_STOP_WORD_RATIO = 0.5
+NAME_WEAK_CONFIDENCE = 0.5  # "bin"/"als": unter NAME_REMOTE_MIN_CONFIDENCE – nur lokaler Index, keine Remote-Suche
+LANGDETECT_MIN_CHARS = 12
+LANGDETECT_MIN_PROB = 0.8
+INTENT_PATTERN = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in {
+    "ban": r"\b(?:un)?bann?|gebannt|entbann|blacklist|perma",
+    "kick": r"kick|gekickt|rausgeworfen|geflogen",
+    "teamkill": r"teamkill|\btk\b",
+    "report": r"report|melden|cheat|hack|aimbot",
+    "thanks": r"danke|thanks|thx|\bty\b",
+    "greeting": r"^\s*(?:hallo|hi|hey|moin|servus|hello)\b",
+}.items()), re.IGNORECASE)
+SUBSTANTIVE_INTENTS = frozenset(["ban", "kick", "teamkill", "report"])
+# Eigene ID: "meine ID ist …", "my steam id: …", "… ist meine id", "ich bin …" – nicht jede ID im Text gehört dem Ticket-Ersteller
+SELF_ID_PATTERN = re.compile(r"\b(?:meine?|my)\s+(?:steam[- ]?|player[- ]?|spieler[- ]?)?id\b|\b(?:ich bin|i am|i'm)\b", re.IGNORECASE)
+SELF_ID_MAX_EXTRA_CHARS = 3
+
+DetectorFactory.seed = 0  # langdetect ist sonst nicht deterministisch
+
+class TextAnalysis:
+    __slots__ = ("player_id", "name_candidates", "language", "language_confidence", "intents")
+
+    def __init__(self, player_id, name_candidates, language, language_confidence, intents):
+        self.player_id = player_id
+        self.name_candidates = name_candidates  # [(Name, Konfidenz)], beste zuerst
+        self.language = language
+        self.language_confidence = language_confidence
+        self.intents = intents
+
+    @property
+    def name(self) -> tuple[str, float] | None:
+        return self.name_candidates[0] if self.name_candidates else None
+
+def looks_like_sentence(candidate: str) -> bool:
+    words = WORD_PATTERN.findall(candidate.lower())
+    return bool(words) and sum(1 for w in words if w in NAME_STOP_WORDS) / len(words) >= NAME_STOP_WORD_RATIO
+
+def find_name_candidates(text: str) -> list[tuple[str, float]]:
+    # Explizite Angaben ("mein Name ist ...", "ingame: ...") sind sicher und dürfen remote gesucht werden. Bloßes
+    # "name"/"ingame", "bin"/"als" und der Fallback über Großbuchstaben/Ziffern treffen oft normale Sätze: Konfidenz
+    # bleibt unter NAME_REMOTE_MIN_CONFIDENCE, Kandidaten aus überwiegend Alltagswörtern fallen ganz raus.
+    explicit = []
+    for match in NAME_KEYWORD_PATTERN.finditer(text):
+        name = match.group(5).strip().rstrip(NAME_TRAILING_PUNCTUATION)
+        if len(name) < 4 or looks_like_sentence(name):
+            continue
+        certain = match.group(1) or (match.group(2) and match.group(4).strip())
+        explicit.append((name, 0.9 if certain else NAME_WEAK_CONFIDENCE))
+        break
+    candidates = []
+    for m in NAME_FALLBACK_PATTERN.finditer(text):
+        if len(explicit) + len(candidates) >= NAME_MAX_CANDIDATES:
+            break
         candidate = m.group(1).strip()
-        if len(candidate) >= 5 and re.search(r'[A-Z0-9\[\]]', candidate) and candidate.lower() not in ["hallo", "hi", "hey", "hallooo", "moinc", "heyo"]:
-            return candidate
-    return None
+        if (len(candidate) >= 5 and NAME_FALLBACK_HINT.search(candidate) and candidate.lower() not in NAME_FALLBACK_BLACKLIST
+                and not looks_like_sentence(candidate) and all(candidate != name for name, _ in explicit + candidates)):
+            confidence = 0.2
+            if NAME_FALLBACK_STRONG.search(candidate):
+                confidence += 0.2
+            if " " not in candidate:
+                confidence += 0.1
+            candidates.append((candidate, confidence))
+    candidates.sort(key=lambda c: c[1], reverse=True)
+    return explicit + candidates
+
+def guess_language(text: str, text_lower: str) -> tuple[str, float]:
+    words = WORD_PATTERN.findall(text_lower)
+    en = sum(1 for w in words if w in LANGUAGE_WORDS['en'])
+    de = sum(1 for w in words if w in LANGUAGE_WORDS['de'])
+    if en + de:
+        language = 'en' if en > de else 'de'
+        confidence = 0.5 + 0.5 * abs(en - de) / (en + de)
+    else:
+        language, confidence = 'de', 0.0
+    if confidence < LANGDETECT_MIN_PROB and len(text.strip()) >= LANGDETECT_MIN_CHARS:
+        # Mehrdeutig: echter Detektor, aber nur de/en mit hoher Wahrscheinlichkeit übernehmen
+        try:
+            for result in detect_langs(text):
+                if result.lang in ('de', 'en') and result.prob >= LANGDETECT_MIN_PROB:
+                    return result.lang, round(result.prob, 2)
+        except LangDetectException:
+            pass
+    return language, round(confidence, 2)
 
-def detect_language(text: str) -> str:
-    if not text.strip():
-        return 'de'
+@functools.lru_cache(maxsize=2048)
+def analyze_text(text: str) -> TextAnalysis:
     text_lower = text.lower()
-    english_words = ["hello", "hi", "hey", "help", "please", "thanks", "thank you", "sorry", "ban", "kick", "unban", "teamkill", "votekick", "problem", "issue", "was", "banned", "why", "kicked"]
-    german_words = ["hallo", "hi", "hey", "hilfe", "bitte", "danke", "entschuldigung", "gebannt", "kick", "warum", "teamkill"]
+    id_match = PLAYER_ID_PATTERN.search(text)
+    language, confidence = guess_language(text, text_lower) if text.strip() else ('de', 0.0)
+    intents = frozenset(m.lastgroup for m in INTENT_PATTERN.finditer(text))
+    return TextAnalysis(id_match.group(0) if id_match else None, find_name_candidates(text), language, confidence, intents)
+
+def is_self_identification(text: str, player_id: str) -> bool:
+    # Nur solche IDs als Verknüpfung Discord-User -> Spieler merken; wer jemanden per ID meldet, ist nicht dieser Spieler
+    analysis = analyze_text(text)
+    if analysis.player_id != player_id or "report" in analysis.intents:
+        return False
+    rest = text.replace(player_id, "").strip(" \t\n`'\".,:;!-")
+    return len(rest) <= SELF_ID_MAX_EXTRA_CHARS or bool(SELF_ID_PATTERN.search(text))
 
-    en_count = sum(word in text_lower for word in english_words)
-    de_count = sum(word in text_lower for word in german_words)
+def extract_player_id(text: str) -> str | None:
+    return analyze_text(text).player_id
 
-    if en_count > de_count and en_count > 0:
-        return 'en'
-    return 'de'
+def extract_ingame_name(text: str) -> tuple[str, float] | None:
+    return analyze_text(text).name
 
-# === RCON API FUNKTIONEN ===
-async def api_clear_temp_ban(player_id: str, channel_id: int):
-    if not player_id or not http_session:
-        return False
+def detect_language(text: str) -> str:
+    return analyze_text(text).language
+
+def warm_language_detector():
+    # Erster detect_langs-Aufruf lädt alle Sprachprofile (~0,3s) – nicht im Event-Loop
     try:
-        async with http_session.post(
-                f"{API_BASE_URL}/remove_temp_ban",
-                headers=API_HEADERS,
-                json={"player_id": player_id}
-        ) as resp:
-            resp_text = await resp.text()
-            await log_debug(f"Temp-Clear Endpoint remove_temp_ban – Status {resp.status} | Response: {resp_text[:200]}",
-                            channel_id)
-            if resp.status == 200:
-                result_json = await resp.json()
-                result = result_json.get("result")
-                success = result in (True, None) or "success" in str(result).lower()
-                status = "erfolgreich" if success else "ohne Effekt (kein Temp-Ban)"
-                await log_debug(f"Temp-Ban-Clear für {player_id}: {status}", channel_id)
-                return success
-    except Exception as e:
-        await log_debug(f"Temp-Clear Exception: {e}", channel_id)
-    return False
+        detect_langs("warm up language profiles")
+    except LangDetectException:
+        pass
 
-async def api_clear_full_bans(player_id: str, channel_id: int):
-    if not player_id or not http_session:
-        return False
-    success = False
-    endpoints = [
-        "remove_temp_ban",
-        "unban",
-        "remove_perma_ban",
-        "unblacklist_player"
-    ]
-    for endpoint in endpoints:
+# === RCON API FUNKTIONEN ===
+# Unban-Endpoints laufen parallel, jeder mit eigenem Timeout und begrenztem Retry.
+# Ergebnis pro Endpoint: {"endpoint", "status", "latency_ms", "effect", "detail"}
+RCON_ENDPOINT_TIMEOUT = float(os.getenv('RCON_ENDPOINT_TIMEOUT', 10))
+RCON_ENDPOINT_RETRIES = int(os.getenv('RCON_ENDPOINT_RETRIES', 1))
+FULL_CLEAR_ENDPOINTS = ["remove_temp_ban", "unban", "remove_perma_ban", "unblacklist_player"]
+
+EFFECT_REMOVED = "entfernt"
+EFFECT_NONE = "ohne Effekt"
+EFFECT_TIMEOUT = "Timeout"
+EFFECT_ERROR = "Fehler"
+
+@traced("rcon_clear_endpoint")
+async def call_clear_endpoint(endpoint: str, player_id: str) -> dict:
+    result = {"endpoint": endpoint, "status": None, "latency_ms": 0, "effect": EFFECT_ERROR, "detail": ""}
+    started = time.monotonic()
+    for attempt in range(RCON_ENDPOINT_RETRIES + 1):
         try:
             async with http_session.post(
                     f"{API_BASE_URL}/{endpoint}",
                     headers=API_HEADERS,
-                    json={"player_id": player_id}
+                    json={"player_id": player_id},
+                    timeout=aiohttp.ClientTimeout(total=RCON_ENDPOINT_TIMEOUT)
             ) as resp:
                 resp_text = await resp.text()
-                await log_debug(f"Full-Clear Endpoint {endpoint} – Status {resp.status} | Response: {resp_text[:200]}",
-                                channel_id)
+                result["status"] = resp.status
+                result["detail"] = resp_text[:200]
                 if resp.status == 200:
-                    result_json = await resp.json()
-                    result = result_json.get("result")
-                    if result in (True, None) or "success" in str(result).lower():
-                        success = True
-        except Exception as e:
-            await log_debug(f"Full-Clear {endpoint} Exception: {e}", channel_id)
+                    try:
+                        api_result = json.loads(resp_text).get("result")
+                    except (ValueError, AttributeError):
+                        api_result = resp_text
+                    success = api_result in (True, None) or "success" in str(api_result).lower()
+                    result["effect"] = EFFECT_REMOVED if success else EFFECT_NONE
+                    break
+                result["effect"] = EFFECT_ERROR
+                if resp.status < 500:
+                    break  # 4xx wird durch Wiederholen nicht besser
+        except asyncio.TimeoutError:
+            result["effect"] = EFFECT_TIMEOUT
+            result["detail"] = f"> {RCON_ENDPOINT_TIMEOUT:.0f}s"
+        except aiohttp.ClientError as e:
+            result["effect"] = EFFECT_ERROR
+            result["detail"] = str(e)[:200]
+        if attempt < RCON_ENDPOINT_RETRIES:
+            await asyncio.sleep(0.5 * (attempt + 1))
+    result["latency_ms"] = int((time.monotonic() - started) * 1000)
+    RCON_REQUEST_SECONDS.observe(time.monotonic() - started, endpoint=endpoint)
+    record_upstream("rcon", endpoint=endpoint, status=result["status"], effect=result["effect"], latency_ms=result["latency_ms"])
+    return result
+
+def format_clear_results(results: list[dict]) -> str:
+    lines = []
+    for r in results:
+        status = r["status"] if r["status"] is not None else "–"
+        lines.append(f"{r['endpoint']}: {r['effect']} (Status {status}, {r['latency_ms']} ms)")
+    return "\n".join(lines)
+
+async def api_clear_temp_ban(player_id: str, channel_id: int) -> dict | None:
+    if not player_id or not http_session:
+        return None
+    result = await call_clear_endpoint("remove_temp_ban", player_id)
+    player_history_cache.invalidate(("id", player_id))
+    await log_debug(f"Temp-Ban-Clear für {player_id}: {format_clear_results([result])} | Response: {result['detail']}", channel_id)
+    return result
+
+async def api_clear_full_bans(player_id: str, channel_id: int) -> list[dict]:
+    if not player_id or not http_session:
+        return []
+    results = await asyncio.gather(*(call_clear_endpoint(endpoint, player_id) for endpoint in FULL_CLEAR_ENDPOINTS))
+    player_history_cache.invalidate(("id", player_id))
+    success = any(r["effect"] == EFFECT_REMOVED for r in results)
     status = "erfolgreich (mind. ein Ban/Blacklist entfernt)" if success else "ohne Effekt"
-    await log_debug(f"Full Ban/Blacklist-Clear für {player_id}: {status}", channel_id)
-    return success
+    await log_debug(f"Full Ban/Blacklist-Clear für {player_id}: {status}\n{format_clear_results(results)}", channel_id)
+    return results
+
+# === PLAYER-HISTORY CACHE ===
+# get_players_history ist langsam – Ergebnisse pro player_id bzw. normalisiertem Namen cachen.
+# "Nichts gefunden" wird kürzer gecacht, parallele Anfragen auf denselben Key teilen sich einen Request.
+HISTORY_CACHE_TTL = float(os.getenv('HISTORY_CACHE_TTL', 300))
+HISTORY_CACHE_NEGATIVE_TTL = float(os.getenv('HISTORY_CACHE_NEGATIVE_TTL', 60))
+HISTORY_CACHE_MAX_ENTRIES = int(os.getenv('HISTORY_CACHE_MAX_ENTRIES', 500))
+
+class RconApiError(Exception):
+    def __init__(self, endpoint: str, status: int):
+        super().__init__(f"{endpoint} – Status {status}")
+        self.endpoint = endpoint
+        self.status = status
+
+class AsyncTTLCache:
+    def __init__(self, ttl: float, negative_ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._inflight: dict = {}
+        self.stats = {"hits": 0, "negative_hits": 0, "misses": 0, "inflight_joins": 0, "evictions": 0}
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def set(self, key, value):
+        ttl = self.ttl if value else self.negative_ttl
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+
+    async def get_or_fetch(self, key, fetch):
+        found, value = self.get(key)
+        if found:
+            self.stats["hits" if value else "negative_hits"] += 1
+            return value
+        task = self._inflight.get(key)
+        if task:
+            self.stats["inflight_joins"] += 1
+        else:
+            self.stats["misses"] += 1
+            task = asyncio.create_task(self._fetch_and_store(key, fetch))
+            self._inflight[key] = task
+        # shield: bricht ein Wartender ab, läuft der gemeinsame Request für die anderen weiter
+        return await asyncio.shield(task)
 
-# === PLAYER INFO ===
-async def search_and_set_best_player_id(channel_id: int, name: str) -> bool:
-    ticket = tickets.get(channel_id)
-    if not ticket or not name or not http_session:
-        return False
+    async def _fetch_and_store(self, key, fetch):
+        try:
+            value = await fetch()
+            self.set(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+player_history_cache = AsyncTTLCache(HISTORY_CACHE_TTL, HISTORY_CACHE_NEGATIVE_TTL, HISTORY_CACHE_MAX_ENTRIES)
+
+def normalize_name_query(name: str) -> str:
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(c for c in name if not unicodedata.combining(c))
+    return " ".join(name.casefold().split())
+
+@traced("rcon_get_players_history")
+async def _get_players_history(params: dict) -> dict | None:
+    started = time.monotonic()
+    status = None
     try:
-        async with http_session.get(
-                f"{API_BASE_URL}/get_players_history",
-                headers=API_HEADERS,
-                params={"player_name": name, "exact_name_match": "False", "ignore_accent": "True", "page_size": 20}
-        ) as resp:
+        async with http_session.get(f"{API_BASE_URL}/get_players_history", headers=API_HEADERS, params=params) as resp:
+            status = resp.status
             if resp.status != 200:
-                return False
+                raise RconApiError("get_players_history", resp.status)
             data = await resp.json()
-            players = data.get("result", {}).get("players", []) if isinstance(data.get("result"), dict) else []
-            if not players:
-                return False
-            players_sorted = sorted(players, key=lambda p: max([datetime.fromisoformat(n.get("last_seen", "1970-01-01")).timestamp() for n in p.get("names", [])], default=0), reverse=True)
-            best_id = players_sorted[0].get("player_id")
-            if best_id and best_id != ticket.player_id:
-                ticket.player_id = best_id
-                await add_player_info_to_history(channel_id)
-                await update_escalation_embed(channel_id)
-                return True
-    except Exception as e:
-        await log_debug(f"Search Exception: {e}", channel_id)
-    return False
-
-async def add_player_info_to_history(channel_id: int):
-    ticket = tickets.get(channel_id)
-    if not ticket or not ticket.player_id or ticket.player_info_added or not http_session:
-        return
+    finally:
+        RCON_REQUEST_SECONDS.observe(time.monotonic() - started, endpoint="get_players_history")
+        record_upstream("rcon", endpoint="get_players_history", by="id" if "player_id" in params else "name",
+                        status=status, latency_ms=int((time.monotonic() - started) * 1000))
+    result = data.get("result")
+    return result if isinstance(result, dict) and result else None
+
+async def fetch_player_history(player_id: str) -> dict | None:
+    async def fetch():
+        result = await _get_players_history({"player_id": player_id, "page_size": 30})
+        if result:
+            await name_index.add_players([{"player_id": player_id, "names": result.get("names")}])
+        return result
+    return await player_history_cache.get_or_fetch(("id", player_id), fetch)
+
+async def fetch_players_by_name(name: str) -> list:
+    async def fetch():
+        result = await _get_players_history({"player_name": name, "exact_name_match": "False", "ignore_accent": "True", "page_size": 20})
+        players = (result or {}).get("players", [])
+        await name_index.add_players(players)
+        return players
+    return await player_history_cache.get_or_fetch(("name", normalize_name_query(name)), fetch)
+
+# === NAME INDEX ===
+# Lokaler Index Name/Alias -> player_id aus allen get_players_history Antworten.
+# Wird zuerst gefragt; remote gesucht wird nur bei Index-Miss und sicherem Namenskandidaten.
+NAME_INDEX_DB = os.getenv('NAME_INDEX_DB', '').strip()
+NAME_INDEX_MAX_ENTRIES = int(os.getenv('NAME_INDEX_MAX_ENTRIES', 20000))
+NAME_INDEX_MIN_SCORE = float(os.getenv('NAME_INDEX_MIN_SCORE', 0.85))
+NAME_REMOTE_MIN_CONFIDENCE = float(os.getenv('NAME_REMOTE_MIN_CONFIDENCE', 0.6))
+
+def name_key(name: str) -> str:
+    return "".join(c for c in normalize_name_query(name) if c.isalnum())
+
+def name_aliases(name: str) -> set[str]:
+    # Voller Name plus Name ohne Clan-Tag ("[GBG] Foo", "℧ | Foo", "Foo (GBG)")
+    aliases = {name_key(name)}
+    without_tag = re.sub(r'[\[\({].*?[\]\)}]', ' ', name)
+    if "|" in without_tag:
+        without_tag = without_tag.rsplit("|", 1)[1]
+    aliases.add(name_key(without_tag))
+    return {a for a in aliases if len(a) >= 3}
+
+def parse_last_seen(value) -> float:
     try:
-        async with http_session.get(
-                f"{API_BASE_URL}/get_players_history",
-                headers=API_HEADERS,
-                params={"player_id": ticket.player_id, "page_size": 30}
-        ) as resp:
-            if resp.status != 200:
-                await log_debug(f"Player-Info Abruf fehlgeschlagen (Status {resp.status})", channel_id)
-                return
-            data = await resp.json()
-            await log_debug(f"Roh-Player-Info Response: {json.dumps(data, ensure_ascii=False)}", channel_id)
+        return datetime.fromisoformat(value or "1970-01-01").timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+def best_fuzzy_alias(key: str, aliases: list[str]) -> tuple[str | None, float]:
+    best_alias = None
+    best_score = 0.0
+    matcher = difflib.SequenceMatcher(b=key, autojunk=False)
+    for alias in aliases:
+        matcher.set_seq1(alias)
+        if matcher.real_quick_ratio() < NAME_INDEX_MIN_SCORE or matcher.quick_ratio() < NAME_INDEX_MIN_SCORE:
+            continue
+        ratio = matcher.ratio()
+        if ratio > best_score:
+            best_alias, best_score = alias, ratio
+    return (best_alias, best_score) if best_score >= NAME_INDEX_MIN_SCORE else (None, 0.0)
+
+class NameIndex:
+    def __init__(self, db_path: str = "", max_entries: int = NAME_INDEX_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()  # alias -> {player_id: last_seen}
+        self._db = None
+        self._db_lock = threading.Lock()
+        self.stats = {"exact_hits": 0, "fuzzy_hits": 0, "misses": 0}
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS name_index (alias TEXT, player_id TEXT, last_seen REAL, PRIMARY KEY (alias, player_id))")
+            for alias, player_id, last_seen in self._db.execute("SELECT alias, player_id, last_seen FROM name_index ORDER BY last_seen"):
+                self._store(alias, player_id, last_seen)
+
+    def _store(self, alias: str, player_id: str, last_seen: float):
+        ids = self._entries.setdefault(alias, {})
+        ids[player_id] = max(last_seen, ids.get(player_id, 0.0))
+        self._entries.move_to_end(alias)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _persist(self, rows: list):
+        with self._db_lock:
+            self._db.executemany(
+                "INSERT INTO name_index (alias, player_id, last_seen) VALUES (?, ?, ?) "
+                "ON CONFLICT(alias, player_id) DO UPDATE SET last_seen = max(last_seen, excluded.last_seen)", rows)
+            self._db.commit()
+
+    async def add_players(self, players: list):
+        rows = []
+        for player in players:
+            player_id = player.get("player_id")
+            if not player_id:
+                continue
+            for entry in player.get("names") or []:
+                name = entry.get("name") if isinstance(entry, dict) else entry
+                if not isinstance(name, str):
+                    continue
+                last_seen = parse_last_seen(entry.get("last_seen") if isinstance(entry, dict) else None)
+                for alias in name_aliases(name):
+                    self._store(alias, player_id, last_seen)
+                    rows.append((alias, player_id, last_seen))
+        if rows and self._db:
+            await asyncio.to_thread(self._persist, rows)
+
+    async def lookup(self, name: str, exact_only: bool = False) -> tuple[str, float] | None:
+        # (player_id, Score); bei mehreren IDs gewinnt die zuletzt gesehene
+        key = name_key(name)
+        if len(key) < 3:
+            return None
+        score = 1.0
+        ids = self._entries.get(key)
+        if ids:
+            self.stats["exact_hits"] += 1
+        else:
+            best_alias, best_score = None, 0.0
+            if not exact_only:
+                # O(N) über alle Aliase – auf einer Kopie der Keys im Thread, nicht im Event-Loop
+                best_alias, best_score = await asyncio.to_thread(best_fuzzy_alias, key, list(self._entries))
+            ids = self._entries.get(best_alias) if best_alias else None
+            if not ids:
+                self.stats["misses"] += 1
+                return None
+            self.stats["fuzzy_hits"] += 1
+            score = best_score
+        return max(ids.items(), key=lambda item: item[1])[0], score
+
+    def __len__(self):
+        return len(self._entries)
+
+name_index = NameIndex(NAME_INDEX_DB)
 
-            player_data = data.get("result", {})
-            received_actions = player_data.get("received_actions", [])
-            blacklists = player_data.get("blacklists", [])
-            is_blacklisted = player_data.get("is_blacklisted", False)
+# === PLAYER INFO ===
+# Kompakter Datensatz pro Ticket aus get_players_history – Prompt-Snippet und Embed werden daraus gebaut.
+# Nur diese Typen sind Strafen – UNBAN, REMOVE_TEMP_BAN usw. enthalten auch "BAN", heben aber eine Strafe auf
+PUNISHMENT_TYPES = frozenset(["KICK", "PUNISH", "TEMPBAN", "TEMP_BAN", "PERMABAN", "PERMA_BAN", "BAN", "BLACKLIST"])
+PLAYER_INFO_RECENT_ACTIONS = int(os.getenv('PLAYER_INFO_RECENT_ACTIONS', 3))
+
+def is_punishment(action_type: str) -> bool:
+    action_type = (action_type or "").upper()
+    return action_type in PUNISHMENT_TYPES
+
+def format_age(seconds: float) -> str:
+    if seconds < 3600:
+        return f"{max(1, int(seconds // 60))} Min."
+    if seconds < 86400:
+        return f"{int(seconds // 3600)} Std."
+    return f"{int(seconds // 86400)} Tagen"
+
+class PlayerInfo:
+    __slots__ = ("player_id", "name", "recent", "counts", "total_actions", "blacklisted", "blacklist_reasons", "last_punishment_at")
+
+    def __init__(self, player_id: str, name: str = "", recent: list | None = None, counts: dict | None = None, total_actions: int = 0,
+                 blacklisted: bool = False, blacklist_reasons: list | None = None, last_punishment_at: float = 0.0):
+        self.player_id = player_id
+        self.name = name
+        self.recent = recent or []  # neueste zuerst: {"type", "reason", "by", "time"}
+        self.counts = counts or {}
+        self.total_actions = total_actions
+        self.blacklisted = blacklisted
+        self.blacklist_reasons = blacklist_reasons or []
+        self.last_punishment_at = last_punishment_at
+
+    @classmethod
+    def from_history(cls, player_id: str, data: dict | None) -> "PlayerInfo":
+        data = data or {}
+        actions = data.get("received_actions") or []
+        counts = {}
+        last_punishment_at = 0.0
+        for action in actions:
+            action_type = (action.get("action_type") or "UNBEKANNT").upper()
+            counts[action_type] = counts.get(action_type, 0) + 1
+            if is_punishment(action_type):
+                last_punishment_at = max(last_punishment_at, parse_last_seen(action.get("time")))
+        recent = [{"type": (a.get("action_type") or "UNBEKANNT").upper(), "reason": (a.get("reason") or "kein Grund")[:120],
+                   "by": a.get("by") or "unbekannt", "time": a.get("time") or ""} for a in actions[:PLAYER_INFO_RECENT_ACTIONS]]
+        names = sorted(data.get("names") or [], key=lambda n: parse_last_seen(n.get("last_seen")), reverse=True)
+        blacklists = data.get("blacklists") or []
+        return cls(
+            player_id=player_id,
+            name=names[0].get("name", "") if names else "",
+            recent=recent,
+            counts=dict(sorted(counts.items(), key=lambda x: x[1], reverse=True)),
+            total_actions=len(actions),
+            blacklisted=bool(data.get("is_blacklisted")),
+            blacklist_reasons=[str(b.get("reason") or "ohne Grund")[:120] for b in blacklists if isinstance(b, dict)][:3],
+            last_punishment_at=last_punishment_at,
+        )
 
-            actions_summary = "Keine received_actions gefunden."
-            if received_actions:
-                latest = received_actions[0]
-                last_action = latest.get("action_type", "Unbekannt")
-                last_reason = latest.get("reason", "kein Grund")
-                last_by = latest.get("by", "unbekannt")
-                last_time = latest.get("time", "unbekannt")
-                actions_summary = f"Letzter Action: {last_action} wegen '{last_reason}' am {last_time} von {last_by}. Vollständige received_actions (neueste zuerst): {json.dumps(received_actions[:15], ensure_ascii=False)}"
+    def to_dict(self) -> dict:
+        return {k: getattr(self, k) for k in self.__slots__}
 
-            blacklist_summary = f"Aktive Blacklist: {'Ja' if is_blacklisted else 'Nein'}. Blacklist-Einträge: {json.dumps(blacklists, ensure_ascii=False)}"
+    @classmethod
+    def from_dict(cls, data: dict) -> "PlayerInfo":
+        return cls(**{k: data[k] for k in cls.__slots__ if k in data})
 
-            full_summary = f"Player-Info für ID {ticket.player_id}:\n{actions_summary}\n{blacklist_summary}"
+    @property
+    def latest(self) -> dict | None:
+        return self.recent[0] if self.recent else None
 
-            ticket.history.append({"role": "system", "content": full_summary})
-            ticket.player_info_added = True
-            await log_debug(f"Player-Info geladen – {len(received_actions)} Actions, Blacklisted: {is_blacklisted}", channel_id)
+    def counts_text(self) -> str:
+        return ", ".join(f"{t} {n}" for t, n in self.counts.items()) or "keine"
+
+    def since_last_punishment(self) -> str:
+        if not self.last_punishment_at:
+            return "nie"
+        return f"vor {format_age(time.time() - self.last_punishment_at)}"
+
+    def prompt_snippet(self) -> str:
+        lines = [f"{PLAYER_INFO_PREFIX} {self.player_id}" + (f" ({self.name})" if self.name else "") + ":"]
+        if self.total_actions:
+            lines.append(f"Actions: {self.total_actions} ({self.counts_text()}); letzte Strafe {self.since_last_punishment()}.")
+            for a in self.recent:
+                lines.append(f"- {a['type']} wegen '{a['reason']}' am {a['time'][:16].replace('T', ' ')} von {a['by']}")
+        else:
+            lines.append("Keine received_actions gefunden.")
+        lines.append(f"Aktive Blacklist: {'Ja' if self.blacklisted else 'Nein'}" +
+                     (f" ({'; '.join(self.blacklist_reasons)})" if self.blacklisted and self.blacklist_reasons else ""))
+        return "\n".join(lines)
+
+def player_has_name(player: dict, name: str) -> bool:
+    key = name_key(name)
+    for entry in player.get("names") or []:
+        value = entry.get("name") if isinstance(entry, dict) else entry
+        if isinstance(value, str) and key in name_aliases(value):
+            return True
+    return False
+
+async def resolve_player_name(name: str, confidence: float = 1.0, min_local_score: float = 0.0,
+                              exact: bool = False) -> tuple[str | None, float | None]:
+    # (player_id, Score im lokalen Index); remote gesucht nur bei sicherem Kandidaten, Score dann None.
+    # exact: Remote-Treffer nur, wenn ein Name/Alias des Spielers genau der Anfrage entspricht (Suche ist unscharf)
+    local = await name_index.lookup(name, exact_only=min_local_score >= 1.0)
+    if local and local[1] >= min_local_score:
+        return local
+    if confidence < NAME_REMOTE_MIN_CONFIDENCE:
+        return None, None
+    players = await fetch_players_by_name(name)
+    if exact:
+        players = [p for p in players if player_has_name(p, name)]
+    if not players:
+        return None, None
+    players_sorted = sorted(players, key=lambda p: max([parse_last_seen(n.get("last_seen")) for n in p.get("names", [])], default=0), reverse=True)
+    return players_sorted[0].get("player_id"), None
+
+@traced("name_search")
+async def search_and_set_best_player_id(channel_id: int, candidates: list[tuple[str, float]]) -> bool:
+    ticket = tickets.get(channel_id)
+    if not ticket or not candidates or not http_session:
+        return False
+    # Steht schon eine ID fest (aus dem Text, Modal oder gespeicherter Verknüpfung), ersetzt sie nur ein exakter Namenstreffer
+    exact = bool(ticket.player_id)
+    for name, confidence in sorted(candidates, key=lambda c: c[1], reverse=True):
+        try:
+            best_id, score = await resolve_player_name(name, confidence, min_local_score=1.0 if exact else 0.0, exact=exact)
+        except Exception as e:
+            await log_debug(f"Search Exception: {e}", channel_id)
+            continue
+        if not best_id:
+            continue
+        if score is not None:
+            await log_debug(f"Name '{name}' lokal aufgelöst -> {best_id} (Score {score:.2f})", channel_id)
+        if best_id == ticket.player_id:
+            return False
+        ticket.player_id = best_id
+        await add_player_info_to_history(channel_id)
+        await update_escalation_embed(channel_id)
+        return True
+    return False
+
+@traced("add_player_info")
+async def add_player_info_to_history(channel_id: int):
+    ticket = tickets.get(channel_id)
+    if not ticket or not ticket.player_id or ticket.player_info_id == ticket.player_id or not http_session:
+        return
+    try:
+        try:
+            player_data = await fetch_player_history(ticket.player_id)
+        except RconApiError as e:
+            await log_debug(f"Player-Info Abruf fehlgeschlagen (Status {e.status})", channel_id)
+            return
+        info = PlayerInfo.from_history(ticket.player_id, player_data)
+        ticket.player_info = info
+        ticket.history.append({"role": "system", "content": info.prompt_snippet()})
+        ticket.player_info_id = ticket.player_id
+        save_ticket(ticket)
+        await log_debug(f"Player-Info geladen – {info.total_actions} Actions ({info.counts_text()}), Blacklisted: {info.blacklisted}", channel_id)
     except Exception as e:
         await log_debug(f"Player-Info Exception: {e}", channel_id)
 
@@ -246,104 +964,305 @@ class TicketAdminView(View):
         if not any(role.name == ADMIN_ROLE_NAME for role in interaction.user.roles):
             await interaction.response.send_message("Nur Admins!", ephemeral=True)
             return False
+        channel_id, _ = await self.target(interaction)
+        transcript_channel.set(channel_id or None)
+        record_event(channel_id or None, "admin_action", action=(interaction.data or {}).get("custom_id"))
         return True
 
+    async def target(self, interaction: discord.Interaction) -> tuple[int, str]:
+        # Persistente View nach Restart: eine Instanz für alle alten Embeds – Ticket pro Klick über die Nachricht finden,
+        # nie auf self merken
+        if self.channel_id or not interaction.message:
+            return self.channel_id, self.player_id
+        ticket = await ticket_for_escalation_message(interaction.message.id)
+        return (ticket.channel_id, ticket.player_id or "") if ticket else (0, "")
+
     @discord.ui.button(label="Alle Bans/Blacklists entfernen (inkl. Perma)", style=discord.ButtonStyle.green, custom_id="admin_full_unban")
     async def full_unban(self, interaction: discord.Interaction, button: Button):
-        if not self.player_id:
+        channel_id, player_id = await self.target(interaction)
+        if not player_id:
             await interaction.response.send_message("Keine ID!", ephemeral=True)
             return
         await interaction.response.defer(ephemeral=True)
-        success = await api_clear_full_bans(self.player_id, self.channel_id)
-        await interaction.followup.send(f"Full Clear {'erfolgreich' if success else 'ohne Effekt'}.", ephemeral=True)
+        results = await api_clear_full_bans(player_id, channel_id)
+        success = any(r["effect"] == EFFECT_REMOVED for r in results)
+        await interaction.followup.send(f"Full Clear {'erfolgreich' if success else 'ohne Effekt'}.\n```\n{format_clear_results(results)}\n```", ephemeral=True)
 
     @discord.ui.button(label="Ticket-Infos anzeigen", style=discord.ButtonStyle.primary, custom_id="admin_show_infos")
     async def show_infos(self, interaction: discord.Interaction, button: Button):
-        ticket = tickets.get(self.channel_id)
+        channel_id, _ = await self.target(interaction)
+        ticket = await get_ticket(channel_id) if channel_id else None
         if not ticket:
             await interaction.response.send_message("Ticket nicht gefunden.", ephemeral=True)
             return
-        summary = "Letzte 30 Nachrichten:\n\n"
-        for msg in ticket.history[-30:]:
-            prefix = "User" if msg.get("role") == "user" else "Bot" if msg.get("role") == "assistant" else "System"
-            content = msg.get("content", "") if isinstance(msg.get("content"), str) else "[Bild/Anhang]"
-            summary += f"{prefix}: {content}\n\n"
+        summary = ""
+        if ticket.summary:
+            summary += f"Zusammenfassung älterer Nachrichten:\n{ticket.summary}\n\n"
+        summary += "Letzte 30 Nachrichten:\n\n"
+        for msg in [m for m in ticket.history if m.get("role") != "system"][-30:]:
+            summary += f"{render_history_line(msg)}\n\n"
+        chunks = split_discord_message(f"Infos Ticket <#{channel_id}>:\n{summary}")
         try:
-            await interaction.user.send(f"Infos Ticket <#{self.channel_id}>:\n{summary}")
+            for chunk in chunks:
+                await interaction.user.send(chunk)
             await interaction.response.send_message("Infos per DM gesendet!", ephemeral=True)
         except:
-            await interaction.response.send_message(f"Infos:\n{summary}", ephemeral=True)
+            await interaction.response.send_message(chunks[0], ephemeral=True)
+            for chunk in chunks[1:]:
+                await interaction.followup.send(chunk, ephemeral=True)
 
     @discord.ui.button(label="KI pausieren", style=discord.ButtonStyle.red, custom_id="admin_ki_pause")
     async def pause_ki(self, interaction: discord.Interaction, button: Button):
-        ticket = tickets.get(self.channel_id)
+        channel_id, _ = await self.target(interaction)
+        ticket = await get_ticket(channel_id) if channel_id else None
         if ticket:
             ticket.admin_active = True
-            button.label = "KI starten"
-            button.style = discord.ButtonStyle.green
-            await interaction.response.edit_message(view=self)
+            ticket.admin_active_since = time.time()
+            save_ticket(ticket)
+            # neue View statt self: die persistente Instanz teilen sich alle alten Embeds
+            view = TicketAdminView(ticket.player_id or "", ticket.channel_id)
+            view.pause_ki.label = "KI starten"
+            view.pause_ki.style = discord.ButtonStyle.green
+            await interaction.response.edit_message(view=view)
             await interaction.followup.send("KI pausiert.", ephemeral=True)
 
     @discord.ui.button(label="KI starten", style=discord.ButtonStyle.green, custom_id="admin_ki_resume", disabled=True)
     async def resume_ki(self, interaction: discord.Interaction, button: Button):
-        ticket = tickets.get(self.channel_id)
+        channel_id, _ = await self.target(interaction)
+        ticket = await get_ticket(channel_id) if channel_id else None
         if ticket:
             ticket.admin_active = False
-            button.label = "KI pausieren"
-            button.style = discord.ButtonStyle.red
-            button.disabled = False
-            await interaction.response.edit_message(view=self)
+            save_ticket(ticket)
+            view = TicketAdminView(ticket.player_id or "", ticket.channel_id)
+            view.resume_ki.label = "KI pausieren"
+            view.resume_ki.style = discord.ButtonStyle.red
+            view.resume_ki.disabled = False
+            await interaction.response.edit_message(view=view)
             await interaction.followup.send("KI gestartet.", ephemeral=True)
 
+# === DISCORD OUTBOUND ===
+# Alle Sends/Edits laufen über eine Queue mit Bucket pro Channel (Discord: ~5 Requests / 5s / Channel).
+# Spieler-Antworten vor Admin-Embeds vor Debug-Logs; Jobs mit gleichem Key werden zusammengefasst (letzter gewinnt).
+OUTBOUND_WORKERS = int(os.getenv('OUTBOUND_WORKERS', 4))
+OUTBOUND_CHANNEL_RATE = int(os.getenv('OUTBOUND_CHANNEL_RATE', 5))
+OUTBOUND_CHANNEL_PER = float(os.getenv('OUTBOUND_CHANNEL_PER', 5))
+PRIORITY_USER = 0
+PRIORITY_ADMIN = 1
+PRIORITY_DEBUG = 2
+
+class OutboundQueue:
+    def __init__(self, workers: int, rate: int, per: float):
+        self.max_workers = workers
+        self.rate = rate
+        self.per = per
+        self._pending: dict = {}  # key -> Job-Eintrag
+        self._running: set = set()
+        self._busy_channels: set = set()  # pro Channel nur ein Request gleichzeitig – Reihenfolge bleibt erhalten
+        self._sent: dict = {}  # channel_id -> deque der letzten Sendezeitpunkte
+        self._wakeup = asyncio.Event()
+        self._workers: list = []
+        self._seq = itertools.count()
+        self.stats = {"submitted": 0, "coalesced": 0, "skipped": 0, "sent": 0, "failed": 0}
+
+    def start(self):
+        self._workers = [w for w in self._workers if not w.done()]
+        while len(self._workers) < self.max_workers:
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    def submit(self, channel_id: int, priority: int, job, key=None, delay: float = 0.0) -> asyncio.Future:
+        if not self._workers:
+            self.start()
+        self.stats["submitted"] += 1
+        future = asyncio.get_running_loop().create_future()
+        key = key if key is not None else ("once", next(self._seq))
+        entry = self._pending.get(key)
+        if entry:
+            # Noch nicht gesendet: neuer Inhalt ersetzt den alten, alle Aufrufer bekommen das Ergebnis
+            self.stats["coalesced"] += 1
+            entry["job"] = job
+            entry["priority"] = min(entry["priority"], priority)
+            entry["futures"].append(future)
+        else:
+            self._pending[key] = {"priority": priority, "seq": next(self._seq), "ready_at": time.monotonic() + delay,
+                                  "channel_id": channel_id, "job": job, "futures": [future]}
+        self._wakeup.set()
+        return future
+
+    def _bucket_free_at(self, channel_id: int, now: float) -> float:
+        sent = self._sent.get(channel_id)
+        if sent is None:
+            return now
+        while sent and now - sent[0] >= self.per:
+            sent.popleft()
+        if not sent:
+            del self._sent[channel_id]
+            return now
+        return now if len(sent) < self.rate else sent[0] + self.per
+
+    async def _next_key(self):
+        while True:
+            now = time.monotonic()
+            best = None
+            wait = None
+            for key, entry in self._pending.items():
+                if key in self._running or entry["channel_id"] in self._busy_channels:
+                    continue
+                ready = max(entry["ready_at"], self._bucket_free_at(entry["channel_id"], now))
+                if ready <= now:
+                    if best is None or (entry["priority"], entry["seq"]) < (self._pending[best]["priority"], self._pending[best]["seq"]):
+                        best = key
+                else:
+                    wait = ready - now if wait is None else min(wait, ready - now)
+            if best is not None:
+                return best
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self):
+        while True:
+            key = await self._next_key()
+            entry = self._pending.pop(key)
+            self._running.add(key)
+            self._busy_channels.add(entry["channel_id"])
+            self._sent.setdefault(entry["channel_id"], deque()).append(time.monotonic())
+            try:
+                result = await entry["job"]()
+                self.stats["sent"] += 1
+                for future in entry["futures"]:
+                    if not future.done():
+                        future.set_result(result)
+            except Exception as e:
+                self.stats["failed"] += 1
+                for future in entry["futures"]:
+                    if not future.done():
+                        future.set_exception(e)
+                        future.exception()  # als abgerufen markieren, Embed-Updates wartet niemand ab
+            finally:
+                self._running.discard(key)
+                self._busy_channels.discard(entry["channel_id"])
+                self._wakeup.set()
+
+    def queue_depth(self, priority: int | None = None) -> int:
+        return sum(1 for e in self._pending.values() if priority is None or e["priority"] == priority)
+
+outbound = OutboundQueue(OUTBOUND_WORKERS, OUTBOUND_CHANNEL_RATE, OUTBOUND_CHANNEL_PER)
+
+def outbound_send(channel, priority: int, kind: str, *args, **kwargs) -> asyncio.Future:
+    async def job():
+        started = time.monotonic()
+        message = await channel.send(*args, **kwargs)
+        DISCORD_SEND_SECONDS.observe(time.monotonic() - started, kind=kind)
+        return message
+    return outbound.submit(channel.id, priority, job)
+
+def outbound_edit(message, priority: int, kind: str, **kwargs) -> asyncio.Future:
+    async def job():
+        started = time.monotonic()
+        await message.edit(**kwargs)
+        DISCORD_SEND_SECONDS.observe(time.monotonic() - started, kind=kind)
+        return message
+    return outbound.submit(message.channel.id, priority, job, key=("edit", message.id))
+
 # === EMBED ===
-async def update_escalation_embed(channel_id: int, summary: str = None):
-    ticket = tickets.get(channel_id)
-    if not ticket:
-        return
-    admin_channel = bot.get_channel(ADMIN_SUMMARY_CHANNEL_ID)
-    channel = bot.get_channel(channel_id)
-    if not admin_channel or not channel:
-        return
-    embed = discord.Embed(title="Ticket Eskalation", description=summary or "Aktives Ticket", color=0xffa500)
+ESCALATION_COALESCE_WINDOW = float(os.getenv('ESCALATION_COALESCE_WINDOW', 1.5))
+
+def build_escalation_embed(ticket, channel: discord.TextChannel) -> discord.Embed:
+    embed = discord.Embed(title="Ticket Eskalation", description=ticket.escalation_summary or "Aktives Ticket", color=0xffa500)
     embed.add_field(name="Ticket", value=channel.mention)
     embed.add_field(name="Link", value=channel.jump_url)
     if ticket.player_id:
         embed.add_field(name="Player-ID", value=ticket.player_id, inline=False)
-        actions = []
-        for m in reversed(ticket.history):
-            if m.get("role") == "system" and "Player-Info" in m.get("content", ""):
-                try:
-                    start = m["content"].find("Letzter Action:")
-                    if start != -1:
-                        actions = m["content"][start:].splitlines()[:6]
-                        break
-                except:
-                    pass
-        if actions:
-            embed.add_field(name="Letzte Actions", value="\n".join(actions), inline=False)
-    view = TicketAdminView(ticket.player_id or "", channel_id)
+    info = ticket.player_info
+    if info and info.player_id == ticket.player_id:
+        if info.name:
+            embed.add_field(name="Name", value=info.name)
+        embed.add_field(name="Blacklist", value="Ja" if info.blacklisted else "Nein")
+        embed.add_field(name="Letzte Strafe", value=info.since_last_punishment())
+        embed.add_field(name=f"Actions ({info.total_actions})", value=info.counts_text(), inline=False)
+        if info.recent:
+            lines = [f"{a['type']} – {a['reason']} ({a['time'][:10]}, {a['by']})" for a in info.recent]
+            embed.add_field(name="Letzte Actions", value="\n".join(lines)[:1024], inline=False)
+    return embed
+
+async def push_escalation_embed(channel_id: int):
+    # Läuft erst im Outbound-Worker: baut das Embed aus dem dann aktuellen Ticket-Stand
+    ticket = tickets.get(channel_id)
+    admin_channel = bot.get_channel(ADMIN_SUMMARY_CHANNEL_ID)
+    channel = bot.get_channel(channel_id)
+    if not ticket or not admin_channel or not channel:
+        return None
+    embed = build_escalation_embed(ticket, channel)
+    fingerprint = json.dumps(embed.to_dict(), sort_keys=True, ensure_ascii=False)
+    if ticket.escalation_message and fingerprint == ticket.escalation_fingerprint:
+        outbound.stats["skipped"] += 1
+        return ticket.escalation_message
+    started = time.monotonic()
     if ticket.escalation_message:
-        await ticket.escalation_message.edit(embed=embed, view=view)
+        kwargs = {"embed": embed}
+        if ticket.escalation_view_id != ticket.player_id:
+            # Buttons hängen an der Player-ID – nur dann eine neue View mitschicken
+            kwargs["view"] = TicketAdminView(ticket.player_id or "", channel_id)
+        await ticket.escalation_message.edit(**kwargs)
     else:
-        ticket.escalation_message = await admin_channel.send(embed=embed, view=view)
+        ticket.escalation_message = await admin_channel.send(embed=embed, view=TicketAdminView(ticket.player_id or "", channel_id))
+        save_ticket(ticket)
+    ticket.escalation_fingerprint = fingerprint
+    ticket.escalation_view_id = ticket.player_id
+    DISCORD_SEND_SECONDS.observe(time.monotonic() - started, kind="escalation")
+    return ticket.escalation_message
+
+@traced("update_escalation_embed")
+async def update_escalation_embed(channel_id: int, summary: str = None):
+    ticket = tickets.get(channel_id)
+    if not ticket:
+        return
+    if summary:
+        ticket.escalation_summary = summary
+    # Nicht abwarten: mehrere Updates im Fenster werden zu einem Edit
+    outbound.submit(ADMIN_SUMMARY_CHANNEL_ID, PRIORITY_ADMIN, lambda: push_escalation_embed(channel_id),
+                    key=("escalation", channel_id), delay=ESCALATION_COALESCE_WINDOW)
 
 # === TICKET KLASSE ===
 class Ticket:
+    __slots__ = ("channel_id", "owner", "history", "closed", "player_id", "player_info_id", "admin_active", "language",
+                 "pending_task", "admin_timeout_task", "name_request_message", "escalation_message", "summary",
+                 "summary_task", "admin_active_since", "persisted_ids", "prefetch_task", "last_activity",
+                 "last_message_at", "burst_started", "typing_until", "escalation_summary", "escalation_fingerprint",
+                 "escalation_view_id", "player_info", "language_confidence", "unban_task")
+
     def __init__(self, channel_id: int, owner: discord.Member):
         self.channel_id = channel_id
         self.owner = owner
         self.history = INITIAL_HISTORY.copy()
         self.closed = False
         self.player_id = ""
-        self.player_info_added = False
+        self.player_info_id = ""
         self.admin_active = False
         self.language = 'de'
         self.pending_task = None
         self.admin_timeout_task = None
         self.name_request_message: discord.Message | None = None
         self.escalation_message: discord.Message | None = None
-
-tickets = {}
+        self.summary = ""
+        self.summary_task = None
+        self.admin_active_since = 0.0
+        self.persisted_ids: list[int] = []
+        self.prefetch_task = None
+        self.last_activity = time.monotonic()
+        self.last_message_at = 0.0
+        self.burst_started = 0.0
+        self.typing_until = 0.0
+        self.escalation_summary = ""
+        self.escalation_fingerprint = ""
+        self.escalation_view_id = ""
+        self.player_info: PlayerInfo | None = None
+        self.language_confidence = 0.0
+        self.unban_task = None
+
+tickets: OrderedDict = OrderedDict()  # LRU: zuletzt aktive Tickets am Ende
 
 # === PROMPT ===
 PROMPT_FILE = 'prompts_de.json'
@@ -352,16 +1271,560 @@ with open(PROMPT_FILE, 'r', encoding='utf-8') as f:
 
 INITIAL_HISTORY = [{"role": "system", "content": prompt_data["content"]}] if isinstance(prompt_data, dict) and prompt_data.get("role") == "system" else [{"role": "system", "content": prompt_data}] if isinstance(prompt_data, str) else prompt_data if isinstance(prompt_data, list) else [{"role": "system", "content": str(prompt_data)}]
 
+# === TICKET STORE ===
+# Tickets überleben Restarts: SQLite im WAL-Modus, Schreiben in einem eigenen Thread in Batches.
+# History wird append-only geschrieben; nur wenn sie umgebaut wurde (Trim/Zusammenfassung) als Snapshot.
+TICKET_DB = os.getenv('TICKET_DB', 'tickets.db').strip()
+TICKET_STORE_BATCH = 500
+
+class TicketStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = None
+        conn = self._connect()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tickets (
+                channel_id INTEGER PRIMARY KEY,
+                owner_id INTEGER,
+                player_id TEXT,
+                player_info_id TEXT,
+                language TEXT,
+                admin_active_since REAL,
+                summary TEXT,
+                escalation_message_id INTEGER,
+                name_request_message_id INTEGER,
+                updated_at REAL,
+                player_info TEXT
+            );
+            CREATE TABLE IF NOT EXISTS history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel_id INTEGER NOT NULL,
+                message TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS history_channel ON history (channel_id, id);
+            CREATE TABLE IF NOT EXISTS player_links (
+                discord_user_id INTEGER PRIMARY KEY,
+                player_id TEXT NOT NULL,
+                source TEXT,
+                updated_at REAL
+            );
+        """)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(tickets)")}
+        if "player_info" not in columns:
+            conn.execute("ALTER TABLE tickets ADD COLUMN player_info TEXT")  # Stores von vor dem PlayerInfo-Datensatz
+        conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._writer, name="ticket-store", daemon=True)
+            self._thread.start()
+
+    def _writer(self):
+        conn = self._connect()
+        stopping = False
+        while not stopping:
+            ops = [self._queue.get()]
+            while len(ops) < TICKET_STORE_BATCH:
+                try:
+                    ops.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with conn:
+                    for op, args in ops:
+                        if op == "upsert":
+                            conn.execute(
+                                "INSERT OR REPLACE INTO tickets (channel_id, owner_id, player_id, player_info_id, language, admin_active_since, "
+                                "summary, escalation_message_id, name_request_message_id, updated_at, player_info) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", args)
+                        elif op == "append":
+                            conn.executemany("INSERT INTO history (channel_id, message) VALUES (?, ?)", args)
+                        elif op == "reset_history":
+                            conn.execute("DELETE FROM history WHERE channel_id = ?", (args,))
+                        elif op == "link":
+                            conn.execute("INSERT OR REPLACE INTO player_links (discord_user_id, player_id, source, updated_at) VALUES (?, ?, ?, ?)", args)
+                        elif op == "delete":
+                            conn.execute("DELETE FROM history WHERE channel_id = ?", (args,))
+                            conn.execute("DELETE FROM tickets WHERE channel_id = ?", (args,))
+                        elif op == "stop":
+                            stopping = True
+            except sqlite3.Error as e:
+                print(f"Ticket-Store Schreibfehler: {e}")
+            finally:
+                for _ in ops:
+                    self._queue.task_done()
+        conn.close()
+
+    def save(self, ticket: Ticket):
+        # Läuft im Event-Loop: nur Zeilen bauen und einreihen, geschrieben wird im Thread
+        stored = [m for m in ticket.history if isinstance(m, dict) and not any(m is b for b in INITIAL_HISTORY)]
+        ids = [id(m) for m in stored]
+        known = ticket.persisted_ids
+        if ids[:len(known)] == known:
+            new_messages = stored[len(known):]
+        else:
+            self._queue.put(("reset_history", ticket.channel_id))
+            new_messages = stored
+        if new_messages:
+            rows = [(ticket.channel_id, json.dumps(to_api_message(m), ensure_ascii=False)) for m in new_messages]
+            self._queue.put(("append", rows))
+        ticket.persisted_ids = ids
+        self._queue.put(("upsert", (
+            ticket.channel_id,
+            ticket.owner.id if ticket.owner else None,
+            ticket.player_id,
+            ticket.player_info_id,
+            ticket.language,
+            ticket.admin_active_since if ticket.admin_active else None,
+            ticket.summary,
+            ticket.escalation_message.id if ticket.escalation_message else None,
+            ticket.name_request_message.id if ticket.name_request_message else None,
+            time.time(),
+            json.dumps(ticket.player_info.to_dict(), ensure_ascii=False) if ticket.player_info else None
+        )))
+
+    def delete(self, channel_id: int):
+        self._queue.put(("delete", channel_id))
+
+    def close(self, timeout: float = 10.0):
+        # Beim Beenden: Writer-Thread ist Daemon, eingereihte Zeilen erst noch schreiben lassen
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(("stop", None))
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            print(f"Ticket-Store: {self._queue.qsize()} Schreibvorgänge beim Beenden nicht mehr geschrieben")
+
+    def load(self, channel_ids: list[int] | None = None) -> dict:
+        # Synchron – aus dem Event-Loop nur über asyncio.to_thread aufrufen
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            if channel_ids is None:
+                rows = conn.execute("SELECT * FROM tickets").fetchall()
+            else:
+                rows = []
+                for i in range(0, len(channel_ids), 500):
+                    chunk = channel_ids[i:i + 500]
+                    rows += conn.execute(f"SELECT * FROM tickets WHERE channel_id IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+            result = {row["channel_id"]: {**dict(row), "history": []} for row in rows}
+            ids = list(result)
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                for channel_id, message in conn.execute(
+                        f"SELECT channel_id, message FROM history WHERE channel_id IN ({','.join('?' * len(chunk))}) ORDER BY id", chunk):
+                    result[channel_id]["history"].append(json.loads(message))
+            return result
+        finally:
+            conn.close()
+
+    def link_player(self, discord_user_id: int, player_id: str, source: str):
+        self._queue.put(("link", (discord_user_id, player_id, source, time.time())))
+
+    def lookup_player(self, discord_user_id: int) -> str | None:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT player_id FROM player_links WHERE discord_user_id = ?", (discord_user_id,)).fetchone()
+            return row[0] if row else None
+        finally:
+            conn.close()
+
+    def channel_for_escalation(self, message_id: int) -> int | None:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT channel_id FROM tickets WHERE escalation_message_id = ?", (message_id,)).fetchone()
+            return row[0] if row else None
+        finally:
+            conn.close()
+
+    def stored_channel_ids(self) -> set[int]:
+        conn = self._connect()
+        try:
+            return {row[0] for row in conn.execute("SELECT channel_id FROM tickets")}
+        finally:
+            conn.close()
+
+ticket_store = TicketStore(TICKET_DB) if TICKET_DB else None
+if ticket_store:
+    atexit.register(ticket_store.close)
+
+def save_ticket(ticket: Ticket):
+    if ticket_store and not ticket.closed:
+        ticket_store.save(ticket)
+
+# Bestätigte Zuordnung Discord-User -> player_id (ID im Text, Modal, Admin) für wiederkehrende Spieler
+def remember_player_link(ticket: Ticket, source: str):
+    if ticket_store and ticket.owner and ticket.player_id:
+        ticket_store.link_player(ticket.owner.id, ticket.player_id, source)
+
+async def prefetch_known_player(ticket: Ticket):
+    if ticket.player_id or not ticket_store or not ticket.owner:
+        return
+    player_id = await asyncio.to_thread(ticket_store.lookup_player, ticket.owner.id)
+    if not player_id or ticket.player_id:
+        return
+    ticket.player_id = player_id
+    await log_debug(f"Bekannter Spieler {ticket.owner} -> {player_id}, lade Player-Info vorab", ticket.channel_id)
+    await add_player_info_to_history(ticket.channel_id)
+    await update_escalation_embed(ticket.channel_id)
+    save_ticket(ticket)
+
+def start_player_prefetch(ticket: Ticket):
+    if ticket_store and not ticket.player_id and not ticket.prefetch_task:
+        ticket.prefetch_task = asyncio.create_task(prefetch_known_player(ticket))
+
+ACTIVE_TICKET_CATEGORY_KEYS = frozenset(c.lower() for c in ACTIVE_TICKET_CATEGORIES)
+
+def is_ticket_channel(channel) -> bool:
+    return isinstance(channel, discord.TextChannel) and channel.category is not None and channel.category.name.lower() in ACTIVE_TICKET_CATEGORY_KEYS
+
+async def ticket_from_row(channel: discord.TextChannel, row: dict) -> Ticket:
+    owner = None
+    if row["owner_id"]:
+        owner = channel.guild.get_member(row["owner_id"])
+        if owner is None:
+            try:
+                owner = await channel.guild.fetch_member(row["owner_id"])
+            except discord.HTTPException:
+                owner = None
+    ticket = Ticket(channel.id, owner)
+    ticket.history = INITIAL_HISTORY.copy() + row["history"]
+    ticket.persisted_ids = [id(m) for m in row["history"]]
+    ticket.player_id = row["player_id"] or ""
+    ticket.player_info_id = row["player_info_id"] or ""
+    ticket.language = row["language"] or 'de'
+    ticket.summary = row["summary"] or ""
+    if row.get("player_info"):
+        ticket.player_info = PlayerInfo.from_dict(json.loads(row["player_info"]))
+    # Nachrichten nur per ID anhängen – PartialMessage kann editieren, ohne sie erst zu laden
+    if row["escalation_message_id"]:
+        admin_channel = bot.get_channel(ADMIN_SUMMARY_CHANNEL_ID)
+        if admin_channel:
+            ticket.escalation_message = admin_channel.get_partial_message(row["escalation_message_id"])
+    if row["name_request_message_id"]:
+        ticket.name_request_message = channel.get_partial_message(row["name_request_message_id"])
+    if row["admin_active_since"]:
+        remaining = ADMIN_PAUSE_SECONDS - (time.time() - row["admin_active_since"])
+        if remaining > 0:
+            ticket.admin_active = True
+            ticket.admin_active_since = row["admin_active_since"]
+            ticket.admin_timeout_task = asyncio.create_task(reset_admin_active(ticket, remaining))
+    return ticket
+
+async def get_ticket(channel_id: int) -> Ticket | None:
+    # Tickets aus dem Store erst laden, wenn sie gebraucht werden (z. B. vor Ende der Rehydration)
+    ticket = tickets.get(channel_id)
+    if ticket:
+        touch_ticket(ticket)
+        return ticket
+    if not ticket_store:
+        return None
+    channel = bot.get_channel(channel_id)
+    if not is_ticket_channel(channel):
+        return None
+    rows = await asyncio.to_thread(ticket_store.load, [channel_id])
+    if channel_id in rows and channel_id not in tickets:
+        register_ticket(await ticket_from_row(channel, rows[channel_id]))
+    return tickets.get(channel_id)
+
+async def rehydrate_tickets():
+    if not ticket_store:
+        return
+    started = time.monotonic()
+    channels = {c.id: c for guild in bot.guilds for c in guild.text_channels if is_ticket_channel(c) and owns_channel(c.id)}
+    rows = await asyncio.to_thread(ticket_store.load, list(channels))
+    for channel_id, row in rows.items():
+        if channel_id not in tickets:
+            register_ticket(await ticket_from_row(channels[channel_id], row))
+    # Tickets, deren Channel während der Downtime gelöscht wurde
+    stale = await asyncio.to_thread(ticket_store.stored_channel_ids)
+    for channel_id in stale - set(channels):
+        if owns_channel(channel_id):  # Tickets anderer Worker nicht anfassen
+            ticket_store.delete(channel_id)
+    await log_debug(f"{len(rows)} Tickets aus dem Store geladen ({time.monotonic() - started:.2f}s)")
+
+async def ticket_for_escalation_message(message_id: int) -> Ticket | None:
+    for ticket in tickets.values():
+        if ticket.escalation_message and ticket.escalation_message.id == message_id:
+            return ticket
+    if ticket_store:
+        # verdrängtes Ticket: Channel über den Store finden und nachladen
+        channel_id = await asyncio.to_thread(ticket_store.channel_for_escalation, message_id)
+        if channel_id:
+            return await get_ticket(channel_id)
+    return None
+
+# === TICKET LIFECYCLE ===
+# Tickets verlassen den Speicher, wenn der Channel gelöscht oder aus den Ticket-Kategorien verschoben wird,
+# nach TICKET_IDLE_SECONDS ohne Aktivität oder wenn mehr als TICKET_MAX_IN_MEMORY offen sind (LRU).
+# Mit Ticket-Store werden verdrängte Tickets bei der nächsten Nachricht per get_ticket nachgeladen,
+# ohne Store ist ihre Historie danach weg.
+TICKET_MAX_IN_MEMORY = int(os.getenv('TICKET_MAX_IN_MEMORY', 300))
+TICKET_IDLE_SECONDS = float(os.getenv('TICKET_IDLE_SECONDS', 6 * 3600))
+TICKET_EVICT_MIN_IDLE = float(os.getenv('TICKET_EVICT_MIN_IDLE', 60))
+TICKET_JANITOR_INTERVAL = float(os.getenv('TICKET_JANITOR_INTERVAL', 300))
+
+ticket_stats = {"evicted": 0, "released": 0}
+ticket_janitor_task = None
+
+def touch_ticket(ticket: Ticket):
+    ticket.last_activity = time.monotonic()
+    if ticket.channel_id in tickets:
+        tickets.move_to_end(ticket.channel_id)
+
+def register_ticket(ticket: Ticket):
+    tickets[ticket.channel_id] = ticket
+    touch_ticket(ticket)
+    enforce_ticket_limit()
+
+def ticket_tasks(ticket: Ticket) -> list:
+    return [t for t in (ticket.pending_task, ticket.admin_timeout_task, ticket.summary_task, ticket.prefetch_task) if t]
+
+def ticket_busy(ticket: Ticket) -> bool:
+    # Admin-Pause zählt nicht – der Timer wird beim Nachladen aus admin_active_since neu gestellt
+    if any(not t.done() for t in (ticket.pending_task, ticket.summary_task, ticket.prefetch_task, ticket.unban_task) if t):
+        return True
+    return llm_scheduler.is_active(ticket.channel_id) or llm_scheduler.is_active(("summary", ticket.channel_id))
+
+def release_ticket(channel_id: int, reason: str, forget: bool = True) -> Ticket | None:
+    # forget=False: nur aus dem Speicher nehmen, Store-Eintrag bleibt zum Nachladen
+    ticket = tickets.pop(channel_id, None)
+    if forget and ticket_store:
+        ticket_store.delete(channel_id)
+    llm_scheduler.cancel(channel_id)
+    llm_scheduler.cancel(("summary", channel_id))
+    if ticket is None:
+        return None
+    if forget:
+        ticket.closed = True
+    current = asyncio.current_task()
+    for task in ticket_tasks(ticket):
+        if task is not current and not task.done():
+            task.cancel()
+    ticket_stats["released" if forget else "evicted"] += 1
+    record_event(channel_id, "release", reason=reason)
+    return ticket
+
+def evict_ticket(ticket: Ticket, reason: str):
+    save_ticket(ticket)
+    release_ticket(ticket.channel_id, reason, forget=False)
+
+def enforce_ticket_limit():
+    if len(tickets) <= TICKET_MAX_IN_MEMORY:
+        return
+    now = time.monotonic()
+    for ticket in list(tickets.values()):
+        if len(tickets) <= TICKET_MAX_IN_MEMORY:
+            break
+        if now - ticket.last_activity >= TICKET_EVICT_MIN_IDLE and not ticket_busy(ticket):
+            evict_ticket(ticket, "lru")
+
+async def ticket_janitor():
+    while True:
+        await asyncio.sleep(TICKET_JANITOR_INTERVAL)
+        now = time.monotonic()
+        idle = [t for t in tickets.values() if now - t.last_activity >= TICKET_IDLE_SECONDS and not ticket_busy(t)]
+        for ticket in idle:
+            evict_ticket(ticket, "idle")
+        enforce_ticket_limit()
+        if idle:
+            await log_debug(f"{len(idle)} inaktive Tickets aus dem Speicher genommen, {len(tickets)} verbleiben")
+
+def start_ticket_janitor():
+    global ticket_janitor_task
+    if ticket_janitor_task is None or ticket_janitor_task.done():
+        ticket_janitor_task = asyncio.create_task(ticket_janitor())
+
+def approx_size(obj, seen: set | None = None) -> int:
+    # Tiefe Größe von History-Strukturen (dict/list/str); geteilte Objekte zählen einmal
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(approx_size(k, seen) + approx_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(approx_size(v, seen) for v in obj)
+    return size
+
+def ticket_size(ticket: Ticket) -> int:
+    # Systemprompt teilen sich alle Tickets – nicht mitzählen
+    seen = {id(m) for m in INITIAL_HISTORY}
+    return sys.getsizeof(ticket) + approx_size(ticket.history, seen) + approx_size(ticket.summary, seen)
+
 # === LOGGING & SESSION ===
+# log_debug legt die Zeile nur in Queues: Datei (und optional Konsole) schreibt ein QueueListener-Thread,
+# der Flusher-Task fasst die Zeilen zu Discord-Nachrichten (max. 2000 Zeichen) zusammen.
+DISCORD_MESSAGE_LIMIT = 2000
+LOG_QUEUE_MAX = int(os.getenv('LOG_QUEUE_MAX', 1000))
+LOG_SAMPLE_RATE = max(1, int(os.getenv('LOG_SAMPLE_RATE', 5)))
+LOG_FLUSH_INTERVAL = float(os.getenv('LOG_FLUSH_INTERVAL', 3))
+LOG_FILE = process_path(os.getenv('LOG_FILE', 'bot_debug.log'))
+LOG_FILE_MAX_BYTES = int(os.getenv('LOG_FILE_MAX_BYTES', 5 * 1024 * 1024))
+LOG_FILE_BACKUPS = int(os.getenv('LOG_FILE_BACKUPS', 3))
+LOG_CONSOLE = os.getenv('LOG_CONSOLE', '0') == '1'
+
+file_logger = logging.getLogger("gbg_ki.debug")
+file_logger.setLevel(logging.INFO)
+file_logger.propagate = False
+_log_handlers = []
+if LOG_FILE:
+    try:
+        _log_handlers.append(RotatingFileHandler(LOG_FILE, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS, encoding='utf-8'))
+    except OSError as e:
+        print(f"Log-Datei {LOG_FILE} nicht nutzbar: {e}")
+if LOG_CONSOLE:
+    _log_handlers.append(logging.StreamHandler(sys.stdout))
+if _log_handlers:
+    for _handler in _log_handlers:
+        _handler.setFormatter(logging.Formatter("%(message)s"))
+    _log_records: queue.Queue = queue.Queue()
+    file_logger.addHandler(QueueHandler(_log_records))
+    log_writer = QueueListener(_log_records, *_log_handlers)
+    log_writer.start()
+    atexit.register(log_writer.stop)  # schreibt beim Beenden noch alles Eingereihte
+
+log_queue: asyncio.Queue = asyncio.Queue(maxsize=LOG_QUEUE_MAX)
+log_stats = {"queued": 0, "dropped": 0, "sent_messages": 0}
+log_dropped_pending = 0
+log_sample_counter = 0
+log_flusher_task = None
+
 async def log_debug(msg: str, channel_id: int = None):
+    global log_dropped_pending, log_sample_counter
     full_msg = f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [Ticket {channel_id or 'Global'}] {msg}"
-    print(full_msg)
-    channel = bot.get_channel(DEBUG_CHANNEL_ID)
-    if channel:
-        try:
-            await channel.send(f"[DEBUG] {full_msg}")
-        except:
-            pass
+    file_logger.info(full_msg)  # nur einreihen – Datei/Konsole schreibt der Listener-Thread
+    # Überlast: ab 75 % Füllstand nur noch jede n-te Zeile, bei voller Queue verwerfen
+    if log_queue.qsize() >= LOG_QUEUE_MAX * 3 // 4:
+        log_sample_counter += 1
+        if log_sample_counter % LOG_SAMPLE_RATE:
+            log_dropped_pending += 1
+            log_stats["dropped"] += 1
+            return
+    try:
+        log_queue.put_nowait(full_msg)
+        log_stats["queued"] += 1
+    except asyncio.QueueFull:
+        log_dropped_pending += 1
+        log_stats["dropped"] += 1
+
+def pack_log_lines(lines: list[str], limit: int = DISCORD_MESSAGE_LIMIT) -> list[str]:
+    prefix = "[DEBUG] "
+    chunks = []
+    current = ""
+    for line in lines:
+        line = prefix + line
+        if len(line) > limit:
+            line = line[:limit - 1] + "…"
+        if current and len(current) + 1 + len(line) > limit:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n{line}" if current else line
+    if current:
+        chunks.append(current)
+    return chunks
+
+async def log_flusher():
+    global log_dropped_pending
+    loop = asyncio.get_running_loop()
+    while True:
+        lines = [await log_queue.get()]
+        size = len(lines[0])
+        deadline = loop.time() + LOG_FLUSH_INTERVAL
+        # Zeitfenster oder Größenlimit – was zuerst erreicht wird
+        while size < DISCORD_MESSAGE_LIMIT * 2:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                line = await asyncio.wait_for(log_queue.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            lines.append(line)
+            size += len(line)
+        if log_dropped_pending:
+            lines.append(f"[... {log_dropped_pending} Log-Zeilen verworfen (Überlast) ...]")
+            log_dropped_pending = 0
+        channel = bot.get_channel(DEBUG_CHANNEL_ID)
+        if not channel:
+            continue
+        for chunk in pack_log_lines(lines):
+            try:
+                await outbound_send(channel, PRIORITY_DEBUG, "debug", chunk)
+                log_stats["sent_messages"] += 1
+            except Exception as e:
+                print(f"Debug-Send fehlgeschlagen: {e}")
+
+def start_log_flusher():
+    global log_flusher_task
+    if log_flusher_task is None or log_flusher_task.done():
+        log_flusher_task = asyncio.create_task(log_flusher())
+
+# === TRANSCRIPT RECORDER ===
+# Opt-in über TRANSCRIPT_FILE: anonymisierte Ereignisse pro Ticket als JSONL für replay.py.
+# Keine Nachrichteninhalte, keine Discord-/Steam-IDs – nur Zeitpunkte, Größen, Anhangstypen und Upstream-Ergebnisse.
+TRANSCRIPT_FILE = process_path(os.getenv('TRANSCRIPT_FILE', '').strip())
+TRANSCRIPT_SALT = os.getenv('TRANSCRIPT_SALT', '') or os.urandom(16).hex()
+TRANSCRIPT_FLUSH_INTERVAL = float(os.getenv('TRANSCRIPT_FLUSH_INTERVAL', 5))
+TRANSCRIPT_BUFFER_MAX = int(os.getenv('TRANSCRIPT_BUFFER_MAX', 20000))
+
+# Ticket des aktuellen Handlers – RCON-Calls bekommen keine channel_id übergeben
+transcript_channel: contextvars.ContextVar = contextvars.ContextVar("transcript_channel", default=None)
+transcript_buffer: deque = deque(maxlen=TRANSCRIPT_BUFFER_MAX)
+transcript_task = None
+
+def anonymize(value) -> str:
+    return hashlib.sha256(f"{TRANSCRIPT_SALT}:{value}".encode()).hexdigest()[:12]
+
+def record_event(channel_id, event: str, **fields):
+    if not TRANSCRIPT_FILE or channel_id is None:
+        return
+    transcript_buffer.append({"ts": round(time.time(), 3), "ticket": anonymize(channel_id), "event": event, **fields})
+
+def record_upstream(event: str, **fields):
+    record_event(transcript_channel.get(), event, **fields)
+
+def message_shape(content: str, attachments) -> dict:
+    return {
+        "chars": len(content),
+        "words": len(content.split()),
+        "lines": content.count("\n") + 1 if content else 0,
+        "has_id": extract_player_id(content) is not None,
+        "has_name": extract_ingame_name(content) is not None,
+        "intents": sorted(analyze_text(content).intents),
+        "attachments": [att.content_type or "unknown" for att in attachments],
+    }
+
+def write_transcript(records: list[dict]):
+    with open(TRANSCRIPT_FILE, 'a', encoding='utf-8') as f:
+        f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+
+async def flush_transcript():
+    if not transcript_buffer:
+        return
+    records = list(transcript_buffer)
+    transcript_buffer.clear()
+    try:
+        await asyncio.to_thread(write_transcript, records)
+    except OSError as e:
+        print(f"Transcript-Export fehlgeschlagen: {e}")
+
+async def transcript_flusher():
+    while True:
+        await asyncio.sleep(TRANSCRIPT_FLUSH_INTERVAL)
+        await flush_transcript()
+
+def start_transcript_recorder():
+    global transcript_task
+    if TRANSCRIPT_FILE and (transcript_task is None or transcript_task.done()):
+        transcript_task = asyncio.create_task(transcript_flusher())
 
 http_session = None
 async def create_http_session():
@@ -376,19 +1839,441 @@ async def close_http_session():
         await http_session.close()
         http_session = None
 
-async def reset_admin_active(ticket: Ticket):
-    await asyncio.sleep(1800)
+ADMIN_PAUSE_SECONDS = 1800
+
+async def reset_admin_active(ticket: Ticket, delay: float = ADMIN_PAUSE_SECONDS):
+    await asyncio.sleep(delay)
     ticket.admin_active = False
+    save_ticket(ticket)
+
+# === KONTEXT-BUDGET ===
+# Statt fester 30 Nachrichten: Prompt nach Token-Budget bauen.
+# Reihenfolge der Priorität: Basis-Prompt, aktuelle Player-Info, übrige System-Nachrichten, neueste Turns.
+MAX_PROMPT_TOKENS = int(os.getenv('MAX_PROMPT_TOKENS', 12000))
+HISTORY_MAX_STORED = int(os.getenv('HISTORY_MAX_STORED', 100))
+IMAGE_TOKEN_COST = int(os.getenv('IMAGE_TOKEN_COST', 800))
+MESSAGE_TOKEN_OVERHEAD = 4
+PLAYER_INFO_PREFIX = "Player-Info für ID"
+
+def estimate_tokens(message: dict) -> int:
+    # Grobe Schätzung (~4 Zeichen pro Token), wird im Feld "_tokens" an der Nachricht gecacht.
+    # Inline-Bilder zählen mit ihrer echten Base64-Größe; die hängt davon ab, ob das Bild schon verkleinert
+    # im Speicher liegt – solche Nachrichten werden nicht gecacht.
+    cached = message.get("_tokens")
+    if cached is not None:
+        return cached
+    content = message.get("content")
+    tokens = MESSAGE_TOKEN_OVERHEAD
+    inline = False
+    if isinstance(content, str):
+        tokens += len(content) // 4 + 1
+    elif isinstance(content, list):
+        for part in content:
+            if part.get("type") == "text":
+                tokens += len(part.get("text", "")) // 4 + 1
+                continue
+            data_url = image_data.get(part.get("_sha"))
+            inline = inline or part.get("type") == "image_url"
+            tokens += max(IMAGE_TOKEN_COST, len(data_url) // 4 + 1) if data_url else IMAGE_TOKEN_COST
+    if not inline:
+        message["_tokens"] = tokens
+    return tokens
+
+def is_player_info(message: dict) -> bool:
+    return message.get("role") == "system" and isinstance(message.get("content"), str) and message["content"].startswith(PLAYER_INFO_PREFIX)
+
+def to_api_message(message: dict) -> dict:
+    return {k: v for k, v in message.items() if not k.startswith("_")}
 
 def trim_history(ticket: Ticket):
-    system = [m for m in ticket.history if isinstance(m, dict) and m.get("role") == "system"]
-    other = [m for m in ticket.history if isinstance(m, dict) and m.get("role") != "system"][-30:]
+    # Gespeicherte Historie begrenzen: nur die neueste Player-Info behalten, alte Turns kappen
+    messages = [m for m in ticket.history if isinstance(m, dict)]
+    player_infos = [m for m in messages if is_player_info(m)]
+    stale = {id(m) for m in player_infos[:-1]}
+    system = [m for m in messages if m.get("role") == "system" and id(m) not in stale]
+    other = [m for m in messages if m.get("role") != "system"][-HISTORY_MAX_STORED:]
+    other = drop_described_images(other)
     ticket.history = system + other
 
-async def debounced_ki_response(channel: discord.TextChannel, ticket: Ticket):
-    await asyncio.sleep(4)
+def build_prompt_messages(ticket: Ticket, budget: int = MAX_PROMPT_TOKENS) -> tuple[list[dict], int]:
+    messages = [m for m in ticket.history if isinstance(m, dict)]
+    base = [m for m in messages if any(m is b for b in INITIAL_HISTORY)]
+    player_infos = [m for m in messages if is_player_info(m)]
+    latest_info = player_infos[-1:]
+    other_system = [m for m in messages if m.get("role") == "system" and not is_player_info(m) and not any(m is b for b in base)]
+    turns = [m for m in messages if m.get("role") != "system"]
+
+    used = sum(estimate_tokens(m) for m in base)
+    system = list(base)
+    for m in latest_info + other_system:
+        cost = estimate_tokens(m)
+        if used + cost <= budget:
+            system.append(m)
+            used += cost
+
+    recent = []
+    for m in reversed(turns):
+        cost = estimate_tokens(m)
+        # die letzte Nachricht kommt immer mit, auch wenn das Budget schon voll ist
+        if recent and used + cost > budget:
+            break
+        recent.append(m)
+        used += cost
+    recent.reverse()
+    return [to_prompt_message(m) for m in system + recent], used
+
+# === BILDANHÄNGE ===
+# Screenshots einmal laden, im Worker-Pool verkleinern/neu komprimieren, per Inhalts-Hash deduplizieren und auf
+# Platte cachen. Die History hält nur URL + Hash, erst der Prompt bekommt die kompakten Bilddaten inline.
+# Inline geht ein Bild nur in der Runde, die es gebracht hat – nach der Antwort ersetzt es ein Platzhalter.
+IMAGE_MAX_DIMENSION = int(os.getenv('IMAGE_MAX_DIMENSION', 1024))
+IMAGE_JPEG_QUALITY = int(os.getenv('IMAGE_JPEG_QUALITY', 80))
+IMAGE_MAX_DOWNLOAD_BYTES = int(os.getenv('IMAGE_MAX_DOWNLOAD_BYTES', 10 * 1024 * 1024))
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+IMAGE_WAIT_SECONDS = float(os.getenv('IMAGE_WAIT_SECONDS', 10))
+IMAGE_CACHE_DIR = os.getenv('IMAGE_CACHE_DIR', 'image_cache')  # leer = kein Platten-Cache
+IMAGE_CACHE_MAX_FILES = int(os.getenv('IMAGE_CACHE_MAX_FILES', 2000))
+IMAGE_MEMORY_ENTRIES = int(os.getenv('IMAGE_MEMORY_ENTRIES', 64))
+IMAGE_KEEP_TURNS = int(os.getenv('IMAGE_KEEP_TURNS', 0))  # so viele Bild-Turns bleiben nach der Antwort als Bild erhalten
+IMAGE_PLACEHOLDER = "[Screenshot des Spielers – wurde bereits beschrieben]"
+
+image_executor = concurrent.futures.ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="image")
+image_data: OrderedDict = OrderedDict()  # sha -> data-URL (LRU)
+image_hashes: OrderedDict = OrderedDict()  # URL ohne Query -> sha
+image_jobs: dict[str, asyncio.Task] = {}
+image_processing: dict[str, asyncio.Future] = {}  # sha -> laufende Verkleinerung
+image_stats = {"downloaded": 0, "url_hits": 0, "dedup_hits": 0, "disk_hits": 0, "processed": 0, "failed": 0, "dropped": 0,
+               "bytes_in": 0, "bytes_out": 0}
+
+def is_image_attachment(att) -> bool:
+    return bool(att.content_type and att.content_type.startswith("image/"))
+
+def image_url_key(url: str) -> str:
+    return url.split("?", 1)[0]  # Discord-CDN signiert per Query, die Datei bleibt dieselbe
+
+def image_cache_path(sha: str) -> str | None:
+    return os.path.join(IMAGE_CACHE_DIR, f"{sha}.jpg") if IMAGE_CACHE_DIR else None
+
+def remember_image(sha: str, jpeg: bytes):
+    image_data[sha] = "data:image/jpeg;base64," + base64.b64encode(jpeg).decode("ascii")
+    image_data.move_to_end(sha)
+    while len(image_data) > IMAGE_MEMORY_ENTRIES:
+        image_data.popitem(last=False)
+
+def downscale_image(raw: bytes) -> bytes:
+    with Image.open(io.BytesIO(raw)) as img:
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((IMAGE_MAX_DIMENSION, IMAGE_MAX_DIMENSION))
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        out = io.BytesIO()
+        img.save(out, "JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True)
+    return out.getvalue()
+
+def prune_image_cache():
+    entries = [e for e in os.scandir(IMAGE_CACHE_DIR) if e.name.endswith(".jpg")]
+    if len(entries) <= IMAGE_CACHE_MAX_FILES:
+        return
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    for entry in entries[:len(entries) - IMAGE_CACHE_MAX_FILES]:
+        with contextlib.suppress(OSError):
+            os.remove(entry.path)
+
+def load_or_process_image(sha: str, raw: bytes) -> tuple[bytes, bool]:
+    # läuft im Worker-Pool: erst Platte, sonst verkleinern und ablegen
+    path = image_cache_path(sha)
+    if path and os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read(), True
+    jpeg = downscale_image(raw)
+    if path:
+        os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            f.write(jpeg)
+        os.replace(path + ".tmp", path)
+        if image_stats["processed"] % 50 == 0:
+            prune_image_cache()
+    return jpeg, False
+
+def read_cached_image(sha: str) -> bytes | None:
+    path = image_cache_path(sha)
+    if not path:
+        return None
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+async def fetch_image(url: str) -> str | None:
+    key = image_url_key(url)
+    if key in image_hashes:
+        image_stats["url_hits"] += 1
+        return image_hashes[key]
+    if not http_session or http_session.closed:
+        await create_http_session()
+    async with http_session.get(url, timeout=aiohttp.ClientTimeout(total=IMAGE_WAIT_SECONDS)) as resp:
+        resp.raise_for_status()
+        if (resp.content_length or 0) > IMAGE_MAX_DOWNLOAD_BYTES:
+            raise ValueError(f"Bild größer als {IMAGE_MAX_DOWNLOAD_BYTES} Bytes")
+        chunks = []
+        size = 0
+        async for chunk in resp.content.iter_chunked(64 * 1024):
+            size += len(chunk)
+            if size > IMAGE_MAX_DOWNLOAD_BYTES:  # ohne/mit falschem Content-Length
+                raise ValueError(f"Bild größer als {IMAGE_MAX_DOWNLOAD_BYTES} Bytes")
+            chunks.append(chunk)
+        raw = b"".join(chunks)
+    image_stats["downloaded"] += 1
+    image_stats["bytes_in"] += len(raw)
+    sha = hashlib.sha256(raw).hexdigest()
+    if sha in image_data or sha in image_processing:
+        image_stats["dedup_hits"] += 1
+        if sha in image_processing:
+            await asyncio.shield(image_processing[sha])
+    else:
+        image_processing[sha] = asyncio.get_running_loop().run_in_executor(image_executor, load_or_process_image, sha, raw)
+        try:
+            jpeg, from_disk = await asyncio.shield(image_processing[sha])
+        finally:
+            image_processing.pop(sha, None)
+        image_stats["disk_hits" if from_disk else "processed"] += 1
+        image_stats["bytes_out"] += len(jpeg)
+        remember_image(sha, jpeg)
+    image_hashes[key] = sha
+    while len(image_hashes) > IMAGE_MEMORY_ENTRIES * 4:
+        image_hashes.popitem(last=False)
+    return sha
+
+async def _prepare_image_part(part: dict, channel_id: int):
+    url = part["image_url"]["url"]
+    try:
+        with span("image_prepare"):
+            part["_sha"] = await fetch_image(url)
+    except Exception as e:
+        part["_sha"] = None  # nicht bei jedem Turn neu versuchen, die URL geht direkt raus
+        image_stats["failed"] += 1
+        await log_debug(f"Bild konnte nicht vorbereitet werden, sende URL: {e!r}", channel_id)
+    finally:
+        image_jobs.pop(image_url_key(url), None)
+
+def start_image_prefetch(part: dict, channel_id: int) -> asyncio.Task:
+    # läuft während des Debounce; gleiche URL -> gleicher Job
+    key = image_url_key(part["image_url"]["url"])
+    job = image_jobs.get(key)
+    if job is None:
+        job = image_jobs[key] = asyncio.create_task(_prepare_image_part(part, channel_id))
+    elif "_sha" not in part:
+        job.add_done_callback(lambda _: part.__setitem__("_sha", image_hashes.get(key)))
+    return job
+
+def image_parts(message: dict) -> list[dict]:
+    content = message.get("content")
+    if not isinstance(content, list):
+        return []
+    return [p for p in content if p.get("type") == "image_url"]
+
+async def ensure_ticket_images(ticket: Ticket):
+    # vor dem Prompt-Bau: laufende Downloads abwarten, nach Neustart Bilder von der Platte holen
+    parts = [p for m in ticket.history if isinstance(m, dict) for p in image_parts(m)]
+    pending = [start_image_prefetch(p, ticket.channel_id) for p in parts if "_sha" not in p]
+    if pending:
+        await asyncio.wait(pending, timeout=IMAGE_WAIT_SECONDS)
+    for part in parts:
+        sha = part.get("_sha")
+        if sha and sha not in image_data:
+            jpeg = await asyncio.to_thread(read_cached_image, sha)
+            if jpeg:
+                remember_image(sha, jpeg)
+
+def drop_described_images(turns: list[dict]) -> list[dict]:
+    # Bilder aus Turns, auf die schon geantwortet wurde, nur in den letzten IMAGE_KEEP_TURNS behalten.
+    # Ersetzte Turns sind neue Objekte, damit der Store die History neu schreibt.
+    answered = False
+    kept = 0
+    result = []
+    for m in reversed(turns):
+        parts = image_parts(m)
+        if m.get("role") == "assistant":
+            answered = True
+        elif parts and answered:
+            if kept < IMAGE_KEEP_TURNS:
+                kept += 1
+            else:
+                content = [p if p.get("type") != "image_url" else {"type": "text", "text": IMAGE_PLACEHOLDER} for p in m["content"]]
+                m = {k: v for k, v in m.items() if k not in ("content", "_tokens")} | {"content": content}
+                image_stats["dropped"] += len(parts)
+        result.append(m)
+    result.reverse()
+    return result
+
+def to_prompt_message(message: dict) -> dict:
+    api_message = to_api_message(message)
+    if not image_parts(message):
+        return api_message
+    content = []
+    for part in message["content"]:
+        if part.get("type") == "image_url":
+            url = image_data.get(part.get("_sha"), part["image_url"]["url"])
+            part = {"type": "image_url", "image_url": {"url": url}}
+        content.append(part)
+    api_message["content"] = content
+    return api_message
+
+# === ROLLING SUMMARY ===
+# Lange Tickets: Turns außerhalb des Fensters im Hintergrund in eine laufende Zusammenfassung falten.
+SUMMARY_TRIGGER_TURNS = int(os.getenv('SUMMARY_TRIGGER_TURNS', 24))
+SUMMARY_KEEP_TURNS = int(os.getenv('SUMMARY_KEEP_TURNS', 10))
+SUMMARY_MAX_TOKENS = int(os.getenv('SUMMARY_MAX_TOKENS', 400))
+SUMMARY_PREFIX = "Zusammenfassung des bisherigen Ticket-Verlaufs:"
+SUMMARY_INSTRUCTION = (
+    "Fasse den bisherigen Verlauf dieses Support-Tickets knapp zusammen (max. 150 Wörter, Stichpunkte). "
+    "Behalte: Anliegen des Spielers, genannte Namen/IDs, Bans/Kicks mit Grund, Zusagen des Bots, offene Punkte. "
+    "Antworte nur mit der Zusammenfassung."
+)
+
+def render_history_line(message: dict) -> str:
+    role = message.get("role")
+    prefix = "User" if role == "user" else "Bot" if role == "assistant" else "System"
+    content = message.get("content", "")
+    if isinstance(content, list):
+        content = " ".join(p.get("text", "") if p.get("type") == "text" else "[Bild/Anhang]" for p in content)
+    return f"{prefix}: {content}"
+
+def is_summary(message: dict) -> bool:
+    return message.get("role") == "system" and isinstance(message.get("content"), str) and message["content"].startswith(SUMMARY_PREFIX)
+
+def maybe_schedule_summary(ticket: Ticket):
+    turns = [m for m in ticket.history if m.get("role") != "system"]
+    if len(turns) < SUMMARY_TRIGGER_TURNS or (ticket.summary_task and not ticket.summary_task.done()):
+        return
+    ticket.summary_task = llm_scheduler.submit(("summary", ticket.channel_id), lambda: summarize_old_turns(ticket))
+
+async def summarize_old_turns(ticket: Ticket):
+    turns = [m for m in ticket.history if m.get("role") != "system"]
+    old_turns = turns[:-SUMMARY_KEEP_TURNS]
+    if not old_turns or not http_session:
+        return
+    transcript = "\n".join(render_history_line(m) for m in old_turns)
+    if ticket.summary:
+        transcript = f"Bisherige Zusammenfassung:\n{ticket.summary}\n\nNeue Nachrichten:\n{transcript}"
+    payload = {
+        "model": GROK_MODEL,
+        "messages": [{"role": "system", "content": SUMMARY_INSTRUCTION}, {"role": "user", "content": transcript}],
+        "max_tokens": SUMMARY_MAX_TOKENS,
+        "temperature": 0.2
+    }
+    try:
+        new_summary = await request_ki_completion(payload, ticket, fast=True)
+    except Exception as e:
+        await log_debug(f"Zusammenfassung fehlgeschlagen: {e}", ticket.channel_id)
+        return
+    if not new_summary:
+        return
+    # Nur die zusammengefassten Nachrichten entfernen – was während des Calls dazukam, bleibt
+    folded = {id(m) for m in old_turns}
+    ticket.summary = new_summary.strip()
+    history = [m for m in ticket.history if id(m) not in folded and not is_summary(m)]
+    system_count = sum(1 for m in history if m.get("role") == "system")
+    history.insert(system_count, {"role": "system", "content": f"{SUMMARY_PREFIX}\n{ticket.summary}"})
+    ticket.history = history
+    save_ticket(ticket)
+    await log_debug(f"{len(old_turns)} ältere Nachrichten zusammengefasst ({len(ticket.summary)} Zeichen)", ticket.channel_id)
+
+# === ADAPTIVE DEBOUNCE ===
+# Statt fix 4s: vollständige Fragen früh beantworten, Fragmente/Screenshots und tippende Spieler abwarten.
+# Wartezeit aus Nachrichtenform und dem bisherigen Nachrichtenabstand des Users, Typing verlängert bis zum Hard-Cap.
+DEBOUNCE_DEFAULT_SECONDS = float(os.getenv('DEBOUNCE_DEFAULT_SECONDS', 4))
+DEBOUNCE_MIN_SECONDS = float(os.getenv('DEBOUNCE_MIN_SECONDS', 1))
+DEBOUNCE_MAX_SECONDS = float(os.getenv('DEBOUNCE_MAX_SECONDS', 8))
+DEBOUNCE_HARD_CAP_SECONDS = float(os.getenv('DEBOUNCE_HARD_CAP_SECONDS', 15))
+DEBOUNCE_TYPING_WINDOW = float(os.getenv('DEBOUNCE_TYPING_WINDOW', 6))
+DEBOUNCE_BURST_GAP = 30.0  # größere Abstände sind neue Anliegen, keine Nachrichten-Salve
+CONTINUATION_ENDINGS = (",", ":", "...", "…", "-", "und", "and", "aber", "but")
+
+class CadenceStats:
+    # Abstände zwischen aufeinanderfolgenden Nachrichten pro User (LRU) plus global als Fallback
+    def __init__(self, max_users: int = 5000, samples: int = 20):
+        self.max_users = max_users
+        self.samples = samples
+        self._gaps: OrderedDict = OrderedDict()
+        self._global: deque = deque(maxlen=500)
+
+    def record(self, user_id: int, gap: float):
+        gaps = self._gaps.pop(user_id, None) or deque(maxlen=self.samples)
+        gaps.append(gap)
+        self._gaps[user_id] = gaps
+        self._global.append(gap)
+        while len(self._gaps) > self.max_users:
+            self._gaps.popitem(last=False)
+
+    def percentile(self, user_id: int, pct: float) -> float | None:
+        gaps = self._gaps.get(user_id)
+        if not gaps or len(gaps) < 3:
+            gaps = self._global if len(self._global) >= 20 else None
+        if not gaps:
+            return None
+        ordered = sorted(gaps)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def __len__(self) -> int:
+        return len(self._gaps)
+
+cadence_stats = CadenceStats()
+
+def note_owner_message(ticket: Ticket, user_id: int):
+    # Vor dem Anhängen an die History aufrufen: Abstand zählt nur, wenn seitdem keine Bot-Antwort kam
+    now = time.monotonic()
+    last = ticket.history[-1] if ticket.history else None
+    if ticket.last_message_at and now - ticket.last_message_at <= DEBOUNCE_BURST_GAP and last and last.get("role") == "user":
+        cadence_stats.record(user_id, now - ticket.last_message_at)
+    if not ticket.pending_task:
+        ticket.burst_started = now
+    ticket.last_message_at = now
+    ticket.typing_until = 0.0  # Nachricht abgeschickt – Typing-Indikator ist vorbei
+
+def choose_debounce_delay(ticket: Ticket, content: str, attachments) -> tuple[float, str]:
+    text = (content or "").strip()
+    has_image = any(is_image_attachment(att) for att in attachments)
+    if has_image and not text:
+        delay, reason = DEBOUNCE_MAX_SECONDS, "attachment"  # Screenshot kommt meist vor der Erklärung
+    elif text.endswith("?") and len(text) >= 15:
+        delay, reason = DEBOUNCE_MIN_SECONDS, "question"
+    elif text.lower().endswith(CONTINUATION_ENDINGS) or len(text) < 12:
+        delay, reason = DEBOUNCE_DEFAULT_SECONDS * 1.5, "fragment"
+    else:
+        delay, reason = DEBOUNCE_DEFAULT_SECONDS, "default"
+    typical_gap = cadence_stats.percentile(ticket.owner.id, 75) if ticket.owner else None
+    if typical_gap is not None and reason in ("default", "fragment"):
+        # Etwas länger als der übliche Abstand dieses Spielers zwischen zwei Nachrichten
+        delay, reason = typical_gap * 1.2 * (1.5 if reason == "fragment" else 1.0), "cadence"
+    delay = min(max(delay, DEBOUNCE_MIN_SECONDS), DEBOUNCE_MAX_SECONDS)
+    # Hard-Cap ab der ersten unbeantworteten Nachricht
+    return max(0.0, min(delay, ticket.burst_started + DEBOUNCE_HARD_CAP_SECONDS - time.monotonic())), reason
+
+async def debounced_ki_response(channel: discord.TextChannel, ticket: Ticket, delay: float = DEBOUNCE_DEFAULT_SECONDS, reason: str = "default"):
+    try:
+        with span("debounce", delay=round(delay, 2), reason=reason):
+            await asyncio.sleep(delay)
+            # Spieler tippt noch: bis zum Ablauf des Typing-Fensters warten, höchstens bis zum Hard-Cap
+            while True:
+                now = time.monotonic()
+                typing_left = ticket.typing_until - now
+                cap_left = ticket.burst_started + DEBOUNCE_HARD_CAP_SECONDS - now
+                if typing_left <= 0:
+                    break
+                if cap_left <= 0:
+                    reason = "cap"
+                    break
+                reason = "typing"
+                await asyncio.sleep(min(typing_left, cap_left))
+    except asyncio.CancelledError:
+        await finish_trace("superseded")
+        raise
+    DEBOUNCE_WAIT_SECONDS.observe(time.monotonic() - (ticket.last_message_at or time.monotonic()), reason=reason)
     ticket.pending_task = None
-    await send_ki_response(channel, ticket)
+    ticket.burst_started = 0.0
+    llm_scheduler.submit(ticket.channel_id, traced_job(lambda: send_ki_response(channel, ticket), "send_ki_response"))
 
 # === MODAL & VIEW ===
 class IngameNameOrIdModal(Modal):
@@ -405,12 +2290,15 @@ class IngameNameOrIdModal(Modal):
         self.add_item(self.input)
 
     async def on_submit(self, interaction: discord.Interaction):
-        ticket = tickets.get(interaction.channel_id)
+        ticket = await get_ticket(interaction.channel_id)
         if not ticket or interaction.user != ticket.owner:
             await interaction.response.send_message("Nur du!", ephemeral=True)
             return
 
         user_input = self.input.value.strip()
+        start_trace("modal_submit", interaction.channel_id)
+        transcript_channel.set(interaction.channel_id)
+        record_event(interaction.channel_id, "modal_submit", chars=len(user_input), has_id=extract_player_id(user_input) is not None)
         await interaction.response.defer(ephemeral=True)
 
         found = False
@@ -421,16 +2309,21 @@ class IngameNameOrIdModal(Modal):
             found = True
 
         if not found:
-            found = await search_and_set_best_player_id(interaction.channel_id, name=user_input)
+            found = await search_and_set_best_player_id(interaction.channel_id, [(user_input, 1.0)]) if user_input else False
             if found:
                 await add_player_info_to_history(interaction.channel_id)
 
+        if found:
+            remember_player_link(ticket, "modal")
+
         if found and ticket.name_request_message:
-            await ticket.name_request_message.edit(content="Player-Info geladen!", view=None)
+            await outbound_edit(ticket.name_request_message, PRIORITY_USER, "name_request", content="Player-Info geladen!", view=None)
 
         if ticket.pending_task:
             ticket.pending_task.cancel()
-        ticket.pending_task = asyncio.create_task(debounced_ki_response(interaction.channel, ticket))
+        ticket.last_message_at = time.monotonic()
+        ticket.burst_started = ticket.burst_started or ticket.last_message_at
+        ticket.pending_task = asyncio.create_task(debounced_ki_response(interaction.channel, ticket, DEBOUNCE_MIN_SECONDS, "modal"))
 
 class NameRequestView(View):
     def __init__(self, language: str):
@@ -441,11 +2334,749 @@ class NameRequestView(View):
         self.add_item(button)
 
     async def button_callback(self, interaction: discord.Interaction):
-        ticket = tickets.get(interaction.channel_id)
+        ticket = await get_ticket(interaction.channel_id)
         if ticket:
             await interaction.response.send_modal(IngameNameOrIdModal(ticket.language))
 
+# === LLM SCHEDULER ===
+# Alle Chat-Completions laufen über einen Worker-Pool mit fester Größe.
+# Pro Key (Ticket) höchstens ein Request gleichzeitig; ein wartender Job wird durch den neueren ersetzt.
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 4))
+LLM_MAX_ATTEMPTS = int(os.getenv('LLM_MAX_ATTEMPTS', 4))
+LLM_BACKOFF_BASE = float(os.getenv('LLM_BACKOFF_BASE', 1))
+LLM_BACKOFF_MAX = float(os.getenv('LLM_BACKOFF_MAX', 30))
+LLM_TOKENS_PER_MINUTE = int(os.getenv('LLM_TOKENS_PER_MINUTE', 0))  # 0 = kein Limit
+
+class LLMHttpError(Exception):
+    def __init__(self, status: int, retry_after: float | None = None):
+        super().__init__(f"KI Status {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.status == 429 or self.status >= 500
+
+def parse_retry_after(value: str | None) -> float | None:
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+def backoff_delay(attempt: int) -> float:
+    # Exponentiell mit Full Jitter
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+class TokenRateLimiter:
+    def __init__(self, tokens_per_minute: int):
+        self.rate = tokens_per_minute / 60
+        self.capacity = tokens_per_minute
+        self.tokens = float(tokens_per_minute)
+        self.updated = time.monotonic()
+
+    async def acquire(self, amount: int):
+        if self.rate <= 0:
+            return
+        amount = min(amount, self.capacity)
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+
+class LLMScheduler:
+    def __init__(self, max_concurrency: int, tokens_per_minute: int):
+        self.max_concurrency = max_concurrency
+        self.rate_limiter = TokenRateLimiter(tokens_per_minute)
+        self._queue: deque = deque()
+        self._pending: dict = {}  # key -> (job, enqueued_at, future)
+        self._running: set = set()
+        self._wakeup = asyncio.Event()
+        self._workers: list = []
+        self._cooldown_until = 0.0
+        self.wait_samples: deque = deque(maxlen=500)
+        self.stats = {"submitted": 0, "replaced": 0, "completed": 0, "failed": 0, "rate_limited": 0, "retries": 0}
+
+    def start(self):
+        self._workers = [w for w in self._workers if not w.done()]
+        while len(self._workers) < self.max_concurrency:
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    def submit(self, key, job) -> asyncio.Future:
+        self.stats["submitted"] += 1
+        future = asyncio.get_running_loop().create_future()
+        if key in self._pending:
+            # Neuere Nachricht gewinnt: alter Job fällt weg, Platz in der Queue bleibt
+            self.stats["replaced"] += 1
+            old_future = self._pending[key][2]
+            if not old_future.done():
+                old_future.set_result(None)
+        else:
+            self._queue.append(key)
+        self._pending[key] = (job, time.monotonic(), future)
+        self._wakeup.set()
+        return future
+
+    def cancel(self, key):
+        # Wartenden Job verwerfen (Ticket geschlossen/verdrängt); laufende Jobs bleiben unberührt
+        entry = self._pending.pop(key, None)
+        if entry is None:
+            return
+        with contextlib.suppress(ValueError):
+            self._queue.remove(key)
+        if not entry[2].done():
+            entry[2].set_result(None)
+
+    def is_active(self, key) -> bool:
+        return key in self._pending or key in self._running
+
+    def cooldown(self, seconds: float):
+        # 429 mit Retry-After bremst alle Worker, nicht nur den betroffenen Request
+        self._cooldown_until = max(self._cooldown_until, time.monotonic() + seconds)
+
+    async def _next_key(self):
+        while True:
+            for key in self._queue:
+                if key not in self._running:
+                    self._queue.remove(key)
+                    return key
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+    async def _worker(self):
+        while True:
+            key = await self._next_key()
+            job, enqueued_at, future = self._pending.pop(key)
+            self._running.add(key)
+            try:
+                delay = self._cooldown_until - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                self.wait_samples.append(time.monotonic() - enqueued_at)
+                result = await job()
+                self.stats["completed"] += 1
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                self.stats["failed"] += 1
+                await log_debug(f"LLM-Job {key} fehlgeschlagen: {e}")
+                if not future.done():
+                    future.set_exception(e)
+                    future.exception()  # als abgerufen markieren, Aufrufer warten nicht immer
+            finally:
+                self._running.discard(key)
+                self._wakeup.set()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    @property
+    def running_count(self) -> int:
+        return len(self._running)
+
+    def wait_percentile(self, pct: float) -> float:
+        if not self.wait_samples:
+            return 0.0
+        ordered = sorted(self.wait_samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+llm_scheduler = LLMScheduler(LLM_MAX_CONCURRENCY, LLM_TOKENS_PER_MINUTE)
+
+# === LLM BACKENDS ===
+# Geordnete Liste OpenAI-kompatibler Endpoints, jeder mit eigenem Circuit Breaker.
+# LLM_BACKENDS / LLM_FAST_BACKENDS: JSON-Liste [{"name", "url", "model", "api_key_env"}]
+# Fällt ein Backend vor dem ersten Token aus, kommt das nächste dran; mit LLM_HEDGE startet das
+# nächste zusätzlich, wenn das erste länger als sein p95 braucht – wer zuerst liefert, gewinnt.
+GROK_URL = "https://api.x.ai/v1/chat/completions"
+GROK_MODEL = os.getenv('GROK_MODEL', 'grok-4')
+LLM_FAST_MODEL = os.getenv('LLM_FAST_MODEL', '').strip()
+LLM_HEDGE = os.getenv('LLM_HEDGE', '0') == '1'
+LLM_HEDGE_MIN_DELAY = float(os.getenv('LLM_HEDGE_MIN_DELAY', 2))
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv('LLM_HEDGE_DEFAULT_DELAY', 8))
+LLM_SLOW_SECONDS = float(os.getenv('LLM_SLOW_SECONDS', 20))
+LLM_BREAKER_ERROR_RATE = float(os.getenv('LLM_BREAKER_ERROR_RATE', 0.5))
+LLM_BREAKER_OPEN_SECONDS = float(os.getenv('LLM_BREAKER_OPEN_SECONDS', 30))
+LLM_TRIVIAL_MAX_CHARS = int(os.getenv('LLM_TRIVIAL_MAX_CHARS', 40))
+
+class CircuitBreaker:
+    # closed -> open bei hoher Fehler-/Langsam-Quote, nach Wartezeit half_open mit einem Probe-Request
+    def __init__(self, window: int = 20, min_requests: int = 5):
+        self.outcomes: deque = deque(maxlen=window)
+        self.min_requests = min_requests
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.probing = False
+
+    def allow(self) -> bool:
+        # Nur prüfen, nicht reservieren: den Probe-Slot belegt erst der Versuch, der wirklich startet
+        if self.state == "open" and time.monotonic() - self.opened_at >= LLM_BREAKER_OPEN_SECONDS:
+            self.state = "half_open"
+            self.probing = False
+        if self.state == "half_open":
+            return not self.probing
+        return self.state == "closed"
+
+    def claim(self):
+        if self.state == "half_open":
+            self.probing = True
+
+    def release(self):
+        # Abgebrochener Probe ohne Ergebnis: der nächste Request darf wieder proben
+        if self.state == "half_open":
+            self.probing = False
+
+    def record(self, ok: bool, latency: float):
+        ok = ok and latency <= LLM_SLOW_SECONDS
+        self.outcomes.append((ok, latency))
+        if self.state == "half_open":
+            self.probing = False
+            if ok:
+                self.state = "closed"
+                self.outcomes.clear()
+            else:
+                self._open()
+            return
+        failures = sum(1 for good, _ in self.outcomes if not good)
+        if len(self.outcomes) >= self.min_requests and failures / len(self.outcomes) >= LLM_BREAKER_ERROR_RATE:
+            self._open()
+
+    def _open(self):
+        self.state = "open"
+        self.opened_at = time.monotonic()
+
+    def latency_percentile(self, pct: float) -> float | None:
+        latencies = sorted(latency for ok, latency in self.outcomes if ok)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * pct / 100))]
+
+class CompletionBackend:
+    def __init__(self, name: str, url: str, model: str, api_key: str):
+        self.name = name
+        self.url = url
+        self.model = model
+        self.headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+        self.breaker = CircuitBreaker()
+
+    def hedge_delay(self) -> float:
+        p95 = self.breaker.latency_percentile(95)
+        return max(LLM_HEDGE_MIN_DELAY, p95) if p95 is not None else LLM_HEDGE_DEFAULT_DELAY
+
+    async def stream(self, payload: dict):
+        async with http_session.post(self.url, json={**payload, "model": self.model, "stream": True}, headers=self.headers) as resp:
+            if resp.status != 200:
+                raise LLMHttpError(resp.status, parse_retry_after(resp.headers.get("Retry-After")))
+            async for delta in iter_sse_deltas(resp):
+                yield delta
+
+    async def complete(self, payload: dict):
+        async with http_session.post(self.url, json={**payload, "model": self.model}, headers=self.headers) as resp:
+            if resp.status != 200:
+                raise LLMHttpError(resp.status, parse_retry_after(resp.headers.get("Retry-After")))
+            try:
+                content = (await resp.json())["choices"][0]["message"]["content"]
+            except (ValueError, KeyError, IndexError, TypeError):
+                content = None
+        if not isinstance(content, str):
+            raise LLMHttpError(502)  # 200 ohne verwertbare choices – wie ein Gateway-Fehler behandeln, also erneut versuchen
+        yield content
+
+def load_backends(raw: str, default: list[dict]) -> list[CompletionBackend]:
+    try:
+        configs = json.loads(raw) if raw.strip() else default
+    except ValueError as e:
+        print(f"LLM-Backend-Konfiguration ungültig ({e}) – nutze Standard")
+        configs = default
+    backends = []
+    for i, cfg in enumerate(configs):
+        api_key = cfg.get("api_key") or os.getenv(cfg.get("api_key_env", "GROK_API_KEY"), "")
+        backends.append(CompletionBackend(cfg.get("name", f"backend{i}"), cfg["url"], cfg["model"], api_key))
+    return backends
+
+class LLMAttempt:
+    def __init__(self, backend: CompletionBackend, streaming: bool, payload: dict):
+        self.backend = backend
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._pump(streaming, payload))
+
+    async def _pump(self, streaming: bool, payload: dict):
+        self.backend.breaker.claim()
+        started = time.monotonic()
+        first = True
+        try:
+            source = self.backend.stream(payload) if streaming else self.backend.complete(payload)
+            async for delta in source:
+                if first:
+                    self.backend.breaker.record(True, time.monotonic() - started)
+                    LLM_FIRST_TOKEN_SECONDS.observe(time.monotonic() - started, backend=self.backend.name)
+                    first = False
+                await self.queue.put(("delta", delta))
+            if first:
+                self.backend.breaker.record(True, time.monotonic() - started)
+            LLM_REQUEST_SECONDS.observe(time.monotonic() - started, backend=self.backend.name, outcome="ok")
+            await self.queue.put(("done", None))
+        except asyncio.CancelledError:
+            if first:
+                self.backend.breaker.release()
+            LLM_REQUEST_SECONDS.observe(time.monotonic() - started, backend=self.backend.name, outcome="cancelled")
+            raise
+        except Exception as e:
+            self.backend.breaker.record(False, time.monotonic() - started)
+            LLM_REQUEST_SECONDS.observe(time.monotonic() - started, backend=self.backend.name, outcome="error")
+            await self.queue.put(("error", e))
+
+class LLMRouter:
+    def __init__(self, backends: list[CompletionBackend], fast_backends: list[CompletionBackend]):
+        self.backends = backends
+        self.fast_backends = fast_backends
+        self.stats = {"requests": 0, "fast": 0, "fallbacks": 0, "hedged": 0, "hedge_wins": 0}
+
+    def pick(self, fast: bool) -> list[CompletionBackend]:
+        pool = (self.fast_backends + self.backends) if fast and self.fast_backends else self.backends
+        allowed = [b for b in pool if b.breaker.allow()]
+        # Alle Breaker offen: lieber trotzdem versuchen als gar nicht antworten
+        return allowed or pool
+
+    def stream(self, payload: dict, fast: bool = False):
+        return self._run(payload, fast, streaming=True)
+
+    async def complete(self, payload: dict, fast: bool = False) -> str:
+        parts = []
+        async with aclosing(self._run(payload, fast, streaming=False)) as deltas:
+            async for delta in deltas:
+                parts.append(delta)
+        return "".join(parts)
+
+    async def _run(self, payload: dict, fast: bool, streaming: bool):
+        self.stats["requests"] += 1
+        if fast and self.fast_backends:
+            self.stats["fast"] += 1
+        remaining = self.pick(fast)
+        last_error = None
+        winner = None
+        attempts: list[LLMAttempt] = []
+        try:
+            while remaining and winner is None:
+                if last_error is not None:
+                    self.stats["fallbacks"] += 1
+                attempts = [LLMAttempt(remaining.pop(0), streaming, payload)]
+                hedged = False
+                first_item = None
+                while attempts and winner is None:
+                    timeout = attempts[0].backend.hedge_delay() if LLM_HEDGE and remaining and not hedged else None
+                    getters = {asyncio.create_task(a.queue.get()): a for a in attempts}
+                    done, pending = await asyncio.wait(getters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                    for getter in pending:
+                        getter.cancel()
+                    if not done:
+                        attempts.append(LLMAttempt(remaining.pop(0), streaming, payload))
+                        hedged = True
+                        self.stats["hedged"] += 1
+                        continue
+                    for getter in done:
+                        attempt = getters[getter]
+                        kind, value = getter.result()
+                        if kind == "error":
+                            last_error = value
+                            attempts.remove(attempt)
+                        elif winner is None:
+                            winner, first_item = attempt, (kind, value)
+                if winner:
+                    if winner is not attempts[0]:
+                        self.stats["hedge_wins"] += 1
+                    for attempt in attempts:
+                        if attempt is not winner:
+                            attempt.task.cancel()
+            if winner is None:
+                raise last_error or LLMHttpError(503)
+            kind, value = first_item
+            while kind == "delta":
+                yield value
+                kind, value = await winner.queue.get()
+            if kind == "error":
+                raise value
+        finally:
+            for attempt in attempts:
+                attempt.task.cancel()
+
+    def describe(self) -> str:
+        parts = []
+        for b in self.backends + self.fast_backends:
+            p95 = b.breaker.latency_percentile(95)
+            parts.append(f"{b.name}/{b.model}: {b.breaker.state}" + (f", p95 {p95:.1f}s" if p95 is not None else ""))
+        return " | ".join(parts)
+
+llm_router = LLMRouter(
+    load_backends(os.getenv('LLM_BACKENDS', ''), [{"name": "xai", "url": GROK_URL, "model": GROK_MODEL, "api_key_env": "GROK_API_KEY"}]),
+    load_backends(os.getenv('LLM_FAST_BACKENDS', ''), [{"name": "xai-fast", "url": GROK_URL, "model": LLM_FAST_MODEL, "api_key_env": "GROK_API_KEY"}] if LLM_FAST_MODEL else [])
+)
+
+def is_trivial_turn(ticket: Ticket) -> bool:
+    # Kurze Reaktionen ("danke", "ok", "moin") ohne Bild/ID brauchen nicht das große Modell
+    turns = [m for m in ticket.history if m.get("role") != "system"]
+    if len(turns) < 2 or turns[-1].get("role") != "user":
+        return False
+    content = turns[-1].get("content")
+    if isinstance(content, list):
+        if any(p.get("type") != "text" for p in content):
+            return False
+        content = " ".join(p.get("text", "") for p in content)
+    if not isinstance(content, str) or len(content.strip()) > LLM_TRIVIAL_MAX_CHARS:
+        return False
+    analysis = analyze_text(content)
+    return not analysis.player_id and not (analysis.intents & SUBSTANTIVE_INTENTS)
+
 # === KI RESPONSE MIT SESSION RECREATE ===
+# Mit GROK_STREAMING läuft die Antwort per SSE ein: sichtbarer Text wird gepostet/editiert,
+# sobald er da ist, Tags lösen ihre Aktionen aus, sobald sie im Stream auftauchen.
+GROK_STREAMING = os.getenv('GROK_STREAMING', '1') == '1'
+STREAM_MIN_FIRST_CHARS = int(os.getenv('STREAM_MIN_FIRST_CHARS', 60))
+STREAM_EDIT_INTERVAL = float(os.getenv('STREAM_EDIT_INTERVAL', 1.5))
+
+TAG_NAME_MODAL = "**REQUEST_NAME_MODAL:**"
+TAG_AUTO_UNBAN = "**AUTO_UNBAN:**"
+TAG_SUMMARY = "**ZUSAMMENFASSUNG FÜR ADMINS:**"
+TAG_CLOSE = "**CLOSE TICKET:**"
+REPLY_TAGS = [TAG_NAME_MODAL, TAG_AUTO_UNBAN, TAG_SUMMARY, TAG_CLOSE]
+
+class StreamingTagParser:
+    # Trennt den Stream in sichtbaren Text, Admin-Zusammenfassung und Tags.
+    # Ein Pufferende, das ein Tag-Anfang sein könnte, wird bis zum nächsten Chunk zurückgehalten.
+    def __init__(self):
+        self._buffer = ""
+        self.visible = ""
+        self.summary = ""
+        self.in_summary = False
+        self.tags: list[str] = []
+
+    def feed(self, delta: str) -> list[str]:
+        self._buffer += delta
+        new_tags = []
+        while True:
+            hits = [(self._buffer.find(tag), tag) for tag in REPLY_TAGS if tag in self._buffer]
+            if not hits:
+                break
+            idx, tag = min(hits)
+            self._emit(self._buffer[:idx])
+            self._buffer = self._buffer[idx + len(tag):]
+            self.tags.append(tag)
+            new_tags.append(tag)
+            if tag == TAG_SUMMARY:
+                self.in_summary = True
+        keep = 0
+        for tag in REPLY_TAGS:
+            for n in range(min(len(tag) - 1, len(self._buffer)), keep, -1):
+                if self._buffer.endswith(tag[:n]):
+                    keep = n
+                    break
+        self._emit(self._buffer[:len(self._buffer) - keep])
+        self._buffer = self._buffer[len(self._buffer) - keep:]
+        return new_tags
+
+    def finish(self):
+        self._emit(self._buffer)
+        self._buffer = ""
+
+    def _emit(self, text: str):
+        if self.in_summary:
+            self.summary += text
+        else:
+            self.visible += text
+
+def split_discord_message(text: str, limit: int = DISCORD_MESSAGE_LIMIT) -> list[str]:
+    chunks = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = text.rfind(" ", 0, limit)
+        if cut <= 0:
+            cut = limit
+        chunks.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    if text:
+        chunks.append(text)
+    return chunks
+
+class StreamingReply:
+    # Eine (bei > 2000 Zeichen mehrere) Discord-Nachrichten, die mit dem Stream wachsen.
+    def __init__(self, channel: discord.TextChannel):
+        self.channel = channel
+        self.messages: list[discord.Message] = []
+        self.contents: list[str] = []
+        self.last_update = 0.0
+        self.raw = ""  # bisher gestreamter Rohtext – bricht der Stream ab, landet er trotzdem in der History
+
+    async def update(self, text: str, final: bool = False):
+        text = text.strip()
+        if not final:
+            if time.monotonic() - self.last_update < STREAM_EDIT_INTERVAL:
+                return
+            # Zwischenstände nur bis zum letzten Satzende zeigen
+            cut = max(text.rfind(c) for c in ".!?\n")
+            text = text[:cut + 1].strip() if cut != -1 else ""
+            if not self.messages and len(text) < STREAM_MIN_FIRST_CHARS:
+                return
+        if not text:
+            return
+        for i, chunk in enumerate(split_discord_message(text)):
+            if i < len(self.messages):
+                if self.contents[i] == chunk:
+                    continue
+                await outbound_edit(self.messages[i], PRIORITY_USER, "reply_edit", content=chunk)
+                self.contents[i] = chunk
+            else:
+                self.messages.append(await outbound_send(self.channel, PRIORITY_USER, "reply", chunk))
+                self.contents.append(chunk)
+                if len(self.messages) == 1:
+                    mark("first_visible_reply", chars=len(chunk))
+        self.last_update = time.monotonic()
+
+    @property
+    def posted(self) -> bool:
+        return bool(self.messages)
+
+def clean_visible_reply(text: str) -> str:
+    for tag in REPLY_TAGS:
+        text = text.replace(tag, "")
+    return text.strip()
+
+async def post_name_request(channel: discord.TextChannel, ticket: Ticket):
+    view = NameRequestView(ticket.language)
+    if ticket.name_request_message:
+        await outbound_edit(ticket.name_request_message, PRIORITY_USER, "name_request", content="Klick für Namen/ID:", view=view)
+    else:
+        ticket.name_request_message = await outbound_send(channel, PRIORITY_USER, "name_request", "Klick für Namen/ID:", view=view)
+        save_ticket(ticket)
+
+async def iter_sse_deltas(resp: aiohttp.ClientResponse):
+    async for raw_line in resp.content:
+        line = raw_line.decode("utf-8", errors="replace").strip()
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        try:
+            chunk = json.loads(data)
+        except ValueError:
+            continue
+        choices = chunk.get("choices") or []
+        delta = (choices[0].get("delta") or {}).get("content") if choices else None
+        if delta:
+            yield delta
+
+async def clear_ticket_temp_ban(ticket: Ticket) -> dict | None:
+    # Für AUTO_UNBAN aus der KI-Antwort: Fehler landen im Log statt in einem unbeobachteten Task
+    try:
+        return await api_clear_temp_ban(ticket.player_id, ticket.channel_id)
+    except Exception as e:
+        await log_debug(f"Temp-Ban-Clear Exception: {e!r}", ticket.channel_id)
+        return None
+
+async def stream_ki_response(channel: discord.TextChannel, ticket: Ticket, payload: dict, reply: StreamingReply, handled: set, fast: bool = False) -> str | None:
+    parser = StreamingTagParser()
+    raw = ""
+    reply.raw = ""
+    async with aclosing(llm_router.stream(payload, fast)) as deltas:
+        async for delta in deltas:
+            raw += delta
+            reply.raw = raw
+            for tag in parser.feed(delta):
+                if tag == TAG_NAME_MODAL and tag not in handled:
+                    # Button unter den bisherigen Text; spätere Edits bleiben darüber
+                    await reply.update(clean_visible_reply(parser.visible), final=True)
+                    await post_name_request(channel, ticket)
+                    handled.add(tag)
+                elif tag == TAG_AUTO_UNBAN and tag not in handled and ticket.player_id:
+                    # Erst entbannen, wenn der Spieler die Antwort sieht – ohne sichtbaren Text (Versuch bricht ab,
+                    # wird wiederholt) übernimmt das die Nachbearbeitung der fertigen Antwort
+                    await reply.update(clean_visible_reply(parser.visible), final=True)
+                    if reply.posted:
+                        ticket.unban_task = asyncio.create_task(clear_ticket_temp_ban(ticket))
+                        handled.add(tag)
+                elif tag == TAG_SUMMARY:
+                    # Ab hier kommt nur noch Admin-Text – sichtbare Antwort sofort fertigstellen
+                    await reply.update(clean_visible_reply(parser.visible), final=True)
+            if not parser.in_summary:
+                await reply.update(clean_visible_reply(parser.visible))
+    parser.finish()
+    return raw or None
+
+async def request_ki_completion(payload: dict, ticket: Ticket, fast: bool = False) -> str | None:
+    try:
+        return await llm_router.complete(payload, fast) or None
+    except LLMHttpError as e:
+        await log_debug(f"KI Status {e.status}", ticket.channel_id)
+        raise
+
+# === ANTWORT-CACHE ===
+# Erste Nachrichten wiederholen sich ("hallo ich wurde gebannt", "why was i kicked"): Antworten darauf pro
+# normalisiertem Text, Sprache und grobem Spielerstatus cachen – mehrere Varianten je Key, TTL und LRU.
+# Gecacht wird nur, was nichts Spielerspezifisches enthält und keine Aktion auslöst.
+RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', '1') == '1'
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', 6 * 3600))
+RESPONSE_CACHE_MAX_KEYS = int(os.getenv('RESPONSE_CACHE_MAX_KEYS', 500))
+RESPONSE_CACHE_VARIANTS = int(os.getenv('RESPONSE_CACHE_VARIANTS', 3))
+RESPONSE_CACHE_MIN_VARIANTS = int(os.getenv('RESPONSE_CACHE_MIN_VARIANTS', 2))
+RESPONSE_CACHE_MAX_CHARS = int(os.getenv('RESPONSE_CACHE_MAX_CHARS', 120))
+RESPONSE_CACHE_TEMPBAN_WINDOW = 7 * 86400
+NON_WORD_PATTERN = re.compile(r"[^\w\s]|_")
+REPEAT_PATTERN = re.compile(r"(.)\1{2,}")
+
+def normalize_opening(text: str) -> str:
+    text = NON_WORD_PATTERN.sub(" ", text.lower())  # Satzzeichen und Emojis
+    text = REPEAT_PATTERN.sub(r"\1", text)  # "hallooo" -> "hallo"
+    return " ".join(text.split())
+
+def player_state(ticket: Ticket) -> str | None:
+    if not ticket.player_id:
+        return "no_id"
+    info = ticket.player_info
+    if not info or info.player_id != ticket.player_id:
+        return None  # Player-Info noch nicht geladen
+    if info.blacklisted:
+        return "blacklisted"
+    latest = info.latest
+    if latest and latest["type"] == "TEMPBAN" and time.time() - parse_last_seen(latest["time"]) < RESPONSE_CACHE_TEMPBAN_WINDOW:
+        return "temp_banned"
+    if not info.last_punishment_at:
+        return "clean"
+    return None  # Strafen im Verlauf – die Antwort hängt vom Einzelfall ab
+
+def response_cache_key(ticket: Ticket) -> tuple | None:
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+    turns = [m for m in ticket.history if m.get("role") != "system"]
+    if len(turns) != 1 or not isinstance(turns[0].get("content"), str):
+        return None  # nur die Eröffnung, nur reiner Text
+    text = turns[0]["content"]
+    if ticket.player_id:
+        text = text.replace(ticket.player_id, " spielerid ")  # die ID selbst darf den Key nicht zersplittern
+    normalized = normalize_opening(text)
+    if not normalized or len(normalized) > RESPONSE_CACHE_MAX_CHARS:
+        return None
+    state = player_state(ticket)
+    return (ticket.language, state, normalized) if state else None
+
+def reply_is_cacheable(reply: str, ticket: Ticket) -> bool:
+    if any(tag in reply for tag in (TAG_AUTO_UNBAN, TAG_SUMMARY, TAG_CLOSE)):
+        return False
+    personal = [ticket.player_id, str(ticket.owner or ""), getattr(ticket.owner, "display_name", "")]
+    if ticket.player_info:
+        personal += [ticket.player_info.name] + [a["reason"] for a in ticket.player_info.recent]
+    reply_lower = reply.lower()
+    return not any(p and len(p) >= 3 and p.lower() in reply_lower for p in personal)
+
+class ResponseCache:
+    def __init__(self, ttl: float, max_keys: int, variants: int, min_variants: int):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.variants = variants
+        self.min_variants = min(min_variants, variants)
+        self._entries: OrderedDict = OrderedDict()  # key -> [(expires, reply)]
+        self._miss_seconds: deque = deque(maxlen=200)
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "uncacheable": 0, "evictions": 0, "saved_tokens": 0}
+        self.saved_seconds = 0.0
+
+    def _variants(self, key) -> list:
+        now = time.monotonic()
+        variants = [v for v in self._entries.get(key, []) if v[0] > now]
+        if variants:
+            self._entries[key] = variants
+        else:
+            self._entries.pop(key, None)
+        return variants
+
+    def get(self, key, prompt_tokens: int = 0) -> str | None:
+        variants = self._variants(key)
+        if len(variants) < self.min_variants:
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        self.stats["saved_tokens"] += prompt_tokens
+        if self._miss_seconds:
+            self.saved_seconds += sum(self._miss_seconds) / len(self._miss_seconds)
+        return random.choice(variants)[1]
+
+    def store(self, key, reply: str, ticket: Ticket, llm_seconds: float):
+        self._miss_seconds.append(llm_seconds)
+        if not reply_is_cacheable(reply, ticket):
+            self.stats["uncacheable"] += 1
+            return
+        variants = self._variants(key)  # Duplikate bleiben drin: gleiche Antwort zweimal = bestätigt, und sie wird öfter gewählt
+        variants.append((time.monotonic() + self.ttl, reply))
+        self._entries[key] = variants[-self.variants:]
+        self._entries.move_to_end(key)
+        self.stats["stored"] += 1
+        while len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def variant_count(self, key) -> int:
+        return len(self._entries.get(key, ()))
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+response_cache = ResponseCache(RESPONSE_CACHE_TTL, RESPONSE_CACHE_MAX_KEYS, RESPONSE_CACHE_VARIANTS, RESPONSE_CACHE_MIN_VARIANTS)
+
+async def call_ki_with_retries(channel: discord.TextChannel, ticket: Ticket, messages: list, prompt_tokens: int,
+                               reply: "StreamingReply", handled: set) -> str | None:
+    payload = {"model": GROK_MODEL, "messages": messages, "max_tokens": 1024, "temperature": 0.8}
+    fast = is_trivial_turn(ticket)
+
+    with span("rate_limit"):
+        await llm_scheduler.rate_limiter.acquire(prompt_tokens + payload["max_tokens"])
+
+    bot_reply = None
+    for attempt in range(LLM_MAX_ATTEMPTS):
+        attempt_started = time.monotonic()
+        try:
+            with span("llm_call", attempt=attempt, fast=fast, streaming=GROK_STREAMING):
+                if GROK_STREAMING:
+                    bot_reply = await stream_ki_response(channel, ticket, payload, reply, handled, fast)
+                else:
+                    bot_reply = await request_ki_completion(payload, ticket, fast)
+            record_event(ticket.channel_id, "llm", status="ok" if bot_reply else "empty", attempt=attempt, fast=fast,
+                         prompt_tokens=prompt_tokens, latency_ms=int((time.monotonic() - attempt_started) * 1000))
+            break
+        except LLMHttpError as e:
+            record_event(ticket.channel_id, "llm", status=e.status, attempt=attempt, fast=fast,
+                         prompt_tokens=prompt_tokens, latency_ms=int((time.monotonic() - attempt_started) * 1000))
+            if not e.retryable or reply.posted:
+                break
+            delay = e.retry_after if e.retry_after is not None else backoff_delay(attempt)
+            if e.status == 429:
+                llm_scheduler.stats["rate_limited"] += 1
+                llm_scheduler.cooldown(delay)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            record_event(ticket.channel_id, "llm", status=type(e).__name__, attempt=attempt, fast=fast,
+                         prompt_tokens=prompt_tokens, latency_ms=int((time.monotonic() - attempt_started) * 1000))
+            await log_debug(f"KI Exception: {e!r}", ticket.channel_id)
+            if reply.posted:
+                break  # Spieler sieht schon Text – nicht von vorn beginnen
+            delay = backoff_delay(attempt)
+        except Exception as e:
+            # Unerwartetes (kaputte Antwort, Bug): loggen und Fallback-Nachricht statt stiller Abbruch im Scheduler
+            record_event(ticket.channel_id, "llm", status=type(e).__name__, attempt=attempt, fast=fast,
+                         prompt_tokens=prompt_tokens, latency_ms=int((time.monotonic() - attempt_started) * 1000))
+            await log_debug(f"KI Exception: {e!r}", ticket.channel_id)
+            break
+        if attempt < LLM_MAX_ATTEMPTS - 1:
+            llm_scheduler.stats["retries"] += 1
+            await asyncio.sleep(delay)
+    return bot_reply
+
 async def send_ki_response(channel: discord.TextChannel, ticket: Ticket):
     if ticket.closed or ticket.admin_active or not http_session:
         return
@@ -455,147 +3086,775 @@ async def send_ki_response(channel: discord.TextChannel, ticket: Ticket):
         await create_http_session()
 
     trim_history(ticket)
-
-    messages = [m for m in ticket.history if isinstance(m, dict)]
-
-    payload = {"model": "grok-4", "messages": messages, "max_tokens": 1024, "temperature": 0.8}
-
-    bot_reply = None
-    for _ in range(3):
-        try:
-            async with http_session.post("https://api.x.ai/v1/chat/completions", json=payload, headers=GROK_HEADERS) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    bot_reply = data["choices"][0]["message"]["content"]
-                    break
-        except Exception as e:
-            await log_debug(f"KI Exception: {e} – recreate session", ticket.channel_id)
-            await create_http_session()  # Recreate bei Error
-            await asyncio.sleep(5)
+    await ensure_ticket_images(ticket)
+
+    with span("build_prompt") as prompt_span:
+        messages, prompt_tokens = build_prompt_messages(ticket)
+    if TRACE_ENABLED and prompt_span is not None:
+        prompt_span.attrs["tokens"] = prompt_tokens
+
+    cache_key = response_cache_key(ticket)
+    bot_reply = response_cache.get(cache_key, prompt_tokens) if cache_key else None
+    cached = bot_reply is not None
+    reply = StreamingReply(channel)
+    handled = set()
+    if cached:
+        await log_debug(f"Antwort aus Cache ({cache_key[1]}, {response_cache.variant_count(cache_key)} Varianten)", ticket.channel_id)
+    else:
+        await log_debug(f"Prompt: {len(messages)} Nachrichten, ~{prompt_tokens} Tokens (Budget {MAX_PROMPT_TOKENS})", ticket.channel_id)
+        llm_started = time.monotonic()
+        bot_reply = await call_ki_with_retries(channel, ticket, messages, prompt_tokens, reply, handled)
+        if bot_reply and cache_key:
+            response_cache.store(cache_key, bot_reply, ticket, time.monotonic() - llm_started)
 
     if not bot_reply:
-        await channel.send("KI-Probleme – weiter schreiben!")
+        partial = reply.raw.strip() if reply.posted else ""
+        record_event(ticket.channel_id, "reply", chars=len(partial), failed=True)
+        if partial:
+            # Stream nach sichtbarem Text abgebrochen: Rest bis zum Abbruch noch zeigen – und was der Spieler gesehen hat,
+            # muss die KI beim nächsten Turn kennen
+            await reply.update(clean_visible_reply(partial.split(TAG_SUMMARY, 1)[0]), final=True)
+            ticket.history.append({"role": "assistant", "content": partial})
+            save_ticket(ticket)
+        else:
+            await outbound_send(channel, PRIORITY_USER, "reply", "KI-Probleme – weiter schreiben!")
         return
 
     clean_reply = bot_reply
-    request_modal = "**REQUEST_NAME_MODAL:**" in bot_reply
-    auto_unban = "**AUTO_UNBAN:**" in bot_reply
-    close_ticket = bot_reply.strip() == "**CLOSE TICKET:**"
+    request_modal = TAG_NAME_MODAL in bot_reply
+    auto_unban = TAG_AUTO_UNBAN in bot_reply
+    close_ticket = bot_reply.strip() == TAG_CLOSE
     escalation_summary = None
 
-    if "**ZUSAMMENFASSUNG FÜR ADMINS:**" in bot_reply:
-        parts = bot_reply.split("**ZUSAMMENFASSUNG FÜR ADMINS:**", 1)
+    if TAG_SUMMARY in bot_reply:
+        parts = bot_reply.split(TAG_SUMMARY, 1)
         clean_reply = parts[0].strip()
         escalation_summary = parts[1].strip() if len(parts) > 1 else None
 
-    for tag in ["**REQUEST_NAME_MODAL:**", "**AUTO_UNBAN:**", "**ZUSAMMENFASSUNG FÜR ADMINS:**", "**CLOSE TICKET:**"]:
-        clean_reply = clean_reply.replace(tag, "").strip()
+    clean_reply = clean_visible_reply(clean_reply)
+    record_event(ticket.channel_id, "reply", chars=len(clean_reply), modal=request_modal, auto_unban=auto_unban,
+                 close=close_ticket, escalation=escalation_summary is not None, cached=cached)
 
     if clean_reply:
-        await channel.send(clean_reply)
+        await reply.update(clean_reply, final=True)
 
-    if request_modal:
-        view = NameRequestView(ticket.language)
-        if ticket.name_request_message:
-            await ticket.name_request_message.edit(content="Klick für Namen/ID:", view=view)
-        else:
-            ticket.name_request_message = await channel.send("Klick für Namen/ID:", view=view)
+    if request_modal and TAG_NAME_MODAL not in handled:
+        await post_name_request(channel, ticket)
 
-    if auto_unban and ticket.player_id:
-        success = await api_clear_temp_ban(ticket.player_id, ticket.channel_id)
+    if auto_unban and TAG_AUTO_UNBAN not in handled and ticket.player_id:
+        await clear_ticket_temp_ban(ticket)
 
     if close_ticket:
-        ticket.closed = True
-        await channel.send("Ticket geschlossen!")
+        release_ticket(ticket.channel_id, "close")
+        await outbound_send(channel, PRIORITY_USER, "reply", "Ticket geschlossen!")
         await send_feedback_message(channel)
-        del tickets[ticket.channel_id]
         return
 
     if escalation_summary:
         await update_escalation_embed(ticket.channel_id, summary=escalation_summary)
 
+    if not cached:
+        LLM_TOKENS.inc(prompt_tokens, kind="prompt")
+        LLM_TOKENS.inc(len(bot_reply) // 4 + 1, kind="completion")
     ticket.history.append({"role": "assistant", "content": bot_reply})
+    save_ticket(ticket)
+    maybe_schedule_summary(ticket)
 
 async def send_feedback_message(channel: discord.TextChannel):
     try:
-        msg = await channel.send("Danke! Alles okay?")
+        msg = await outbound_send(channel, PRIORITY_USER, "reply", "Danke! Alles okay?")
         await msg.add_reaction("👍")
         await msg.add_reaction("👎")
     except:
         pass
 
+# === WEB SERVER (HEALTH & METRICS) ===
+# Läuft im Event-Loop des Bots: hängt der Loop, antwortet auch /healthz nicht mehr.
+WEB_PORT = int(os.environ.get('PORT', 8080)) + (WORKER_INDEX + 1 if BOT_MODE == "worker" else 0)
+HEALTH_MAX_LOOP_LAG = float(os.getenv('HEALTH_MAX_LOOP_LAG', 2))
+loop_lag = 0.0
+web_runner = None
+
+async def monitor_loop_lag():
+    global loop_lag
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(1)
+        loop_lag = max(0.0, loop.time() - started - 1)
+
+def health_status() -> tuple[bool, dict]:
+    if BOT_MODE == "worker":
+        gateway_ok = worker_link.connected and bool(bot.guilds)
+    else:
+        gateway_ok = bot.is_ready() and not bot.is_closed() and math.isfinite(bot.latency)
+    if BOT_MODE == "gateway":
+        gateway_ok = gateway_ok and all(gateway_router.connected)
+    backends = {f"{b.name}/{b.model}": b.breaker.state for b in llm_router.backends + llm_router.fast_backends}
+    upstream_ok = any(state != "open" for state in backends.values())
+    loop_ok = loop_lag <= HEALTH_MAX_LOOP_LAG
+    status = {
+        "event_loop_lag_seconds": round(loop_lag, 3),
+        "gateway_connected": gateway_ok,
+        "gateway_latency_seconds": round(bot.latency, 3) if math.isfinite(bot.latency) else None,
+        "llm_backends": backends,
+        "open_tickets": len(tickets),
+        "mode": BOT_MODE if BOT_MODE != "worker" else f"worker {WORKER_INDEX}/{BOT_WORKERS}",
+    }
+    if BOT_MODE == "gateway":
+        status["workers_connected"] = sum(gateway_router.connected)
+    return loop_ok and gateway_ok and upstream_ok, status
+
+async def handle_home(request: web.Request) -> web.Response:
+    return web.Response(text="GBG KI Bot is alive! 🚀")
+
+async def handle_healthz(request: web.Request) -> web.Response:
+    healthy, status = health_status()
+    return web.json_response({"status": "ok" if healthy else "degraded", **status}, status=200 if healthy else 503)
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=render_metrics(), content_type="text/plain", charset="utf-8")
+
+async def start_web_server():
+    global web_runner
+    app = web.Application()
+    app.router.add_get('/', handle_home)
+    app.router.add_get('/healthz', handle_healthz)
+    app.router.add_get('/metrics', handle_metrics)
+    web_runner = web.AppRunner(app, access_log=None)
+    await web_runner.setup()
+    await web.TCPSite(web_runner, '0.0.0.0', WEB_PORT).start()
+
+CallbackMetric("gbg_open_tickets", "Tickets im Speicher", "gauge", lambda: [({}, len(tickets))])
+CallbackMetric("gbg_event_loop_lag_seconds", "Verzögerung des Event-Loops", "gauge", lambda: [({}, loop_lag)])
+CallbackMetric("gbg_player_cache_total", "Player-History-Cache Lookups nach Ergebnis", "counter",
+               lambda: [({"result": k}, v) for k, v in player_history_cache.stats.items()])
+CallbackMetric("gbg_player_cache_entries", "Einträge im Player-History-Cache", "gauge", lambda: [({}, len(player_history_cache))])
+CallbackMetric("gbg_name_index_total", "Lookups im lokalen Namensindex nach Ergebnis", "counter",
+               lambda: [({"result": k}, v) for k, v in name_index.stats.items()])
+CallbackMetric("gbg_llm_queue_depth", "Wartende LLM-Jobs", "gauge", lambda: [({}, llm_scheduler.queue_depth)])
+CallbackMetric("gbg_llm_scheduler_total", "LLM-Scheduler Zähler", "counter",
+               lambda: [({"event": k}, v) for k, v in llm_scheduler.stats.items()])
+CallbackMetric("gbg_llm_queue_wait_p95_seconds", "p95 der Wartezeit in der LLM-Queue", "gauge", lambda: [({}, llm_scheduler.wait_percentile(95))])
+CallbackMetric("gbg_llm_backend_open", "1 wenn der Circuit Breaker des Backends offen ist", "gauge",
+               lambda: [({"backend": b.name}, int(b.breaker.state == "open")) for b in llm_router.backends + llm_router.fast_backends])
+CallbackMetric("gbg_discord_outbound_queue", "Wartende Discord-Sends/Edits nach Priorität", "gauge",
+               lambda: [({"priority": name}, outbound.queue_depth(p)) for name, p in (("user", PRIORITY_USER), ("admin", PRIORITY_ADMIN), ("debug", PRIORITY_DEBUG))])
+CallbackMetric("gbg_discord_outbound_total", "Discord-Outbound Zähler (zusammengefasst, übersprungen, ...)", "counter",
+               lambda: [({"event": k}, v) for k, v in outbound.stats.items()])
+CallbackMetric("gbg_response_cache_total", "Antwort-Cache Zähler (Hits, Misses, gespeichert, ...)", "counter",
+               lambda: [({"event": k}, v) for k, v in response_cache.stats.items()])
+CallbackMetric("gbg_response_cache_saved_seconds", "Geschätzte eingesparte LLM-Zeit durch den Antwort-Cache", "counter",
+               lambda: [({}, response_cache.saved_seconds)])
+CallbackMetric("gbg_image_total", "Bildanhänge: Downloads, Dedup-/Platten-Treffer, verkleinert, verworfen, Bytes", "counter",
+               lambda: [({"event": k}, v) for k, v in image_stats.items()])
+CallbackMetric("gbg_debug_log_total", "Debug-Log Zeilen/Nachrichten", "counter", lambda: [({"event": k}, v) for k, v in log_stats.items()])
+
+# === MULTI-PROCESS (GATEWAY/WORKER) ===
+# Gateway: ersetzt die discord.py-Parser der Ticket-Events durch Weiterleitung an den zuständigen Worker
+# (Partition nach Channel-ID), Channel-/Rollen-/Mitglieder-Events gehen an alle Worker, damit deren Cache stimmt.
+# Worker: bekommen beim Verbinden den GUILD_CREATE-Snapshot und lassen die Roh-Events durch die eigenen Parser laufen –
+# dieselben Handler wie im Single-Modus, nur ohne eigene Gateway-Verbindung. Transport: JSON-Zeilen über localhost-TCP.
+IPC_HOST = '127.0.0.1'
+IPC_PORT = int(os.getenv('IPC_PORT', 8790))
+IPC_QUEUE_MAX = int(os.getenv('IPC_QUEUE_MAX', 5000))
+IPC_FRAME_LIMIT = 32 * 1024 * 1024  # GUILD_CREATE mit Mitgliedern kann groß sein
+WORKER_SPAWN = os.getenv('WORKER_SPAWN', '1') == '1'  # 0 = Worker werden extern gestartet (z. B. systemd)
+WORKER_RESTART_DELAY = 5
+WORKER_ORPHAN_TIMEOUT = float(os.getenv('WORKER_ORPHAN_TIMEOUT', 120))
+WORKER_RECONNECT_MIN_DELAY = 0.5
+WORKER_RECONNECT_MAX_DELAY = 15
+ROUTED_EVENTS = ("MESSAGE_CREATE", "TYPING_START", "INTERACTION_CREATE")
+BROADCAST_EVENTS = ("CHANNEL_CREATE", "CHANNEL_UPDATE", "CHANNEL_DELETE", "GUILD_ROLE_CREATE", "GUILD_ROLE_UPDATE",
+                    "GUILD_ROLE_DELETE", "GUILD_MEMBER_ADD", "GUILD_MEMBER_UPDATE", "GUILD_MEMBER_REMOVE")
+ipc_stats = {"routed": 0, "broadcast": 0, "dropped": 0, "received": 0, "worker_restarts": 0}
+
+DISCORD_PY_TESTED_VERSION = "2.7.1"  # in requirements.txt gepinnt – Gateway/Worker nutzen discord.py-Interna
+
+def check_discord_internals():
+    # Beim Start prüfen statt mitten im Betrieb mit AttributeError auszusteigen, wenn ein Update die Interna ändert
+    problems = []
+    parsers = getattr(getattr(bot, "_connection", None), "parsers", None)
+    if not isinstance(parsers, dict):
+        problems.append("bot._connection.parsers fehlt")
+    else:
+        missing = [e for e in ROUTED_EVENTS + BROADCAST_EVENTS + ("GUILD_CREATE",) if not callable(parsers.get(e))]
+        if missing:
+            problems.append(f"Parser fehlen: {', '.join(missing)}")
+    if not callable(getattr(getattr(bot, "_connection", None), "_add_guild", None)):
+        problems.append("ConnectionState._add_guild fehlt")
+    if not callable(getattr(discord.Guild, "_add_channel", None)):
+        problems.append("Guild._add_channel fehlt")
+    try:
+        params = inspect.signature(discord.Guild).parameters
+        if not {"data", "state"} <= params.keys():
+            problems.append(f"Guild({', '.join(params)}) statt Guild(data=..., state=...)")
+    except (TypeError, ValueError) as e:
+        problems.append(f"Guild-Konstruktor nicht prüfbar: {e}")
+    if problems:
+        raise RuntimeError(f"BOT_MODE={BOT_MODE} braucht discord.py {DISCORD_PY_TESTED_VERSION}, installiert ist "
+                           f"{discord.__version__}: " + "; ".join(problems))
+    if discord.__version__ != DISCORD_PY_TESTED_VERSION:
+        print(f"Warnung: BOT_MODE={BOT_MODE} getestet mit discord.py {DISCORD_PY_TESTED_VERSION}, installiert ist {discord.__version__}")
+
+def encode_frame(op: str, **fields) -> bytes:
+    return json.dumps({"op": op, **fields}, separators=(",", ":")).encode() + b"\n"
+
+class GatewayRouter:
+    def __init__(self, workers: int):
+        self.queues = [deque() for _ in range(workers)]
+        self.wakeups = [asyncio.Event() for _ in range(workers)]
+        self.connected = [False] * workers
+        self.guilds: dict[int, bytes] = {}  # guild_id -> Snapshot für (neu) verbindende Worker
+        self.server = None
+        self.processes: dict[int, asyncio.subprocess.Process] = {}
+        self.tasks: set[asyncio.Task] = set()  # Referenzen halten, sonst kann der GC laufende Tasks einsammeln
+
+    def spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def install(self):
+        parsers = bot._connection.parsers  # keine öffentliche API; der Gateway-Websocket liest dieses Dict
+        for event in ROUTED_EVENTS:
+            parsers[event] = functools.partial(self.route, event)
+        for event in BROADCAST_EVENTS:
+            parsers[event] = functools.partial(self.broadcast, event, parsers[event])
+        parsers["GUILD_CREATE"] = functools.partial(self.guild_create, parsers["GUILD_CREATE"])
+
+    def push(self, index: int, frame: bytes):
+        queue = self.queues[index]
+        if len(queue) >= IPC_QUEUE_MAX:
+            queue.popleft()
+            ipc_stats["dropped"] += 1
+        queue.append(frame)
+        self.wakeups[index].set()
+
+    def guild_create(self, original, data: dict):
+        self.guilds[int(data["id"])] = frame = encode_frame("guild", d=data)  # vor dem Parser – der darf data verändern
+        for index in range(len(self.queues)):
+            self.push(index, frame)
+        original(data)
+
+    def broadcast(self, event: str, original, data: dict):
+        frame = encode_frame("event", t=event, d=data)
+        for index in range(len(self.queues)):
+            self.push(index, frame)
+        ipc_stats["broadcast"] += 1
+        original(data)  # eigener Cache für Routing und Snapshots
+
+    def route(self, event: str, data: dict):
+        channel_id = int(data.get("channel_id") or 0)
+        if event == "INTERACTION_CREATE" and channel_id == ADMIN_SUMMARY_CHANNEL_ID and data.get("message"):
+            # Admin-Buttons hängen am Embed im Admin-Channel – das Ticket dazu steht im Store
+            self.spawn(self.route_admin_interaction(data))
+            return
+        self.push(worker_for_channel(channel_id), encode_frame("event", t=event, d=data))
+        ipc_stats["routed"] += 1
+
+    async def route_admin_interaction(self, data: dict):
+        channel_id = None
+        if ticket_store:
+            channel_id = await asyncio.to_thread(ticket_store.channel_for_escalation, int(data["message"]["id"]))
+        self.push(worker_for_channel(channel_id) if channel_id else 0, encode_frame("event", t="INTERACTION_CREATE", d=data))
+        ipc_stats["routed"] += 1
+
+    async def start(self):
+        if self.server:
+            return  # on_ready kommt nach jedem Reconnect erneut
+        await create_http_session()
+        start_log_flusher()
+        outbound.start()
+        if not ticket_store:
+            await log_debug("Gateway ohne TICKET_DB – Admin-Buttons landen immer bei Worker 0")
+        self.server = await asyncio.start_server(self.handle_worker, IPC_HOST, IPC_PORT, limit=IPC_FRAME_LIMIT)
+        if WORKER_SPAWN:
+            for index in range(len(self.queues)):
+                self.spawn(self.supervise(index))
+
+    async def handle_worker(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        index = None
+        try:
+            hello = json.loads(await reader.readline() or b"{}")
+            index = hello.get("worker")
+            if hello.get("op") != "hello" or not isinstance(index, int) or not 0 <= index < len(self.queues) or self.connected[index]:
+                index = None
+                return
+            self.connected[index] = True
+            await log_debug(f"Worker {index} verbunden ({len(self.queues[index])} Events in der Queue)")
+            for frame in self.guilds.values():
+                writer.write(frame)
+            eof = asyncio.create_task(reader.read())
+            try:
+                while not eof.done():
+                    queue = self.queues[index]
+                    while queue:
+                        writer.write(queue[0])
+                        await writer.drain()
+                        queue.popleft()
+                    self.wakeups[index].clear()
+                    wakeup = asyncio.create_task(self.wakeups[index].wait())
+                    await asyncio.wait({eof, wakeup}, return_when=asyncio.FIRST_COMPLETED)
+                    wakeup.cancel()
+            finally:
+                eof.cancel()
+        except (ConnectionError, json.JSONDecodeError) as e:
+            print(f"IPC-Verbindung zu Worker {index} abgebrochen: {e!r}")
+        finally:
+            writer.close()
+            if index is not None:
+                self.connected[index] = False
+                await log_debug(f"Worker {index} getrennt – Events werden gepuffert")
+
+    async def supervise(self, index: int):
+        env = {**os.environ, "BOT_MODE": "worker", "WORKER_INDEX": str(index), "BOT_WORKERS": str(len(self.queues)), "IPC_PORT": str(IPC_PORT)}
+        while True:
+            process = await asyncio.create_subprocess_exec(sys.executable, os.path.abspath(__file__), env=env)
+            self.processes[index] = process
+            code = await process.wait()
+            ipc_stats["worker_restarts"] += 1
+            await log_debug(f"Worker {index} beendet (Code {code}) – Neustart in {WORKER_RESTART_DELAY}s")
+            await asyncio.sleep(WORKER_RESTART_DELAY)
+
+    def stop_workers(self):
+        for process in self.processes.values():
+            if process.returncode is None:
+                with contextlib.suppress(ProcessLookupError):
+                    os.kill(process.pid, signal.SIGTERM)
+
+class WorkerLink:
+    def __init__(self):
+        self.connected = False
+        self.runtime_started = False
+
+    async def run(self):
+        lost_since = time.monotonic()
+        delay = WORKER_RECONNECT_MIN_DELAY
+        while True:
+            received = False
+            try:
+                reader, writer = await asyncio.open_connection(IPC_HOST, IPC_PORT, limit=IPC_FRAME_LIMIT)
+            except OSError:
+                writer = None
+            if writer:
+                try:
+                    writer.write(encode_frame("hello", worker=WORKER_INDEX))
+                    await writer.drain()
+                    self.connected = True
+                    while line := await reader.readline():
+                        received = True
+                        await self.handle(json.loads(line))
+                except (ConnectionError, asyncio.LimitOverrunError, ValueError) as e:
+                    print(f"Worker {WORKER_INDEX}: IPC-Fehler {e!r}")
+                finally:
+                    self.connected = False
+                    writer.close()
+            if received:
+                # Verbindung hat funktioniert: Backoff und Orphan-Timer neu starten
+                lost_since = time.monotonic()
+                delay = WORKER_RECONNECT_MIN_DELAY
+            elif time.monotonic() - lost_since > WORKER_ORPHAN_TIMEOUT:
+                print(f"Worker {WORKER_INDEX}: Gateway seit {WORKER_ORPHAN_TIMEOUT:.0f}s nicht erreichbar – beende")
+                return
+            await asyncio.sleep(delay * random.uniform(0.8, 1.2))
+            delay = min(delay * 2, WORKER_RECONNECT_MAX_DELAY)
+
+    async def handle(self, frame: dict):
+        if frame["op"] == "guild":
+            await load_guild_snapshot(frame["d"])
+            if not self.runtime_started:
+                self.runtime_started = True
+                await start_ticket_runtime()
+                await log_debug(f"Worker {WORKER_INDEX}/{BOT_WORKERS} online – {len(tickets)} Tickets")
+            return
+        ipc_stats["received"] += 1
+        parser = bot._connection.parsers.get(frame["t"])
+        try:
+            parser(frame["d"])  # dispatcht wie im Single-Modus (on_message, Views, Modals, ...)
+        except Exception as e:
+            print(f"Worker {WORKER_INDEX}: Event {frame['t']} fehlgeschlagen: {e!r}")
+
+async def load_guild_snapshot(data: dict):
+    state = bot._connection
+    guild = discord.Guild(data=data, state=state)
+    state._add_guild(guild)
+    # Snapshot stammt vom letzten GUILD_CREATE – Channels frisch per REST, danach halten Broadcasts den Cache aktuell
+    for channel in await guild.fetch_channels():
+        guild._add_channel(channel)
+
+async def run_worker():
+    async with bot:
+        await bot.login(DISCORD_TOKEN)
+        await worker_link.run()
+
+if BOT_MODE != "single":
+    check_discord_internals()
+gateway_router = GatewayRouter(BOT_WORKERS)
+worker_link = WorkerLink()
+if BOT_MODE == "gateway":
+    atexit.register(gateway_router.stop_workers)
+
+CallbackMetric("gbg_ipc_total", "Gateway/Worker IPC Zähler", "counter", lambda: [({"event": k}, v) for k, v in ipc_stats.items()])
+CallbackMetric("gbg_ipc_queue_depth", "Gepufferte Events je Worker (Gateway)", "gauge",
+               lambda: [({"worker": str(i)}, len(q)) for i, q in enumerate(gateway_router.queues)] if BOT_MODE == "gateway" else [])
+
 @bot.event
-async def on_ready():
+async def setup_hook():
+    if BOT_MODE == "gateway":
+        gateway_router.install()
+    await start_web_server()
+    asyncio.create_task(monitor_loop_lag())
+
+async def start_ticket_runtime():
     await create_http_session()
+    start_log_flusher()
+    start_transcript_recorder()
+    start_ticket_janitor()
+    outbound.start()
+    llm_scheduler.start()
+    asyncio.create_task(asyncio.to_thread(warm_language_detector))
     bot.add_view(NameRequestView('de'))
     bot.add_view(NameRequestView('en'))
     bot.add_view(TicketAdminView("", 0))
+    if ticket_store:
+        ticket_store.start()
+        asyncio.create_task(rehydrate_tickets())
+
+@bot.event
+async def on_ready():
+    if BOT_MODE == "gateway":
+        await gateway_router.start()
+        await log_debug(f"Gateway online – verteilt Tickets auf {BOT_WORKERS} Worker")
+        return
+    await start_ticket_runtime()
     await log_debug("Bot online – Session recreate bei closed")
 
 @bot.event
 async def on_disconnect():
     await close_http_session()
 
+async def overwrite_members(channel: discord.TextChannel) -> list[discord.Member]:
+    members = []
+    for target in channel.overwrites:
+        if isinstance(target, discord.Object) and target.type is discord.User:
+            # Worker kennen nur Mitglieder aus Snapshot und Events – den Rest per REST nachladen
+            with contextlib.suppress(discord.HTTPException):
+                target = await channel.guild.fetch_member(target.id)
+        if isinstance(target, discord.Member) and not target.bot:
+            members.append(target)
+    return members
+
 @bot.event
 async def on_guild_channel_create(channel):
-    if isinstance(channel, discord.TextChannel) and channel.category and channel.category.name.lower() in [c.lower() for c in ACTIVE_TICKET_CATEGORIES]:
+    if is_ticket_channel(channel) and owns_channel(channel.id):
         await asyncio.sleep(8)
-        members = [t for t in channel.overwrites if isinstance(t, discord.Member) and not t.bot]
-        if members:
+        members = await overwrite_members(channel)
+        if members and channel.id not in tickets:
             owner = members[0]
-            tickets[channel.id] = Ticket(channel.id, owner)
+            ticket = Ticket(channel.id, owner)
+            register_ticket(ticket)
+            record_event(channel.id, "open", source="channel")
+            transcript_channel.set(channel.id)
+            save_ticket(ticket)
+            start_player_prefetch(ticket)
+
+@bot.event
+async def on_typing(channel, user, when):
+    ticket = tickets.get(channel.id)
+    if ticket and not ticket.closed and ticket.owner and user.id == ticket.owner.id:
+        ticket.typing_until = time.monotonic() + DEBOUNCE_TYPING_WINDOW
+        record_event(channel.id, "typing")
+
+@bot.event
+async def on_guild_channel_delete(channel):
+    if owns_channel(channel.id) and release_ticket(channel.id, "channel_delete") is not None:
+        await log_debug("Channel gelöscht – Ticket freigegeben", channel.id)
+
+@bot.event
+async def on_guild_channel_update(before, after):
+    # Ticket-Tool verschiebt geschlossene Tickets in eine Archiv-Kategorie; beim Zurückschieben lädt get_ticket neu
+    if owns_channel(after.id) and is_ticket_channel(before) and not is_ticket_channel(after) and after.id in tickets:
+        evict_ticket(tickets[after.id], "category_move")
+        await log_debug(f"Channel nach {after.category.name if after.category else 'ohne Kategorie'} verschoben – Ticket aus dem Speicher genommen", after.id)
 
 @bot.event
 async def on_message(message):
     if message.author.bot or not isinstance(message.channel, discord.TextChannel):
         return
-    if message.channel.category and message.channel.category.name.lower() in [c.lower() for c in ACTIVE_TICKET_CATEGORIES]:
+    if is_ticket_channel(message.channel):
         cid = message.channel.id
-        ticket = tickets.get(cid)
+        start_trace("message", cid)
+        transcript_channel.set(cid)
+        ticket = await get_ticket(cid)
         if not ticket:
             ticket = Ticket(cid, message.author)
-            tickets[cid] = ticket
+            register_ticket(ticket)
+            record_event(cid, "open", source="message")
 
         if isinstance(message.author, discord.Member) and has_admin_role(message.author):
+            if message.content.startswith(bot.command_prefix):
+                await finish_trace("command")
+                await bot.process_commands(message)
+                return
             ticket.admin_active = True
+            ticket.admin_active_since = time.time()
             if ticket.admin_timeout_task:
                 ticket.admin_timeout_task.cancel()
             ticket.admin_timeout_task = asyncio.create_task(reset_admin_active(ticket))
             ticket.history.append({"role": "user", "content": f"[Admin {message.author}]: {message.content}"})
+            record_event(cid, "message", role="admin", **message_shape(message.content, message.attachments))
+            save_ticket(ticket)
+            await finish_trace("admin")
             return
 
         if message.author != ticket.owner:
+            record_event(cid, "message", role="other", **message_shape(message.content, message.attachments))
+            await finish_trace("ignored")
             return
 
+        record_event(cid, "message", role="owner", **message_shape(message.content, message.attachments))
+        note_owner_message(ticket, message.author.id)
+
         content = [{"type": "text", "text": message.content}] if message.content else []
         for att in message.attachments:
-            if att.content_type and att.content_type.startswith("image/"):
-                content.append({"type": "image_url", "image_url": {"url": att.url}})
+            if is_image_attachment(att):
+                part = {"type": "image_url", "image_url": {"url": att.url}}
+                if att.size <= IMAGE_MAX_DOWNLOAD_BYTES:
+                    start_image_prefetch(part, cid)
+                else:
+                    part["_sha"] = None  # zu groß zum Verkleinern, Provider lädt selbst
+                content.append(part)
+        if len(content) == 1 and content[0]["type"] == "text":
+            content = message.content  # reine Textnachricht als String statt Part-Liste
         ticket.history.append({"role": "user", "content": content or message.content})
 
+        with span("analyze_text"):
+            analysis = analyze_text(message.content or "")
+        if analysis.language_confidence > ticket.language_confidence:
+            # Sicherste Erkennung bisher gewinnt – ein kurzes "moin" legt die Sprache nicht fest
+            ticket.language = analysis.language
+            ticket.language_confidence = analysis.language_confidence
         if len([m for m in ticket.history if isinstance(m, dict) and m.get("role") == "user"]) == 1:
-            ticket.language = detect_language(message.content or "")
+            start_player_prefetch(ticket)
 
         id_changed = False
-        if pid := extract_player_id(message.content or ""):
+        pid = analysis.player_id
+        if pid:
             if pid != ticket.player_id:
                 ticket.player_id = pid
                 await add_player_info_to_history(cid)
                 id_changed = True
+            if is_self_identification(message.content, pid):
+                remember_player_link(ticket, "message")
 
-        if name := extract_ingame_name(message.content or ""):
-            if await search_and_set_best_player_id(cid, name):
-                id_changed = True
+        if not pid and analysis.name_candidates and await search_and_set_best_player_id(cid, analysis.name_candidates):
+            id_changed = True
 
         if id_changed:
             await update_escalation_embed(cid)
 
+        save_ticket(ticket)
+
+        delay, reason = choose_debounce_delay(ticket, message.content, message.attachments)
         if ticket.pending_task:
             ticket.pending_task.cancel()
-        ticket.pending_task = asyncio.create_task(debounced_ki_response(message.channel, ticket))
+        ticket.pending_task = asyncio.create_task(debounced_ki_response(message.channel, ticket, delay, reason))
 
     await bot.process_commands(message)
 
+# === BULK-LOOKUP ===
+# !lookup mit vielen IDs/Namen (Zeilen, Komma oder Semikolon getrennt): parallel über den gemeinsamen History-Cache
+# auflösen und seitenweise als Embeds streamen, sobald Ergebnisse eintreffen.
+BULK_LOOKUP_MAX = int(os.getenv('BULK_LOOKUP_MAX', 200))
+BULK_LOOKUP_CONCURRENCY = int(os.getenv('BULK_LOOKUP_CONCURRENCY', 8))
+BULK_LOOKUP_PAGE_SIZE = 25  # Discord: max. 25 Felder und 6000 Zeichen pro Embed
+BULK_LOOKUP_PAGE_CHARS = 5500
+BULK_LOOKUP_RECENT_DAYS = 30
+LOOKUP_SPLIT_PATTERN = re.compile(r"[\n,;]+")
+
+def parse_lookup_queries(text: str) -> list[tuple[str, str]]:
+    # -> [(Eingabe, player_id oder "")] ohne Duplikate; mehrere IDs in einer Zeile werden einzeln gesucht
+    queries = []
+    seen = set()
+    for token in LOOKUP_SPLIT_PATTERN.split(text):
+        token = token.strip().strip("`")
+        ids = PLAYER_ID_PATTERN.findall(token)
+        for query, pid in [(i, i) for i in ids] or [(token, "")]:
+            key = pid or name_key(query)
+            if len(key) >= 3 and key not in seen:
+                seen.add(key)
+                queries.append((query, pid))
+    return queries
+
+async def lookup_player(index: int, query: str, player_id: str, semaphore: asyncio.Semaphore) -> tuple[int, str, PlayerInfo | None, str | None]:
+    # -> (Position in der Eingabe, Eingabe, PlayerInfo, Fehler); gleiche Auswertung wie die Player-Info im Ticket
+    async with semaphore:
+        try:
+            if not player_id:
+                # nur exakte Treffer (Index und Remote) – "Spieler5" soll nicht als "Spieler6" durchgehen
+                player_id, _ = await resolve_player_name(query, min_local_score=1.0, exact=True)
+                if not player_id:
+                    return index, query, None, "nicht gefunden"
+            data = await fetch_player_history(player_id)
+            if not data:
+                return index, query, None, f"keine History für {player_id}"
+            return index, query, PlayerInfo.from_history(player_id, data), None
+        except RconApiError as e:
+            return index, query, None, f"RCON-Fehler {e.status}"
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return index, query, None, f"Verbindungsfehler {type(e).__name__}"
+
+def lookup_field(index: int, query: str, info: PlayerInfo | None, error: str | None) -> tuple[str, str]:
+    if not info:
+        return f"#{index} {query}"[:256], f"⚠️ {error}"
+    lines = []
+    if info.blacklisted:
+        lines.append("⛔ **Blacklist**" + (f": {'; '.join(info.blacklist_reasons)}" if info.blacklist_reasons else ""))
+    lines.append(f"Actions: {info.total_actions} ({info.counts_text()}) | letzte Strafe {info.since_last_punishment()}")
+    latest = info.latest
+    if latest:
+        lines.append(f"Zuletzt: {latest['type']} – {latest['reason']} ({latest['time'][:10]}, {latest['by']})")
+    # Eingabe mit anzeigen, damit Admins Namenstreffer gegen ihre Liste prüfen können
+    found = f"{info.name or '?'} ({info.player_id})"
+    title = f"#{index} {found}" if query == info.player_id else f"#{index} {query} → {found}"
+    return title[:256], "\n".join(lines)[:1024]
+
+def lookup_page_embed(page: int, fields: list[tuple[str, str]], done: int, total: int) -> discord.Embed:
+    embed = discord.Embed(title=f"Player-Lookup – Seite {page}", color=discord.Color.blurple())
+    for name, value in fields:
+        embed.add_field(name=name, value=value, inline=False)
+    embed.set_footer(text=f"{done}/{total} abgefragt" + (" – läuft…" if done < total else ""))
+    return embed
+
+def lookup_summary(results: list[tuple[int, str, PlayerInfo | None, str | None]], seconds: float) -> str:
+    infos = [info for _, _, info, _ in results if info]
+    recent_cutoff = time.time() - BULK_LOOKUP_RECENT_DAYS * 86400
+    blacklisted = [i for i in infos if i.blacklisted]
+    recent = [i for i in infos if i.last_punishment_at >= recent_cutoff]
+    failed = len(results) - len(infos)
+    lines = [
+        f"**Lookup fertig:** {len(results)} Spieler in {seconds:.1f}s – {len(infos)} gefunden, {failed} ohne Ergebnis",
+        f"Blacklist: {len(blacklisted)}" + (f" ({', '.join(i.name or i.player_id for i in blacklisted[:10])})" if blacklisted else ""),
+        f"Strafe in den letzten {BULK_LOOKUP_RECENT_DAYS} Tagen: {len(recent)} | ohne Strafen: {sum(1 for i in infos if not i.last_punishment_at)}",
+    ]
+    return "\n".join(lines)
+
+# === ADMIN COMMANDS ===
+@bot.command(name="cachestats")
+async def cache_stats_command(ctx: commands.Context):
+    if not isinstance(ctx.author, discord.Member) or not has_admin_role(ctx.author):
+        return
+    stats = player_history_cache.stats
+    lookups = stats["hits"] + stats["negative_hits"] + stats["misses"] + stats["inflight_joins"]
+    hit_rate = (lookups - stats["misses"]) / lookups * 100 if lookups else 0
+    await ctx.send(
+        f"Player-History-Cache: {len(player_history_cache)}/{player_history_cache.max_entries} Einträge, "
+        f"Hitrate {hit_rate:.1f}% | Hits {stats['hits']}, Negativ-Hits {stats['negative_hits']}, "
+        f"Misses {stats['misses']}, geteilte Requests {stats['inflight_joins']}, Evictions {stats['evictions']}"
+    )
+
+@bot.command(name="llmstats")
+async def llm_stats_command(ctx: commands.Context):
+    if not isinstance(ctx.author, discord.Member) or not has_admin_role(ctx.author):
+        return
+    stats = llm_scheduler.stats
+    await ctx.send(
+        f"LLM-Scheduler: {llm_scheduler.running_count}/{llm_scheduler.max_concurrency} aktiv, Queue {llm_scheduler.queue_depth} | "
+        f"Wartezeit p50 {llm_scheduler.wait_percentile(50):.1f}s, p95 {llm_scheduler.wait_percentile(95):.1f}s | "
+        f"Jobs {stats['submitted']} (ersetzt {stats['replaced']}, fertig {stats['completed']}, Fehler {stats['failed']}) | "
+        f"429 {stats['rate_limited']}, Retries {stats['retries']}\n"
+        f"Backends: {llm_router.describe()} | Fallbacks {llm_router.stats['fallbacks']}, "
+        f"Hedges {llm_router.stats['hedged']} (gewonnen {llm_router.stats['hedge_wins']}), Fast-Model {llm_router.stats['fast']}\n"
+        f"Antwort-Cache: {len(response_cache)} Keys, Hitrate {response_cache.hit_rate * 100:.1f}% "
+        f"(Hits {response_cache.stats['hits']}, Misses {response_cache.stats['misses']}, nicht cachebar {response_cache.stats['uncacheable']}) | "
+        f"gespart ~{response_cache.saved_seconds:.0f}s, ~{response_cache.stats['saved_tokens']} Prompt-Tokens"
+    )
+
+@bot.command(name="memstats")
+async def mem_stats_command(ctx: commands.Context):
+    if not isinstance(ctx.author, discord.Member) or not has_admin_role(ctx.author):
+        return
+    sizes = sorted(((ticket_size(t), t) for t in tickets.values()), key=lambda x: x[0], reverse=True)
+    total = sum(size for size, _ in sizes)
+    tasks = sum(1 for t in tickets.values() for task in ticket_tasks(t) if not task.done())
+    stored = len(await asyncio.to_thread(ticket_store.stored_channel_ids)) if ticket_store else 0
+    top = ", ".join(f"<#{t.channel_id}> {size / 1024:.1f} KB ({len(t.history)} Nachr.)" for size, t in sizes[:5])
+    await ctx.send(
+        f"Tickets im Speicher: {len(tickets)}/{TICKET_MAX_IN_MEMORY}, im Store: {stored} | ~{total / 1024:.1f} KB History "
+        f"(Systemprompt geteilt) | offene Tasks: {tasks} | verdrängt {ticket_stats['evicted']}, freigegeben {ticket_stats['released']}\n"
+        f"Größte: {top or '–'}\n"
+        f"Bilder: {len(image_data)} im Speicher, {image_stats['processed']} verkleinert "
+        f"({image_stats['bytes_in'] / 1024:.0f} KB -> {image_stats['bytes_out'] / 1024:.0f} KB), "
+        f"Dedup {image_stats['dedup_hits'] + image_stats['url_hits']}, Platte {image_stats['disk_hits']}, "
+        f"verworfen {image_stats['dropped']}, Fehler {image_stats['failed']}"
+    )
+
+@bot.command(name="lookup")
+async def bulk_lookup_command(ctx: commands.Context, *, text: str = ""):
+    if not isinstance(ctx.author, discord.Member) or not has_admin_role(ctx.author):
+        return
+    queries = parse_lookup_queries(text)
+    if not queries:
+        await ctx.send("Nutzung: `!lookup` gefolgt von Steam-IDs/Namen (je Zeile oder mit Komma getrennt).")
+        return
+    skipped = len(queries) - BULK_LOOKUP_MAX
+    queries = queries[:BULK_LOOKUP_MAX]
+    if not http_session or http_session.closed:
+        await create_http_session()
+    started = time.monotonic()
+    semaphore = asyncio.Semaphore(BULK_LOOKUP_CONCURRENCY)
+    results = []
+    fields = []
+    page = 1
+    message = None
+    jobs = [lookup_player(index, q, pid, semaphore) for index, (q, pid) in enumerate(queries, 1)]
+    for done, job in enumerate(asyncio.as_completed(jobs), 1):
+        result = await job
+        results.append(result)
+        field = lookup_field(*result)  # Nummer = Position in der Eingabe, nicht Reihenfolge der Antworten
+        if len(fields) == BULK_LOOKUP_PAGE_SIZE or sum(len(n) + len(v) for n, v in fields) + len(field[0]) + len(field[1]) > BULK_LOOKUP_PAGE_CHARS:
+            fields = []
+            page += 1
+            message = None  # nächste Seite als neue Nachricht
+        fields.append(field)
+        embed = lookup_page_embed(page, fields, done, len(queries))
+        # Seite live aktualisieren – Edits auf dieselbe Nachricht fasst die Outbound-Queue zusammen
+        if message is None:
+            message = await outbound_send(ctx.channel, PRIORITY_ADMIN, "lookup", embed=embed)
+        else:
+            outbound_edit(message, PRIORITY_ADMIN, "lookup", embed=embed)
+    summary = lookup_summary(results, time.monotonic() - started)
+    if skipped > 0:
+        summary += f"\n{skipped} weitere Einträge übersprungen (max. {BULK_LOOKUP_MAX} pro Aufruf)."
+    await outbound_send(ctx.channel, PRIORITY_ADMIN, "lookup", summary)
+
+@bot.command(name="setid")
+async def set_player_id_command(ctx: commands.Context, player_id: str = ""):
+    if not isinstance(ctx.author, discord.Member) or not has_admin_role(ctx.author):
+        return
+    ticket = await get_ticket(ctx.channel.id)
+    if not ticket:
+        await ctx.send("Kein Ticket in diesem Channel.")
+        return
+    pid = extract_player_id(player_id)
+    if not pid:
+        await ctx.send("Ungültige Player-ID – Steam-ID (7656119…) oder 32-stellige ID angeben.")
+        return
+    ticket.player_id = pid
+    await add_player_info_to_history(ctx.channel.id)
+    await update_escalation_embed(ctx.channel.id)
+    remember_player_link(ticket, "admin")
+    save_ticket(ticket)
+    await ctx.send(f"Player-ID {pid} gesetzt" + (f" und mit {ticket.owner} verknüpft." if ticket.owner else "."))
+
 if __name__ == "__main__":
-    threading.Thread(target=run_flask, daemon=True).start()
-    bot.run(DISCORD_TOKEN)
\ No newline at end of file
+    # SIGTERM (systemd, docker stop, Gateway -> Worker) wie Strg+C behandeln, damit Shutdown und atexit laufen
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    if BOT_MODE == "worker":
+        discord.utils.setup_logging()
+        with contextlib.suppress(KeyboardInterrupt):
+            asyncio.run(run_worker())
+    else:
+        bot.run(DISCORD_TOKEN)
\ No newline at end of file
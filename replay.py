@@ -0,0 +1,287 @@
+# Replay-Lastgenerator: spielt mit TRANSCRIPT_FILE aufgezeichnete Tickets gegen die Stand-ins aus benchmark.py ab.
+#
+#   TRANSCRIPT_FILE=transcripts.jsonl python main.py        # aufzeichnen (opt-in)
+#   python replay.py transcripts.jsonl --speed 4           # 4x beschleunigt abspielen
+#
+# Nachrichten werden zu den aufgezeichneten Zeitpunkten (geteilt durch --speed) eingespielt, ohne auf Antworten
+# zu warten – Burst-Öffnungen und Mehrfachnachrichten bleiben erhalten. Inhalte sind synthetisch, aber mit
+# gleicher Länge, Wortzahl, ID/Name-Merkmal und Anhangstypen. Debounce und Timeouts des Bots laufen in Echtzeit.
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+
+import benchmark
+from benchmark import CdnStandIn, FakeAttachment, FakeDiscord, FakeInteraction, FakeMessage, LLMStandIn, RconStandIn, percentile
+
+import main
+
+REPLAYED_EVENTS = ("open", "typing", "message", "modal_submit", "admin_action")
+ADMIN_ACTIONS = {
+    "admin_full_unban": "full_unban",
+    "admin_show_infos": "show_infos",
+    "admin_ki_pause": "pause_ki",
+    "admin_ki_resume": "resume_ki",
+}
+FILLER = "bitte kannst du mal schauen warum ich vom server geflogen bin danke".split()
+
+def load_transcripts(path: str) -> dict[str, list[dict]]:
+    by_ticket = defaultdict(list)
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if "ticket" in record and "ts" in record:
+                by_ticket[record["ticket"]].append(record)
+    for events in by_ticket.values():
+        events.sort(key=lambda r: r["ts"])
+    return dict(by_ticket)
+
+def upstream_profile(by_ticket: dict[str, list[dict]]) -> dict:
+    # Latenz und Fehlerquote der Stand-ins aus den aufgezeichneten Upstream-Ergebnissen
+    profile = {}
+    for kind, ok in (("rcon", lambda r: r.get("status") == 200), ("llm", lambda r: r.get("status") == "ok")):
+        records = [r for events in by_ticket.values() for r in events if r["event"] == kind]
+        if not records:
+            continue
+        latencies = [r["latency_ms"] / 1000 for r in records if ok(r) and "latency_ms" in r]
+        profile[kind] = {
+            "calls": len(records),
+            "latency": statistics.median(latencies) if latencies else None,
+            "error_rate": round(1 - sum(1 for r in records if ok(r)) / len(records), 4),
+        }
+    return profile
+
+def synthetic_text(shape: dict, index: int) -> str:
+    # ID- und Namensmerkmal bleiben erhalten, der Rest wird auf Wortzahl und Länge aufgefüllt
+    words = []
+    if shape.get("has_id"):
+        words.append(f"7656119{8000000000 + index:010d}")
+    if shape.get("has_name"):
+        words += ["ich", "bin", f"[GBG]Spieler{index}"]
+    markers = len(" ".join(words))
+    while len(words) < shape.get("words", 0):
+        words.append(FILLER[len(words) % len(FILLER)])
+    text = " ".join(words)
+    chars = shape.get("chars", len(text))
+    if len(text) < chars:
+        text += "." * (chars - len(text))
+    return text[:max(chars, markers)]
+
+def synthetic_attachments(content_types: list[str]) -> list[FakeAttachment]:
+    attachments = []
+    for content_type in content_types:
+        extension = content_type.split("/")[-1] if "/" in content_type else "bin"
+        attachments.append(FakeAttachment(f"anhang.{extension}", content_type, 250_000))
+    return attachments
+
+class ReplayTicket:
+    def __init__(self, index: int, fake: FakeDiscord):
+        self.index = index
+        self.channel = fake.ticket_channel()
+        self.owner = fake.member(f"Spieler{index}")
+        self.other = None
+        self.owner_message_times: list[float] = []
+
+class ReplayStats:
+    def __init__(self):
+        self.events = Counter()
+        self.queue_samples: list[int] = []
+        self.running_samples: list[int] = []
+        self.lag: list[float] = []
+
+async def replay_event(record: dict, ticket: ReplayTicket, fake: FakeDiscord, stats: ReplayStats):
+    event = record["event"]
+    stats.events[event] += 1
+    if event == "open":
+        return
+    if event == "typing":
+        await main.on_typing(ticket.channel, ticket.owner, None)
+        return
+    if event == "message":
+        role = record.get("role", "owner")
+        if role == "admin":
+            author = fake.admin
+        elif role == "other":
+            ticket.other = ticket.other or fake.member(f"Gast{ticket.index}")
+            author = ticket.other
+        else:
+            author = ticket.owner
+            ticket.owner_message_times.append(time.monotonic())
+        content = synthetic_text(record, ticket.index)
+        await main.on_message(FakeMessage(author, ticket.channel, content, synthetic_attachments(record.get("attachments", []))))
+        return
+    live = main.tickets.get(ticket.channel.id)
+    if live is None:
+        return
+    if event == "modal_submit":
+        modal = main.IngameNameOrIdModal(live.language)
+        modal.input._value = synthetic_text({"has_id": record.get("has_id"), "words": 1, "chars": record.get("chars", 17)}, ticket.index)
+        await modal.on_submit(FakeInteraction(ticket.owner, ticket.channel))
+    elif event == "admin_action" and record.get("action") in ADMIN_ACTIONS:
+        view = main.TicketAdminView(live.player_id, ticket.channel.id)
+        interaction = FakeInteraction(fake.admin, fake.admin_channel)
+        interaction.data = {"custom_id": record["action"]}
+        if await view.interaction_check(interaction):
+            await getattr(main.TicketAdminView, ADMIN_ACTIONS[record["action"]])(view, interaction, main.Button(label="replay"))
+
+async def replay_ticket(events: list[dict], ticket: ReplayTicket, t0: float, started: float, speed: float,
+                        fake: FakeDiscord, stats: ReplayStats):
+    for record in events:
+        if record["event"] not in REPLAYED_EVENTS:
+            continue
+        due = started + (record["ts"] - t0) / speed
+        delay = due - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        stats.lag.append(max(0.0, -delay))
+        await replay_event(record, ticket, fake, stats)
+
+async def sample_scheduler(stats: ReplayStats, interval: float = 0.1):
+    while True:
+        stats.queue_samples.append(main.llm_scheduler.queue_depth)
+        stats.running_samples.append(main.llm_scheduler.running_count)
+        await asyncio.sleep(interval)
+
+def reply_latencies(tickets: list[ReplayTicket]) -> list[float]:
+    # Erste Bot-Nachricht nach einer Spieler-Nachricht, gemessen ab deren letzter Nachricht davor
+    latencies = []
+    for ticket in tickets:
+        msg_times = ticket.owner_message_times
+        answered_until = float("-inf")
+        for sent_at in ticket.channel.send_times:
+            before = [t for t in msg_times if answered_until < t <= sent_at]
+            if before:
+                latencies.append(sent_at - before[-1])
+                answered_until = sent_at
+    return latencies
+
+async def run_replay(args) -> dict:
+    random.seed(args.seed)
+    by_ticket = load_transcripts(args.transcript)
+    if args.max_tickets:
+        by_ticket = dict(list(by_ticket.items())[:args.max_tickets])
+    if not by_ticket:
+        raise SystemExit(f"Keine Ereignisse in {args.transcript}")
+    profile = upstream_profile(by_ticket)
+
+    def pick(override, kind, key, default):
+        if override is not None:
+            return override
+        value = profile.get(kind, {}).get(key)
+        return value if value is not None else default
+
+    fake = FakeDiscord(args.discord_latency)
+    fake.install()
+    rcon = RconStandIn(pick(args.rcon_latency, "rcon", "latency", 0.2), pick(args.rcon_error_rate, "rcon", "error_rate", 0.0))
+    llm = LLMStandIn(pick(args.llm_latency, "llm", "latency", 1.0), pick(args.llm_error_rate, "llm", "error_rate", 0.0), args.reply_chars)
+    cdn = CdnStandIn(args.discord_latency, 0.0, 250)
+    await benchmark.start_standins(rcon, llm, cdn)
+    await benchmark.start_bot_runtime()
+
+    t0 = min(events[0]["ts"] for events in by_ticket.values())
+    recorded_span = max(events[-1]["ts"] for events in by_ticket.values()) - t0
+    tickets = [ReplayTicket(i, fake) for i in range(len(by_ticket))]
+    stats = ReplayStats()
+    sampler = asyncio.create_task(sample_scheduler(stats))
+    started = time.monotonic()
+    try:
+        await asyncio.gather(*(replay_ticket(events, ticket, t0, started, args.speed, fake, stats)
+                               for events, ticket in zip(by_ticket.values(), tickets)))
+        # Nachlauf: Debounce und laufende KI-Antworten abwarten
+        drain_deadline = time.monotonic() + args.drain
+        while time.monotonic() < drain_deadline:
+            busy = main.llm_scheduler.queue_depth or main.llm_scheduler.running_count
+            pending = any(t.pending_task and not t.pending_task.done() for t in main.tickets.values())
+            if not busy and not pending:
+                break
+            await asyncio.sleep(0.2)
+    finally:
+        wall = time.monotonic() - started
+        sampler.cancel()
+        await benchmark.stop_bot_runtime()
+        await rcon.stop()
+        await llm.stop()
+        await cdn.stop()
+
+    latencies = reply_latencies(tickets)
+    debounce_fired = sum(entry[2] for entry in main.DEBOUNCE_WAIT_SECONDS.values.values())
+    recorded = Counter(r["event"] for events in by_ticket.values() for r in events)
+    owner_messages = sum(len(t.owner_message_times) for t in tickets)
+    return {
+        "tickets": len(tickets),
+        "speed": args.speed,
+        "recorded_span_seconds": round(recorded_span, 1),
+        "wall_seconds": round(wall, 2),
+        "replayed_events": dict(stats.events),
+        "schedule_lag_p95": round(percentile(stats.lag, 95), 3),
+        "owner_messages": owner_messages,
+        "replies": len(latencies),
+        "reply_latency_p50": round(percentile(latencies, 50), 3),
+        "reply_latency_p95": round(percentile(latencies, 95), 3),
+        "reply_latency_p99": round(percentile(latencies, 99), 3),
+        "debounce_fired": debounce_fired,
+        "debounce_coalescing": round(1 - debounce_fired / owner_messages, 3) if owner_messages else 0,
+        "llm_queue_max": max(stats.queue_samples, default=0),
+        "llm_queue_mean": round(statistics.fmean(stats.queue_samples), 2) if stats.queue_samples else 0,
+        "llm_running_max": max(stats.running_samples, default=0),
+        "llm_wait_p50": round(main.llm_scheduler.wait_percentile(50), 3),
+        "llm_wait_p95": round(main.llm_scheduler.wait_percentile(95), 3),
+        "upstream_calls": {**rcon.calls, **llm.calls, **cdn.calls},
+        "images": dict(main.image_stats),
+        "upstream_errors": {**rcon.errors, **llm.errors},
+        "recorded_upstream_calls": {"rcon": recorded["rcon"], "llm": recorded["llm"]},
+        "upstream_profile": profile,
+    }
+
+def print_report(report: dict):
+    print(f"Replay: {report['tickets']} Tickets, {report['recorded_span_seconds']}s aufgezeichnet, "
+          f"{report['speed']}x -> {report['wall_seconds']}s | Events {report['replayed_events']} | Zeitplan-Verzug p95 {report['schedule_lag_p95']}s")
+    print(f"Antworten {report['replies']} auf {report['owner_messages']} Spieler-Nachrichten | Debounce {report['debounce_fired']}x ausgelöst ({report['debounce_coalescing']:.1%} zusammengefasst) | "
+          f"Latenz p50 {report['reply_latency_p50']}s, p95 {report['reply_latency_p95']}s, p99 {report['reply_latency_p99']}s")
+    print(f"LLM-Queue max {report['llm_queue_max']}, Ø {report['llm_queue_mean']} | aktiv max {report['llm_running_max']} | "
+          f"Wartezeit p50 {report['llm_wait_p50']}s, p95 {report['llm_wait_p95']}s")
+    print(f"Upstream-Calls {report['upstream_calls']} | Fehler {report['upstream_errors']} | aufgezeichnet {report['recorded_upstream_calls']}")
+    images = report["images"]
+    print(f"Bilder: {images['processed']} verkleinert, Dedup {images['dedup_hits']}, Fehler {images['failed']}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Aufgezeichnete Tickets gegen Stand-ins abspielen")
+    parser.add_argument("transcript", help="JSONL aus TRANSCRIPT_FILE")
+    parser.add_argument("--speed", type=float, default=1.0, help="Beschleunigung (1 = Echtzeit)")
+    parser.add_argument("--max-tickets", type=int, default=0)
+    parser.add_argument("--drain", type=float, default=30.0, help="max. Nachlauf nach dem letzten Ereignis (s)")
+    parser.add_argument("--llm-latency", type=float, help="Standard: Median aus der Aufzeichnung")
+    parser.add_argument("--llm-error-rate", type=float)
+    parser.add_argument("--rcon-latency", type=float)
+    parser.add_argument("--rcon-error-rate", type=float)
+    parser.add_argument("--discord-latency", type=float, default=0.05)
+    parser.add_argument("--reply-chars", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true", help="Bot-Logs auf stdout durchlassen")
+    parser.add_argument("--json", help="Report zusätzlich als JSON schreiben")
+    parser.add_argument("--max-p95", type=float, help="Gate: Exit 1, wenn p95 der Antwortlatenz darüber liegt")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    cli_args = parse_args()
+    with contextlib.nullcontext() if cli_args.verbose else contextlib.redirect_stdout(open(os.devnull, 'w')):
+        replay_report = asyncio.run(run_replay(cli_args))
+    print_report(replay_report)
+    if cli_args.json:
+        with open(cli_args.json, 'w', encoding='utf-8') as f:
+            json.dump(replay_report, f, indent=2, ensure_ascii=False)
+    if cli_args.max_p95 is not None and replay_report["reply_latency_p95"] > cli_args.max_p95:
+        print(f"GATE FEHLGESCHLAGEN: p95 {replay_report['reply_latency_p95']}s > {cli_args.max_p95}s")
+        sys.exit(1)